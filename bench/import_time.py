@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+# Check the start-up import time of each command line tool against a budget.
+#
+# Each tool's module is imported in a new interpreter with "python -X importtime", and the
+# cumulative time for that module is taken, so interpreter start-up is not included. Modules which
+# are slow to import, and are only needed on some paths, must not be imported at all.
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Budgets are in milliseconds
+BUDGETS = {
+    "bittytax.bittytax": 150,
+    "bittytax.conv.bittytax_conv": 150,
+    "bittytax.price.bittytax_price": 150,
+}
+
+DEFERRED_MODULES = (
+    "jinja2",
+    "openpyxl",
+    "pkg_resources",
+    "reportlab",
+    "requests",
+    "xhtml2pdf",
+    "xlrd",
+    "xlsxwriter",
+)
+
+
+def import_time(module):
+    # Also lists any deferred modules which were imported
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    cumulative = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative_us, name = line.split("|")
+        name = name.strip()
+        if name == module:
+            cumulative = int(cumulative_us) / 1000
+        elif name.split(".")[0] in DEFERRED_MODULES:
+            imported.add(name.split(".")[0])
+
+    return cumulative, sorted(imported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="check the import time of each tool")
+    parser.add_argument("--runs", type=int, default=5, help="number of imports to time")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply the budgets, for slower machines"
+    )
+    args = parser.parse_args()
+
+    passed = True
+    for module, budget in BUDGETS.items():
+        times = []
+        imported = []
+        for _ in range(args.runs):
+            elapsed, imported = import_time(module)
+            times.append(elapsed)
+
+        elapsed = statistics.median(times)
+        budget *= args.scale
+        ok = elapsed <= budget and not imported
+        passed = passed and ok
+
+        print(f"{module:<32} {elapsed:7.1f}ms (budget {budget:5.0f}ms) {'ok' if ok else 'FAILED'}")
+        if imported:
+            print(f"{'':<32} deferred module(s) imported: {', '.join(imported)}")
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
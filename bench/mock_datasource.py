@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+# Local stand-in for the price data source APIs, used for offline benchmarks.
+#
+# Requests are routed as http://<address>/<host>/<path>?<query>, which is what the data sources
+# send when BITTYTAX_DATA_SOURCE_URL is set. Responses recorded with BITTYTAX_REPLAY=record are
+# served if found, otherwise prices are synthesised from the fixtures.
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+
+from bittytax.price.replay import ResponseReplay
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "datasources.json")
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is not available in Python 3.6
+    daemon_threads = True
+
+
+class MockDataSource:
+    def __init__(self, fixtures=FIXTURES, tokens=0, recorded=None):
+        with open(fixtures, "r", encoding="utf-8") as fixtures_file:
+            json_fixtures = json.load(fixtures_file)
+
+        self.since = datetime.strptime(json_fixtures["since"], "%Y-%m-%d").date()
+        self.fiat = {k: Decimal(v) for k, v in json_fixtures["fiat"].items()}
+        self.crypto = {
+            k: {"name": v["name"], "usd": Decimal(v["usd"])}
+            for k, v in json_fixtures["crypto"].items()
+        }
+
+        # Extra tokens to simulate wallets with a large number of holdings
+        for i in range(tokens):
+            self.crypto[f"TKN{i}"] = {"name": f"Token {i}", "usd": Decimal(i + 1) / 100}
+
+        self.ids = {self.coin_id(k, v["name"]): k for k, v in self.crypto.items()}
+        self.recorded = ResponseReplay(ResponseReplay.MODE_REPLAY, recorded) if recorded else None
+
+    @staticmethod
+    def coin_id(symbol, name):
+        return f"{symbol.lower()}-{re.sub('[^a-z0-9]+', '-', name.lower())}"
+
+    def from_id(self, coin_id):
+        return self.ids.get(coin_id)
+
+    def usd(self, asset, day):
+        if asset in self.fiat:
+            return self.fiat[asset]
+
+        if asset not in self.crypto or day < self.since:
+            return None
+
+        # Deterministic wobble around the fixture price, so every day has a different close
+        phase = zlib.crc32(asset.encode("utf-8")) % 360
+        return self.crypto[asset]["usd"] * Decimal(
+            1 + 0.25 * math.sin(math.radians(day.toordinal() + phase))
+        )
+
+    def price(self, asset, quote, day=None):
+        day = day or date.today()
+        asset_usd = self.usd(asset, day)
+        quote_usd = self.usd(quote.upper(), day)
+        if asset_usd is None or not quote_usd:
+            return None
+        return float(round(asset_usd / quote_usd, 8))
+
+    def days(self, start, end):
+        day = max(start, self.since)
+        while day <= min(end, date.today()):
+            yield day
+            day += timedelta(days=1)
+
+    def response(self, host, path, query):
+        if self.recorded:
+            url = f"https://{host}{path}" + (f"?{query}" if query else "")
+            json_resp = self.recorded.load(url)
+            if json_resp is not None:
+                return 200, json_resp
+
+        params = {k: v[0] for k, v in parse_qs(query).items()}
+        handler = {
+            "api.bitty.tax": self.bittytax_api,
+            "api.frankfurter.app": self.frankfurter,
+            "api.coindesk.com": self.coindesk,
+            "min-api.cryptocompare.com": self.cryptocompare,
+            "api.coingecko.com": self.coingecko,
+            "api.coinpaprika.com": self.coinpaprika,
+        }.get(host)
+
+        json_resp = handler(path, params) if handler else None
+        if json_resp is None:
+            return 404, {"error": "Not Found"}
+        return 200, json_resp
+
+    def fiat_rates(self, path, asset, quotes):
+        day = date.today() if path.endswith("latest") else parse_date(path.split("/")[-1])
+        if day is None or asset not in self.fiat:
+            return None
+
+        rates = {q: self.price(asset, q, day) for q in quotes.split(",") if q in self.fiat}
+        return {"amount": 1.0, "base": asset, "date": f"{day:%Y-%m-%d}", "rates": rates}
+
+    def bittytax_api(self, path, params):
+        if path == "/v1/symbols":
+            return {"symbols": {k: f"Fiat {k}" for k in self.fiat}}
+        return self.fiat_rates(path, params.get("base"), params.get("symbols", ""))
+
+    def frankfurter(self, path, params):
+        if ".." in path:
+            return self.fiat_time_series(path, params.get("from"), params.get("to", ""))
+        return self.fiat_rates(path, params.get("from"), params.get("to", ""))
+
+    def fiat_time_series(self, path, asset, quotes):
+        start, end = (parse_date(d) for d in path.split("/")[-1].split(".."))
+        if start is None or end is None or asset not in self.fiat:
+            return None
+
+        # Like the real API, rates are only published for working days
+        days = [d for d in self.days(start, end) if d.weekday() < 5]
+        return {
+            "amount": 1.0,
+            "base": asset,
+            "start_date": f"{days[0]:%Y-%m-%d}" if days else None,
+            "end_date": f"{days[-1]:%Y-%m-%d}" if days else None,
+            "rates": {
+                f"{d:%Y-%m-%d}": {
+                    q: self.price(asset, q, d) for q in quotes.split(",") if q in self.fiat
+                }
+                for d in days
+            },
+        }
+
+    def coindesk(self, path, params):
+        if path == "/v1/bpi/currentprice.json":
+            return {"bpi": {q: {"code": q, "rate_float": self.price("BTC", q)} for q in self.fiat}}
+
+        if path == "/v1/bpi/historical/close.json":
+            quote = params.get("currency", "USD")
+            days = self.days(parse_date(params["start"]), parse_date(params["end"]))
+            return {"bpi": {f"{d:%Y-%m-%d}": self.price("BTC", quote, d) for d in days}}
+        return None
+
+    def cryptocompare(self, path, params):
+        if path == "/data/all/coinlist":
+            return {
+                "Data": {k: {"Symbol": k, "CoinName": v["name"]} for k, v in self.crypto.items()}
+            }
+
+        if path == "/data/price":
+            return self.cryptocompare_prices(params["fsym"], params["tsyms"])
+
+        if path == "/data/pricemulti":
+            return {
+                f: self.cryptocompare_prices(f, params["tsyms"])
+                for f in params["fsyms"].split(",")
+                if f in self.crypto
+            }
+
+        if path == "/data/histoday":
+            if params["fsym"] not in self.crypto:
+                return {"Response": "Error", "Message": "Market does not exist"}
+
+            end = datetime.fromtimestamp(int(params["toTs"]), timezone.utc).date()
+            days = self.days(end - timedelta(days=int(params["limit"])), end)
+            return {
+                "Response": "Success",
+                "Data": [
+                    {
+                        "time": epoch_time(d),
+                        "close": self.price(params["fsym"], params["tsym"], d) or 0,
+                    }
+                    for d in days
+                ],
+            }
+        return None
+
+    def cryptocompare_prices(self, asset, quotes):
+        prices = {q: self.price(asset, q) for q in quotes.split(",")}
+        return {k: v for k, v in prices.items() if v is not None}
+
+    def coingecko(self, path, params):
+        if path == "/api/v3/coins/list":
+            return [
+                {"id": self.coin_id(k, v["name"]), "symbol": k.lower(), "name": v["name"]}
+                for k, v in self.crypto.items()
+            ]
+
+        if path == "/api/v3/simple/price":
+            return {
+                coin_id: {
+                    q: self.price(self.from_id(coin_id), q)
+                    for q in params["vs_currencies"].split(",")
+                }
+                for coin_id in params["ids"].split(",")
+                if self.from_id(coin_id)
+            }
+
+        match = re.match(r"^/api/v3/coins/([^/]+)(/market_chart)?$", path)
+        if not match or not self.from_id(match.group(1)):
+            return None
+
+        asset = self.from_id(match.group(1))
+        if match.group(2):
+            quote = params["vs_currency"]
+            return {
+                "prices": [
+                    [epoch_time(d) * 1000, self.price(asset, quote, d)]
+                    for d in self.days(self.since, date.today())
+                ]
+            }
+        return {
+            "id": match.group(1),
+            "market_data": {"current_price": {q.lower(): self.price(asset, q) for q in self.fiat}},
+        }
+
+    def coinpaprika(self, path, params):
+        if path == "/v1/coins":
+            return [
+                {"id": self.coin_id(k, v["name"]), "symbol": k, "name": v["name"]}
+                for k, v in self.crypto.items()
+            ]
+
+        match = re.match(r"^/v1/tickers/([^/]+)(/historical)?$", path)
+        if not match or not self.from_id(match.group(1)):
+            return None
+
+        asset = self.from_id(match.group(1))
+        if match.group(2):
+            start = parse_date(params["start"])
+            days = self.days(start, start + timedelta(days=int(params["limit"]) - 1))
+            return [
+                {
+                    "timestamp": f"{d:%Y-%m-%d}T00:00:00Z",
+                    "price": self.price(asset, params["quote"], d),
+                }
+                for d in days
+            ]
+
+        quote = params.get("quotes", "USD")
+        return {"id": match.group(1), "quotes": {quote: {"price": self.price(asset, quote)}}}
+
+
+class MockServer(ThreadingHTTPServer):  # pylint: disable=too-many-instance-attributes
+    def __init__(self, address, mock, latency=0.0, rate_limit=0, fail_every=0, verbose=False):
+        super().__init__(address, MockRequestHandler)
+        self.mock = mock
+        self.verbose = verbose
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.rate_limited = {}
+        self.window = {}
+
+    def is_rate_limited(self, host):
+        with self.lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+            # Deterministic failures, every nth request to a host
+            limited = bool(self.fail_every and self.requests[host] % self.fail_every == 0)
+
+            # Requests per second, per host, over a sliding window
+            if self.rate_limit:
+                now = time.monotonic()
+                window = [t for t in self.window.get(host, []) if now - t < 1]
+                if len(window) >= self.rate_limit:
+                    limited = True
+                else:
+                    window.append(now)
+                self.window[host] = window
+
+            if limited:
+                self.rate_limited[host] = self.rate_limited.get(host, 0) + 1
+            return limited
+
+    def stats(self):
+        with self.lock:
+            return {
+                host: {"requests": count, "rate_limited": self.rate_limited.get(host, 0)}
+                for host, count in sorted(self.requests.items())
+            }
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.is_rate_limited(host):
+            self.send_json(429, {"error": "Too Many Requests"})
+        else:
+            self.send_json(*self.server.mock.response(host, "/" + path, parts.query))
+
+    def send_json(self, status, json_resp):
+        body = json.dumps(json_resp).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def parse_date(date_str):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def epoch_time(day):
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def start_server(port=0, tokens=0, recorded=None, **kwargs):
+    mock = MockDataSource(tokens=tokens, recorded=recorded)
+    server = MockServer(("127.0.0.1", port), mock, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local stand-in for the price data sources")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds to delay every response"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=0,
+        help="maximum requests per second for each host, beyond which 429 is returned",
+    )
+    parser.add_argument(
+        "--fail-every", type=int, default=0, help="return 429 for every nth request to a host"
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=0, help="number of extra tokens (TKN0, TKN1, ...) to list"
+    )
+    parser.add_argument("--recorded", help="directory of recorded responses to serve first")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = start_server(
+        args.port,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        fail_every=args.fail_every,
+        tokens=args.tokens,
+        recorded=args.recorded,
+        verbose=args.verbose,
+    )
+    print(f"serving on http://127.0.0.1:{server.server_address[1]} (Ctrl-C to stop)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+    server.shutdown()
+    json.dump(server.stats(), sys.stdout, indent=4)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+# Benchmark the price pipeline against the local data source stand-in.
+#
+# A temporary home directory is used so that the price cache starts empty, and every request is
+# routed to the mock server, so no network access is required.
+
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def run(args):
+    # pylint: disable=import-outside-toplevel
+    from bittytax.config import config
+    from bittytax.constants import TZ_UTC
+    from bittytax.price.valueasset import ValueAsset
+
+    config.debug = args.debug
+    results = {}
+
+    start = time.perf_counter()
+    value_asset = ValueAsset()
+    results["catalogues"] = time.perf_counter() - start
+
+    assets = {"BTC": 1, "ETH": 10}
+    assets.update({f"TKN{i}": i + 1 for i in range(args.tokens)})
+
+    start = time.perf_counter()
+    value_asset.get_current_values(assets)
+    results[f"holdings ({len(assets)} assets)"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    timestamp = datetime(2020, 1, 1, tzinfo=TZ_UTC)
+    lookups = 0
+    for day in range(args.days):
+        for asset in ("BTC", "ETH", "LTC", "EUR"):
+            value_asset.get_historical_price(asset, timestamp + timedelta(days=day))
+            lookups += 1
+    results[f"historical ({lookups} lookups)"] = time.perf_counter() - start
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the price pipeline offline")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock response delay (s)")
+    parser.add_argument("--rate-limit", type=int, default=0, help="mock requests/s per host")
+    parser.add_argument("--fail-every", type=int, default=0, help="mock 429 every nth request")
+    parser.add_argument("--tokens", type=int, default=100, help="number of tokens held")
+    parser.add_argument("--days", type=int, default=30, help="days of historical prices")
+    parser.add_argument("--recorded", help="directory of recorded responses to serve first")
+    parser.add_argument("-d", "--debug", action="store_true", help="enable debug output")
+    args = parser.parse_args()
+
+    # Removed last, after the price caches have been written at exit
+    home = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, home, ignore_errors=True)
+    os.environ["HOME"] = home
+    os.environ["USERPROFILE"] = home
+
+    # Imported only once HOME has been redirected, the cache location is fixed at import
+    from mock_datasource import start_server  # pylint: disable=import-outside-toplevel
+
+    server = start_server(
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        fail_every=args.fail_every,
+        tokens=args.tokens,
+        recorded=args.recorded,
+    )
+    os.environ["BITTYTAX_DATA_SOURCE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        results = run(args)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"ERROR {e!r}")
+        results = {}
+    finally:
+        server.shutdown()
+
+    for stage, elapsed in results.items():
+        print(f"{stage:<32} {elapsed:8.3f}s")
+
+    for host, stats in server.stats().items():
+        print(f"{host:<32} {stats['requests']:5} request(s) {stats['rate_limited']:5} rate limited")
+
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import argparse
+import copy
+
+from .audit import AuditRecords
+from .bittytax import do_each_tax_year, do_import, do_import_out, do_integrity_check, do_tax
+from .config import config
+from .constants import TAX_RULES_UK_COMPANY, TAX_RULES_UK_INDIVIDUAL
+from .context import Context
+from .conv.bittytax_conv import get_worksheets, read_files
+from .conv.datamerge import DataMerge
+from .conv.session import ConvSession
+from .exceptions import ApiError
+from .price.pricestore import get_price_store
+
+
+class Options(argparse.Namespace):  # pylint: disable=too-few-public-methods
+    DEFAULTS = {}
+
+    def __init__(self, **kwargs):
+        unknown = sorted(set(kwargs) - set(self.DEFAULTS))
+        if unknown:
+            raise TypeError(f"unexpected option(s): {', '.join(unknown)}")
+
+        super().__init__(**{**self.DEFAULTS, **kwargs})
+
+
+class ConvertOptions(Options):  # pylint: disable=too-few-public-methods
+    DEFAULTS = {
+        "unconfirmed": False,
+        "cryptoasset": None,
+        "duplicates": False,
+        "duplicates_key": ConvSession.DUPLICATES_KEY_ROW,
+        "offline": False,
+        "jobs": 1,
+        "cache": False,
+    }
+
+
+class CalculateOptions(Options):  # pylint: disable=too-few-public-methods
+    DEFAULTS = {
+        "taxyear": None,
+        "tax_rules": TAX_RULES_UK_INDIVIDUAL,
+        "skip_integrity": False,
+        "summary": False,
+        "report": None,
+    }
+
+
+class CalculateResult:  # pylint: disable=too-few-public-methods
+    def __init__(self, audit, tax, value_asset):
+        self.audit = audit
+        self.tax_report = tax.tax_report
+        self.holdings_report = tax.holdings_report
+        self.price_report = value_asset.price_report
+
+
+class ApiParser:
+    # Used in place of the command line parser, so errors are raised instead of exiting
+    prog = "bittytax"
+
+    @staticmethod
+    def error(message):
+        raise ApiError(message)
+
+    @staticmethod
+    def exit(status=0, message=None):
+        raise ApiError(message or str(status))
+
+
+def convert(filenames, options=None, context=None):
+    options = options or ConvertOptions()
+
+    call_context = _get_call_context(context)
+    call_context.conv_session = ConvSession(
+        options.duplicates, options.duplicates_key, options.offline, options.jobs
+    )
+
+    with call_context:
+        try:
+            read_files(ApiParser, filenames, options)
+
+            if call_context.conv_session.data_files:
+                DataMerge.match_merge(call_context.conv_session.data_files)
+
+            return list(call_context.conv_session.data_files_ordered)
+        finally:
+            if context is None:
+                get_price_store(call_context).save()
+
+
+def calculate(records, options=None, context=None):
+    options = options or CalculateOptions()
+
+    call_context = _get_call_context(context)
+    with call_context:
+        try:
+            return _calculate(records, options)
+        finally:
+            if context is None:
+                get_price_store(call_context).save()
+
+
+def _calculate(records, options):
+    if options.tax_rules in TAX_RULES_UK_COMPANY:
+        config.start_of_year_month = TAX_RULES_UK_COMPANY.index(options.tax_rules) + 1
+        config.start_of_year_day = 1
+
+    if isinstance(records, str):
+        transaction_records = do_import(records)
+    else:
+        transaction_records = do_import_out(get_worksheets(records))
+
+    audit = AuditRecords(transaction_records)
+    tax, value_asset = do_tax(transaction_records, options.tax_rules, options.skip_integrity)
+    if not options.skip_integrity and not do_integrity_check(audit, tax.holdings):
+        raise ApiError("integrity check failed")
+
+    if not options.summary:
+        tax.process_income()
+
+    do_each_tax_year(tax, options.taxyear, options.summary, value_asset)
+
+    if options.report:
+        from .report import ReportPdf  # pylint: disable=import-outside-toplevel
+
+        report_args = argparse.Namespace(**vars(options))
+        report_args.output_filename = options.report
+        ReportPdf(
+            ApiParser.prog,
+            audit,
+            tax.tax_report,
+            value_asset.price_report,
+            tax.holdings_report,
+            report_args,
+        )
+
+    return CalculateResult(audit, tax, value_asset)
+
+
+def _get_call_context(context):
+    # Each call has its own transaction IDs and conversion session, only the config and the
+    #  prices are shared, the config is copied so a call can change its tax year settings
+    if context is None:
+        return Context()
+    return Context(copy.copy(context.config), get_price_store(context))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from colorama import AnsiToWin32, Fore
+
+from . import api
+from .bittytax import validate_year
+from .config import Config, config
+from .constants import ERROR, TAX_RULES_UK_COMPANY, TAX_RULES_UK_INDIVIDUAL
+from .context import Context
+from .exceptions import ApiError, ImportFailureError, ImportFileError
+from .price.exceptions import DataSourceError
+from .price.pricestore import get_price_store
+from .price.valueasset import ValueAsset
+from .report import ReportPdf
+
+MANIFEST_HEADER = ("records", "taxrules", "taxyear", "output")
+SUMMARY_HEADER = ("records", "output", "status", "error", "time")
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+# Set in the parent before the workers are started, so it's shared with any forked workers
+_context = None
+
+
+def main(prog, argv):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="calculate tax for many sets of transaction records, sharing one price cache",
+        epilog="the manifest is a CSV file with the columns: "
+        f"{', '.join(MANIFEST_HEADER)}, taxrules and taxyear can be left blank",
+    )
+    parser.add_argument("manifest", type=str, help="filename of the batch manifest")
+    parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of calculations to run in parallel, default: number of CPUs",
+    )
+    parser.add_argument(
+        "--skipint",
+        dest="skip_integrity",
+        action="store_true",
+        help="skip integrity check",
+    )
+    parser.add_argument(
+        "-o", dest="output_filename", type=str, help="specify the filename for the batch summary"
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("argument -j/--jobs: must be at least 1")
+
+    try:
+        clients = read_manifest(args.manifest)
+    except IOError:
+        parser.exit(f"{ERROR} File could not be read: {args.manifest}")
+    except ValueError as e:
+        parser.exit(f"{ERROR} {e}")
+
+    context = _init_context(config.config, args.debug)
+    results = run_batch(clients, context, args)
+
+    # Prices are only written here, not by each worker
+    get_price_store(context).save()
+
+    failures = output_summary(results)
+    if args.output_filename:
+        write_summary(args.output_filename, results)
+
+    if failures:
+        sys.exit(1)
+
+
+def read_manifest(filename):
+    with open(filename, newline="", encoding="utf-8") as manifest_file:
+        reader = csv.DictReader(manifest_file)
+        missing = [col for col in ("records", "output") if col not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing column(s): {', '.join(missing)}")
+
+        return [
+            {col: (row.get(col) or "").strip() for col in MANIFEST_HEADER}
+            for row in reader
+            if any(row.values())
+        ]
+
+
+def run_batch(clients, context, args):
+    global _context  # pylint: disable=global-statement
+    _context = context
+
+    results = [None] * len(clients)
+    with ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=_init_worker,
+        initargs=(context.config.config, context.config.debug),
+    ) as executor:
+        futures = {
+            executor.submit(run_client, client, args.skip_integrity): index
+            for index, client in enumerate(clients)
+        }
+        for future in as_completed(futures):
+            result, new_prices = future.result()
+            # Any prices looked up by a worker are added, so they are all saved together
+            get_price_store(context).add_prices(new_prices)
+            results[futures[future]] = result
+
+            sys.stderr.write(
+                f"{Fore.WHITE}batch: {Fore.YELLOW}{result['records']} "
+                f"{Fore.GREEN if result['status'] == STATUS_OK else Fore.RED}"
+                f"{result['status']}{Fore.RESET}\n"
+            )
+
+    return results
+
+
+def _init_context(settings, debug):
+    context = Context(config=Config(settings))
+    context.config.debug = debug
+
+    # Loaded once, so each worker starts with the data sources and prices already loaded
+    with context:
+        ValueAsset()
+    ReportPdf.get_env().get_template(ReportPdf.TEMPLATE_FILE)
+    return context
+
+
+def _init_worker(settings, debug):
+    global _context  # pylint: disable=global-statement
+    if _context is None:
+        # Not forked, so the context has to be loaded by each worker
+        _context = _init_context(settings, debug)
+
+
+def run_client(client, skip_integrity):
+    start = time.time()
+    result = {"records": client["records"], "output": client["output"], "error": ""}
+
+    # The output of each calculation is kept in a log file next to its report
+    log_filename = os.path.splitext(client["output"])[0] + ".log"
+    stdout, stderr = sys.stdout, sys.stderr
+    try:
+        options = get_options(client)
+        options.skip_integrity = skip_integrity
+        with open(log_filename, "w", encoding="utf-8") as log_file:
+            sys.stdout = sys.stderr = AnsiToWin32(log_file, convert=False, strip=True).stream
+            api.calculate(client["records"], options, _context)
+    except (
+        ApiError,
+        ImportFailureError,
+        ImportFileError,
+        DataSourceError,
+        ValueError,
+        IOError,
+    ) as e:
+        result["status"] = STATUS_FAILED
+        result["error"] = str(e) or e.__class__.__name__
+    except Exception as e:  # pylint: disable=broad-except
+        # One set of records should not stop the rest of the batch
+        result["status"] = STATUS_FAILED
+        result["error"] = f'Unexpected error: "{e}"'
+    else:
+        result["status"] = STATUS_OK
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+    result["time"] = f"{time.time() - start:.2f}"
+    return result, get_price_store(_context).take_new_prices()
+
+
+def get_options(client):
+    options = api.CalculateOptions(report=client["output"])
+
+    if client["taxrules"]:
+        options.tax_rules = client["taxrules"].upper()
+        if options.tax_rules not in [TAX_RULES_UK_INDIVIDUAL] + TAX_RULES_UK_COMPANY:
+            raise ValueError(f"Tax rules {client['taxrules']} is not supported")
+
+    if client["taxyear"]:
+        try:
+            options.taxyear = validate_year(client["taxyear"])
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e)) from e
+
+    return options
+
+
+def output_summary(results):
+    failures = [result for result in results if result["status"] != STATUS_OK]
+
+    for result in failures:
+        print(f"{ERROR} {result['records']}: {result['error']}")
+
+    print(
+        f"{Fore.WHITE}batch {'successful' if not failures else 'failure'} "
+        f"(success={len(results) - len(failures)}, failure={len(failures)})"
+    )
+    return len(failures)
+
+
+def write_summary(filename, results):
+    with open(filename, "w", newline="", encoding="utf-8") as summary_file:
+        writer = csv.DictWriter(summary_file, SUMMARY_HEADER)
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"{Fore.WHITE}batch summary created: {Fore.YELLOW}{filename}")
@@ -4,7 +4,7 @@
 
 import argparse
 import codecs
-import io
+import importlib
 import os
 import platform
 import sys
@@ -15,12 +15,11 @@ from colorama import Fore
 from .audit import AuditRecords
 from .config import config
 from .constants import ERROR, TAX_RULES_UK_COMPANY, TAX_RULES_UK_INDIVIDUAL, WARNING
-from .exceptions import ImportFailureError
+from .exceptions import ImportFailureError, ImportFileError
 from .export_records import ExportRecords
 from .import_records import ImportRecords
 from .price.exceptions import DataSourceError
 from .price.valueasset import ValueAsset
-from .report import ReportLog, ReportPdf
 from .tax import CalculateCapitalGains as CCG
 from .tax import TaxCalculator
 from .transactions import TransactionHistory
@@ -33,9 +32,26 @@ if sys.stdout.encoding != "UTF-8":
         sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
 
 
+COMMANDS = {
+    "batch": "calculate tax for many sets of records, from a manifest",
+    "serve": "run a calculation service",
+}
+
+
 def main():
     colorama.init()
-    parser = argparse.ArgumentParser()
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        # Commands are only imported when they are used
+        command = importlib.import_module(f".{sys.argv[1]}", __package__)
+        command.main(f"{os.path.basename(sys.argv[0])} {sys.argv[1]}", sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        epilog="commands:\n"
+        + "".join(f"  {name:<22}{desc}\n" for name, desc in COMMANDS.items())
+        + "\nuse '%(prog)s [command] --help' for the arguments of a command",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
     parser.add_argument(
         "filename",
         type=str,
@@ -49,6 +65,43 @@ def main():
         version=f"{parser.prog} v{__version__}",
     )
     parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    add_tax_arguments(parser)
+    parser.add_argument(
+        "-o",
+        dest="output_filename",
+        type=str,
+        help="specify the output filename for the tax report",
+    )
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help="export your transaction records populated with price data",
+    )
+
+    args = parser.parse_args()
+    config.debug = args.debug
+
+    if config.debug:
+        print(f"{Fore.YELLOW}{parser.prog} v{__version__}")
+        print(f"{Fore.GREEN}python: v{platform.python_version()}")
+        print(f"{Fore.GREEN}system: {platform.system()}, release: {platform.release()}")
+        config.output_config(sys.stdout)
+
+    try:
+        transaction_records = do_import(args.filename)
+    except (IOError, ImportFileError):
+        parser.exit(f"{ERROR} File could not be read: {args.filename}")
+    except ImportFailureError:
+        parser.exit()
+
+    if args.export:
+        do_export(transaction_records)
+        parser.exit()
+
+    do_tax_report(parser, transaction_records, args)
+
+
+def add_tax_arguments(parser):
     parser.add_argument(
         "-ty",
         "--taxyear",
@@ -79,47 +132,21 @@ def main():
         action="store_true",
         help="only output the capital gains summary in the tax report",
     )
-    parser.add_argument(
-        "-o",
-        dest="output_filename",
-        type=str,
-        help="specify the output filename for the tax report",
-    )
     parser.add_argument(
         "--nopdf",
         action="store_true",
         help="don't output PDF report, output report to terminal only",
     )
-    parser.add_argument(
-        "--export",
-        action="store_true",
-        help="export your transaction records populated with price data",
-    )
 
-    args = parser.parse_args()
-    config.debug = args.debug
 
-    if config.debug:
-        print(f"{Fore.YELLOW}{parser.prog} v{__version__}")
-        print(f"{Fore.GREEN}python: v{platform.python_version()}")
-        print(f"{Fore.GREEN}system: {platform.system()}, release: {platform.release()}")
-        config.output_config(sys.stdout)
+def do_tax_report(parser, transaction_records, args):
+    # The report libraries are slow to load, so are only imported when they are needed
+    from .report import ReportLog, ReportPdf  # pylint: disable=import-outside-toplevel
 
     if args.tax_rules in TAX_RULES_UK_COMPANY:
         config.start_of_year_month = TAX_RULES_UK_COMPANY.index(args.tax_rules) + 1
         config.start_of_year_day = 1
 
-    try:
-        transaction_records = do_import(args.filename)
-    except IOError:
-        parser.exit(f"{ERROR} File could not be read: {args.filename}")
-    except ImportFailureError:
-        parser.exit()
-
-    if args.export:
-        do_export(transaction_records)
-        parser.exit()
-
     audit = AuditRecords(transaction_records)
 
     try:
@@ -165,24 +192,29 @@ def do_import(filename):
     import_records = ImportRecords()
 
     if filename:
-        _, file_extension = os.path.splitext(filename)
-        if file_extension == ".xlsx":
-            import_records.import_excel_xlsx(filename)
-        elif file_extension == ".xls":
-            import_records.import_excel_xls(filename)
-        else:
-            with io.open(filename, newline="", encoding="utf-8") as csv_file:
-                import_records.import_csv(csv_file)
+        import_records.import_file(filename)
     else:
         import_records.import_csv(sys.stdin)
 
+    return get_import_records(import_records)
+
+
+def do_import_out(worksheets):
+    import_records = ImportRecords()
+    for worksheet_name, out_records in worksheets:
+        import_records.import_out_records(out_records, worksheet_name)
+
+    return get_import_records(import_records)
+
+
+def get_import_records(import_records):
     print(
         f"{Fore.WHITE}import {'successful' if import_records.failure_cnt <= 0 else 'failure'} "
         f"(success={import_records.success_cnt}, failure={import_records.failure_cnt})"
     )
 
     if import_records.failure_cnt > 0:
-        raise ImportFailureError
+        raise ImportFailureError([t_row for t_row in import_records.t_rows if t_row.failure])
 
     return import_records.get_records()
 
@@ -2,15 +2,17 @@
 # (c) Nano Nano Ltd 2019
 
 import os
+import pkgutil
 import sys
+import threading
 from datetime import datetime, timedelta
 
 import dateutil.tz
-import pkg_resources
 import yaml
 from colorama import Fore
 
 from .constants import BITTYTAX_PATH, ERROR
+from .context import get_context
 
 
 class Config:
@@ -29,9 +31,16 @@ class Config:
     TRADE_ALLOWABLE_COST_SELL = 1
     TRADE_ALLOWABLE_COST_SPLIT = 2
 
+    OBSERVED_PRICES_NONE = 0
+    OBSERVED_PRICES_FALLBACK = 1
+    OBSERVED_PRICES_PRIORITY = 2
+
     DATA_SOURCE_FIAT = ["BittyTaxAPI"]
     DATA_SOURCE_CRYPTO = ["CryptoCompare", "CoinGecko"]
 
+    # Days before a missing price is looked up again, by how many days old its date was
+    PRICE_CACHE_MISSING_TTL = [[7, 1], [90, 7], [365, 30]]
+
     DEFAULT_CONFIG = {
         "local_currency": "GBP",
         "fiat_list": FIAT_LIST,
@@ -48,27 +57,49 @@ class Config:
         "data_source_select": {},
         "data_source_fiat": DATA_SOURCE_FIAT,
         "data_source_crypto": DATA_SOURCE_CRYPTO,
+        "observed_prices": OBSERVED_PRICES_NONE,
+        "price_cache_layers": [],
+        "price_cache_missing_ttl": {"default": PRICE_CACHE_MISSING_TTL},
         "usernames": [],
         "coinbase_zero_fees_are_gifts": False,
         "binance_multi_bnb_split_even": False,
     }
 
-    def __init__(self):
+    def __init__(self, settings=None):
         self.debug = False
         self.start_of_year_month = 4
         self.start_of_year_day = 6
 
-        if not os.path.exists(BITTYTAX_PATH):
-            os.mkdir(BITTYTAX_PATH)
+        if settings is not None:
+            self.config = dict(settings)
+        else:
+            self.config = self._load()
+
+        for name, default in self.DEFAULT_CONFIG.items():
+            if name not in self.config:
+                self.config[name] = default
+
+        self.ccy = self.config["local_currency"]
+        self.asset_priority = self.config["fiat_list"] + self.config["crypto_list"]
+
+    def _load(self):
+        os.makedirs(BITTYTAX_PATH, exist_ok=True)
 
         if not os.path.exists(os.path.join(BITTYTAX_PATH, self.BITTYTAX_CONFIG)):
-            default_conf = pkg_resources.resource_string(__name__, "config/" + self.BITTYTAX_CONFIG)
-            with open(os.path.join(BITTYTAX_PATH, self.BITTYTAX_CONFIG), "wb") as config_file:
+            # Written to a temporary file, which is renamed into place, so another thread or
+            #  process never reads it half written
+            default_conf = pkgutil.get_data(__name__, "config/" + self.BITTYTAX_CONFIG)
+            tmp_filename = os.path.join(
+                BITTYTAX_PATH,
+                f"{self.BITTYTAX_CONFIG}.{os.getpid()}.{threading.get_ident()}.tmp",
+            )
+            with open(tmp_filename, "wb") as config_file:
                 config_file.write(default_conf)
+            os.replace(tmp_filename, os.path.join(BITTYTAX_PATH, self.BITTYTAX_CONFIG))
 
         try:
             with open(os.path.join(BITTYTAX_PATH, self.BITTYTAX_CONFIG), "rb") as config_file:
-                self.config = yaml.safe_load(config_file)
+                return yaml.safe_load(config_file)
         except IOError:
             sys.stderr.write(
                 f"{ERROR}Config file cannot be loaded: "
@@ -79,14 +110,10 @@ class Config:
             sys.stderr.write(f"{ERROR}Config file contains an error:\n{e}\n")
             sys.exit(1)
 
-        for name, default in self.DEFAULT_CONFIG.items():
-            if name not in self.config:
-                self.config[name] = default
-
-        self.ccy = self.config["local_currency"]
-        self.asset_priority = self.config["fiat_list"] + self.config["crypto_list"]
-
     def __getattr__(self, name):
+        if name.startswith("__") or name == "config":
+            # Not a setting, i.e. copy or pickle looking for a special method
+            raise AttributeError(name)
         return self.config[name]
 
     def output_config(self, sys_out):
@@ -148,4 +175,21 @@ class Config:
         return f"{start:%Y}/{end:%y}"
 
 
-config = Config()
+class ContextConfig:
+    # Settings are looked up in the current context, so each context can have its own config
+
+    def __getattr__(self, name):
+        return getattr(get_config(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_config(), name, value)
+
+
+def get_config():
+    context = get_context()
+    if context.config is None:
+        context.config = Config()
+    return context.config
+
+
+config = ContextConfig()
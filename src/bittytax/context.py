@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import threading
+
+_local = threading.local()
+
+
+class Context:
+    def __init__(self, config=None, price_store=None):
+        # The config and price store are loaded when they are first used, if not given
+        self.config = config
+        self.price_store = price_store
+        self.tids = TidAllocator()
+        self.conv_session = None
+
+    def __enter__(self):
+        # Contexts are stacked for each thread, so the same context can be used by many threads
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _local.stack.pop()
+
+    def bind(self, func):
+        # Work handed to another thread has to run in the same context
+        def run_in_context(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return run_in_context
+
+
+class TidAllocator:  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.cnt = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            self.cnt += 1
+            return self.cnt
+
+
+def get_context():
+    stack = getattr(_local, "stack", None)
+    if stack:
+        return stack[-1]
+    return DEFAULT_CONTEXT
+
+
+DEFAULT_CONTEXT = Context()
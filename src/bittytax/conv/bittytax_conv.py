@@ -5,28 +5,37 @@ import argparse
 import codecs
 import errno
 import glob
-import hashlib
 import os
 import platform
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 
 import colorama
 from colorama import Fore
 
+from ..bittytax import add_tax_arguments, do_import_out, do_tax_report
 from ..config import config
 from ..constants import FORMAT_CSV, FORMAT_EXCEL, FORMAT_RECAP
+from ..context import get_context
+from ..exceptions import ImportFailureError
+from ..price.pricestore import get_price_store
 from ..version import __version__
+from .datacache import DataCache
 from .datafile import DataFile
 from .datamerge import DataMerge
 from .dataparser import DataParser
 from .exceptions import (
     DataFilenameError,
     DataFormatUnrecognised,
+    MissingRateError,
     UnknownCryptoassetError,
     UnknownUsernameError,
 )
+from .hashedfile import HashedFile
+from .jobs import CapturedStream, init_job, init_job_args
 from .output_csv import OutputCsv
-from .output_excel import OutputExcel
+from .session import ConvSession, get_session
 
 if sys.stderr.encoding != "UTF-8":
     if sys.version_info[:2] >= (3, 7):
@@ -66,6 +75,14 @@ def main():
         action="store_true",
         help="remove any duplicate input rows across data files",
     )
+    parser.add_argument(
+        "--duplicates-key",
+        choices=[DataFile.DUPLICATES_KEY_ROW, DataFile.DUPLICATES_KEY_TRANSACTION],
+        default=DataFile.DUPLICATES_KEY_ROW,
+        type=str.upper,
+        help="specify how duplicates are identified, by the input row or by the transaction "
+        "(timestamp, assets, quantities and transaction ID), default: ROW",
+    )
     parser.add_argument(
         "--format",
         choices=[FORMAT_EXCEL, FORMAT_CSV, FORMAT_RECAP],
@@ -84,10 +101,46 @@ def main():
     )
     parser.add_argument("-s", "--sort", action="store_true", help="sort CSV output by timestamp")
     parser.add_argument("-o", dest="output_filename", type=str, help="specify the output filename")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of data files to read and parse, and wallets to merge, in parallel, "
+        "default: 1",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use exchange rates from the price cache, error if a rate is not cached",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="cache the parsed data files, so only new or changed files are parsed again",
+    )
+    parser.add_argument(
+        "--calc",
+        action="store_true",
+        help="calculate tax directly from the converted records, instead of writing them to an "
+        "output file, the records are also written if an output filename is specified",
+    )
+    tax_parser = parser.add_argument_group("tax calculation arguments (with --calc)")
+    add_tax_arguments(tax_parser)
+    tax_parser.add_argument(
+        "--report",
+        dest="report_filename",
+        type=str,
+        help="specify the output filename for the tax report",
+    )
 
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("argument -j/--jobs: must be at least 1")
+
     config.debug = args.debug
-    DataFile.remove_duplicates = args.duplicates
+    session = ConvSession(args.duplicates, args.duplicates_key, args.offline, args.jobs)
+    get_context().conv_session = session
 
     if config.debug:
         sys.stderr.write(f"{Fore.YELLOW}{parser.prog} v{__version__}\n")
@@ -97,95 +150,354 @@ def main():
         )
         config.output_config(sys.stderr)
 
-    file_hashes = set()
+    pathnames = []
     for filename in args.filename:
-        pathnames = glob.glob(filename, recursive=True)
-        if not pathnames:
-            pathnames = [filename]
+        pathnames.extend(glob.glob(filename, recursive=True) or [filename])
+
+    streams = _get_streams(pathnames, args)
+    if streams:
+        # Rows are converted and written as they are read
+        output = OutputCsv(_stream_files(parser, pathnames, streams, args), args)
+        sys.stderr.write(Fore.RESET)
+        sys.stderr.flush()
+        output.write_csv()
+    else:
+        read_files(parser, pathnames, args)
+
+        if session.data_files:
+            DataMerge.match_merge(session.data_files)
+
+            if args.calc:
+                _calculate(parser, args)
+            else:
+                _write_output(parser.prog, args)
+
+    if not session.data_files_ordered:
+        sys.stderr.write(Fore.RESET)
+        parser.exit(3, f"{parser.prog}: error: no data file(s) could be processed\n")
+
 
+def _write_output(progname, args):
+    if args.format == FORMAT_EXCEL:
+        from .output_excel import OutputExcel  # pylint: disable=import-outside-toplevel
+
+        output = OutputExcel(progname, get_session().data_files_ordered, args)
+        output.write_excel()
+    else:
+        output = OutputCsv(get_session().data_files_ordered, args)
+        sys.stderr.write(Fore.RESET)
+        sys.stderr.flush()
+        output.write_csv()
+
+
+def _calculate(parser, args):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if args.output_filename:
+            # Records are only written for audit, so this can be done while the tax is calculated
+            output = executor.submit(_write_output, parser.prog, args)
+        else:
+            output = None
+
+        try:
+            sys.stderr.write(Fore.RESET)
+            sys.stderr.flush()
+            try:
+                transaction_records = do_import_out(
+                    get_worksheets(get_session().data_files_ordered)
+                )
+            except ImportFailureError:
+                parser.exit()
+
+            tax_args = argparse.Namespace(**vars(args))
+            tax_args.output_filename = args.report_filename
+            do_tax_report(parser, transaction_records, tax_args)
+        finally:
+            if output:
+                output.result()
+
+
+def get_worksheets(data_files):
+    # Records are imported in the same order as they would be from the EXCEL output
+    for data_file in sorted(data_files, key=lambda df: df.parser.worksheet_name):
+        data_rows = sorted(data_file.data_rows, key=lambda dr: dr.timestamp)
+        yield data_file.parser.worksheet_name, [
+            t_record for data_row in data_rows for t_record in data_row.get_t_records()
+        ]
+
+
+def read_files(parser, pathnames, args):
+    cache = DataCache(args) if args.cache else None
+    cached = {}
+    if cache:
+        for pathname in pathnames:
+            if not os.path.isdir(pathname) and pathname not in cached:
+                result = _get_cached(cache, pathname)
+                if result:
+                    cached[pathname] = result
+
+    jobs = {}
+    executor = None
+    if args.jobs > 1:
+        # Files are read and parsed by the workers, but are consolidated here in the same order
+        executor = ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=init_job,
+            initargs=init_job_args(),
+        )
+        for pathname in pathnames:
+            if not os.path.isdir(pathname) and pathname not in jobs and pathname not in cached:
+                jobs[pathname] = executor.submit(_read_file_job, pathname, args)
+
+    file_hashes = {}
+    try:
         for pathname in pathnames:
             if os.path.isdir(pathname):
                 sys.stderr.write(_file_msg(pathname, None, msg="is a directory"))
                 continue
 
-            try:
-                file_type, file_hash = _get_file_info(pathname)
-                if file_hash in file_hashes:
-                    sys.stderr.write(_file_msg(pathname, None, msg="skipping duplicate"))
-                else:
-                    file_hashes.add(file_hash)
-                    _do_read_file(file_type, pathname, args)
-
-            except UnknownCryptoassetError as e:
-                sys.stderr.write(Fore.RESET)
-                parser.error(f"{e}, please specify using the [-ca CRYPTOASSET] option")
-            except UnknownUsernameError as e:
-                sys.stderr.write(Fore.RESET)
-                parser.exit(
-                    f"{parser.prog}: error: {e}, please specify usernames in the "
-                    f"{config.BITTYTAX_CONFIG} file"
-                )
-            except DataFilenameError as e:
-                sys.stderr.write(Fore.RESET)
-                parser.exit(f"{parser.prog}: error: {e}")
-            except DataFormatUnrecognised:
-                sys.stderr.write(_file_msg(pathname, None, msg="unrecognised"))
-            except IOError as e:
-                if e.errno == errno.ENOENT:
-                    sys.stderr.write(_file_msg(pathname, None, msg="no such file or directory"))
+            with _file_errors(parser, pathname):
+                if pathname in cached:
+                    _do_read_job(pathname, cached.pop(pathname), file_hashes)
+                elif pathname in jobs:
+                    result = jobs.pop(pathname).result()
+                    _put_cached(cache, result)
+                    _do_read_job(pathname, result, file_hashes)
+                elif cache:
+                    result = _read_file(pathname, args) + ({},)
+                    _put_cached(cache, result)
+                    _do_read_job(pathname, result, file_hashes)
                 else:
-                    sys.stderr.write(_file_msg(pathname, None, msg="read error"))
+                    _do_read(pathname, args, file_hashes)
+    finally:
+        if executor:
+            for job in jobs.values():
+                job.cancel()
+            executor.shutdown()
 
-    if DataFile.data_files:
-        DataMerge.match_merge(DataFile.data_files)
 
-        if args.format == FORMAT_EXCEL:
-            output = OutputExcel(parser.prog, DataFile.data_files_ordered, args)
-            output.write_excel()
-        else:
-            output = OutputCsv(DataFile.data_files_ordered, args)
-            sys.stderr.write(Fore.RESET)
-            sys.stderr.flush()
-            output.write_csv()
-    else:
+def _get_cached(cache, pathname):
+    try:
+        result = cache.get(_get_file_hash(pathname))
+    except IOError:
+        return None
+
+    if result and config.debug:
+        sys.stderr.write(f"{Fore.CYAN}conv: using cached data file(s) for {pathname}\n")
+    return result
+
+
+def _put_cached(cache, result):
+    file_hash, _, error, latest_rates, _ = result
+    # Only data files which were read without error are cached, errors are reported every time,
+    #  nor are those converted at the latest rates, so they are converted again the next day
+    if cache and file_hash and not error and not latest_rates:
+        cache.put(file_hash[1], result[:4] + ({},))
+
+
+@contextmanager
+def _file_errors(parser, pathname):
+    try:
+        yield
+    except UnknownCryptoassetError as e:
         sys.stderr.write(Fore.RESET)
-        parser.exit(3, f"{parser.prog}: error: no data file(s) could be processed\n")
+        parser.error(f"{e}, please specify using the [-ca CRYPTOASSET] option")
+    except UnknownUsernameError as e:
+        sys.stderr.write(Fore.RESET)
+        parser.exit(
+            f"{parser.prog}: error: {e}, please specify usernames in the "
+            f"{config.BITTYTAX_CONFIG} file"
+        )
+    except (DataFilenameError, MissingRateError) as e:
+        sys.stderr.write(Fore.RESET)
+        parser.exit(f"{parser.prog}: error: {e}")
+    except DataFormatUnrecognised:
+        sys.stderr.write(_file_msg(pathname, None, msg="unrecognised"))
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            sys.stderr.write(_file_msg(pathname, None, msg="no such file or directory"))
+        else:
+            sys.stderr.write(_file_msg(pathname, None, msg="read error"))
+
+
+def _get_streams(pathnames, args):
+    # Data files can only be streamed straight to the CSV output, if none of them need all their
+    #  rows to be parsed together, or have to be sorted, consolidated or merged
+    if args.format == FORMAT_EXCEL or args.sort or args.jobs > 1 or args.calc or args.cache:
+        return set()
+
+    if config.debug:
+        sys.stderr.write(f"{Fore.CYAN}conv: checking if data files can be streamed\n")
+
+    streams = set()
+    data_files = []
+    for pathname in pathnames:
+        if os.path.isdir(pathname):
+            continue
+
+        try:
+            with HashedFile(pathname) as df:
+                if df.file_type:
+                    return set()
+                _, data_parser = DataFile.match_csv(df)
+        except IOError:
+            continue
+
+        if data_parser is None:
+            continue
+
+        data_file = DataFile(data_parser, [])
+        if data_parser.all_handler or (
+            data_parser.p_type != DataParser.TYPE_GENERIC and data_file in data_files
+        ):
+            return set()
+
+        data_files.append(data_file)
+        streams.add(pathname)
+
+    if any(DataMerge.get_matches(data_files)):
+        return set()
+
+    return streams
+
 
+def _stream_files(parser, pathnames, streams, args):
+    file_hashes = {}
+    for pathname in pathnames:
+        if os.path.isdir(pathname):
+            sys.stderr.write(_file_msg(pathname, None, msg="is a directory"))
+            continue
 
-def _do_read_file(file_type, pathname, args):
-    if file_type == "zip":
-        for worksheet in DataFile.read_excel_xlsx(pathname):
+        with _file_errors(parser, pathname):
+            if pathname not in streams:
+                _do_read(pathname, args, file_hashes)
+                continue
+
+            with HashedFile(pathname) as df:
+                if _is_duplicate(pathname, df, file_hashes):
+                    sys.stderr.write(_file_msg(pathname, None, msg="skipping duplicate"))
+                    continue
+
+                try:
+                    data_file = DataFile.read_csv(pathname, df, args, stream=True)
+                    DataFile.consolidate_datafiles(data_file)
+                    data_file.data_rows = _stream_rows(parser, pathname, data_file.data_rows)
+                    yield data_file
+                finally:
+                    file_hashes.setdefault(df.sample_key, set()).add(df.hexdigest())
+
+
+def _stream_rows(parser, pathname, data_rows):
+    # Rows are parsed as they are written, so any errors are reported from here
+    with _file_errors(parser, pathname):
+        yield from data_rows
+        return
+
+    # Some rows have already been written, so stop, instead of leaving the output incomplete
+    sys.stderr.write(Fore.RESET)
+    parser.exit(f"{parser.prog}: error: {pathname} could not be converted")
+
+
+def _do_read(pathname, args, file_hashes):
+    with HashedFile(pathname) as df:
+        if _is_duplicate(pathname, df, file_hashes):
+            sys.stderr.write(_file_msg(pathname, None, msg="skipping duplicate"))
+            return
+
+        try:
+            for data_file in _do_read_file(df, pathname, args):
+                DataFile.consolidate_datafiles(data_file)
+        finally:
+            file_hashes.setdefault(df.sample_key, set()).add(df.hexdigest())
+
+
+def _do_read_file(df, pathname, args):
+    if df.file_type == "zip":
+        for worksheet in DataFile.read_excel_xlsx(pathname, df):
             try:
-                DataFile.read_worksheet_xlsx(worksheet, pathname, args)
+                yield DataFile.read_worksheet_xlsx(worksheet, pathname, args)
             except DataFormatUnrecognised:
                 sys.stderr.write(_file_msg(pathname, worksheet.title, msg="unrecognised"))
-    elif file_type == "xls":
-        for worksheet, datemode in DataFile.read_excel_xls(pathname):
+    elif df.file_type == "xls":
+        for worksheet, datemode in DataFile.read_excel_xls(pathname, df):
             try:
-                DataFile.read_worksheet_xls(worksheet, datemode, pathname, args)
+                yield DataFile.read_worksheet_xls(worksheet, datemode, pathname, args)
             except (DataFormatUnrecognised, ValueError):
                 sys.stderr.write(_file_msg(pathname, worksheet.name, msg="unrecognised"))
     else:
-        DataFile.read_csv(pathname, args)
+        yield DataFile.read_csv(pathname, df, args)
+
+
+def _read_file_job(pathname, args):
+    result = _read_file(pathname, args)
+    # Any prices looked up by the worker are returned, so they are saved in the cache
+    return result + (get_price_store().take_new_prices(),)
+
+
+def _read_file(pathname, args):
+    # Output is captured so it can be replayed in order by the parent, or from the cache
+    output = []
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = CapturedStream("stdout", output)
+    sys.stderr = CapturedStream("stderr", output)
+    file_hash = None
+    error = None
+    session = get_session()
+    session.latest_rates = False
+
+    try:
+        with HashedFile(pathname) as df:
+            try:
+                for data_file in _do_read_file(df, pathname, args):
+                    output.append((None, data_file))
+            finally:
+                file_hash = df.sample_key, df.hexdigest()
+    except (
+        UnknownCryptoassetError,
+        UnknownUsernameError,
+        DataFilenameError,
+        DataFormatUnrecognised,
+        MissingRateError,
+        IOError,
+    ) as e:
+        error = e
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+    return file_hash, output, error, session.latest_rates
+
+
+def _do_read_job(pathname, result, file_hashes):
+    file_hash, output, error, _, new_prices = result
+    if new_prices:
+        # Any prices looked up by the worker are added, so they are saved in the cache
+        get_price_store().add_prices(new_prices)
+
+    if file_hash:
+        sample_key, file_hash = file_hash
+        if file_hash in file_hashes.get(sample_key, ()):
+            sys.stderr.write(_file_msg(pathname, None, msg="skipping duplicate"))
+            return
+
+        file_hashes.setdefault(sample_key, set()).add(file_hash)
+
+    for stream, content in output:
+        if stream is None:
+            DataFile.consolidate_datafiles(content)
+        else:
+            getattr(sys, stream).write(content)
 
+    if error:
+        raise error
 
-def _get_file_info(filename):
-    file_type = None
 
-    with open(filename, "rb") as df:
-        file_hash = hashlib.sha1()
-        chunk = df.read(8192)
-        if chunk[0:8] == b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1":
-            file_type = "xls"
-        elif chunk[0:4] == b"\x50\x4B\x03\x04":
-            # xlsx is a zip file, let openpyxl unpack and check
-            file_type = "zip"
+def _is_duplicate(pathname, df, file_hashes):
+    # Only a file which starts the same as a previous one needs to be hashed before reading
+    return df.sample_key in file_hashes and _get_file_hash(pathname) in file_hashes[df.sample_key]
 
-        while chunk:
-            file_hash.update(chunk)
-            chunk = df.read(8192)
 
-    return file_type, file_hash.hexdigest()
+def _get_file_hash(filename):
+    with HashedFile(filename) as df:
+        return df.hexdigest()
 
 
 def _file_msg(filename, worksheet_name, msg):
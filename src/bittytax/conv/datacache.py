@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from colorama import Fore
+
+from ..config import config
+from ..constants import CACHE_DIR
+from ..version import __version__
+
+
+class DataCache:
+    CACHE_DIR = os.path.join(CACHE_DIR, "conv")
+    FILE_EXTENSION = "pickle"
+    # Entries not used for this long are removed
+    MAX_AGE_DAYS = 90
+
+    def __init__(self, args):
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+
+        self.key = self._get_key(args)
+        self._prune()
+
+    @staticmethod
+    def _get_key(args):
+        # Anything which can change how a data file is parsed must be part of the key
+        key = {
+            "version": __version__,
+            "code": DataCache._get_code_key(),
+            "config": config.config,
+            "debug": config.debug,
+            "unconfirmed": args.unconfirmed,
+            "cryptoasset": args.cryptoasset,
+        }
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _get_code_key():
+        # Parsers can change without the version changing, i.e. a development install
+        code_key = []
+        conv_path = os.path.dirname(__file__)
+        for dirpath, dirnames, filenames in os.walk(conv_path):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                if filename.endswith((".py", ".json")):
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    code_key.append(
+                        (
+                            os.path.relpath(os.path.join(dirpath, filename), conv_path),
+                            stat.st_size,
+                            stat.st_mtime_ns,
+                        )
+                    )
+        return code_key
+
+    def _get_filename(self, file_hash):
+        return os.path.join(self.CACHE_DIR, f"{file_hash}-{self.key}.{self.FILE_EXTENSION}")
+
+    def get(self, file_hash):
+        filename = self._get_filename(file_hash)
+        try:
+            with open(filename, "rb") as cache_file:
+                result = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (
+            IOError,
+            EOFError,
+            pickle.UnpicklingError,
+            AttributeError,
+            ImportError,
+            IndexError,
+        ):
+            # Can't be used, i.e. a parser has been removed, it is replaced on the next put
+            return None
+
+        # Entries are kept for as long as they are still being used
+        os.utime(filename)
+        return result
+
+    def put(self, file_hash, result):
+        with tempfile.NamedTemporaryFile(
+            dir=self.CACHE_DIR, suffix=".tmp", delete=False
+        ) as cache_file:
+            pickle.dump(result, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Renamed into place, so another process never reads an incomplete entry
+        os.replace(cache_file.name, self._get_filename(file_hash))
+
+    def _prune(self):
+        expiry = time.time() - self.MAX_AGE_DAYS * 24 * 60 * 60
+        for filename in os.listdir(self.CACHE_DIR):
+            filepath = os.path.join(self.CACHE_DIR, filename)
+            try:
+                if os.path.getmtime(filepath) < expiry:
+                    os.remove(filepath)
+                    if config.debug:
+                        sys.stderr.write(f"{Fore.CYAN}conv: cache entry expired: {filename}\n")
+            except OSError:
+                pass
@@ -1,35 +1,38 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2019
 
+import codecs
 import csv
 import io
 import os
 import sys
 import warnings
 
-import xlrd
 from colorama import Fore
-from openpyxl import load_workbook
 
 from ..config import config
 from ..constants import ERROR, WARNING
 from .dataparser import DataParser
 from .datarow import DataRow
 from .exceptions import DataFormatUnrecognised, DataRowError
+from .session import ConvSession, get_session
 
 
 class DataFile:
     CSV_DELIMITERS = (",", ";")
 
-    remove_duplicates = False
-    data_files = {}
-    data_files_ordered = []
+    DUPLICATES_KEY_ROW = ConvSession.DUPLICATES_KEY_ROW
+    DUPLICATES_KEY_TRANSACTION = ConvSession.DUPLICATES_KEY_TRANSACTION
 
-    def __init__(self, parser, reader):
+    def __init__(self, parser, reader, stream=False):
         self.parser = parser
-        self.data_rows = [
+        self.data_rows = (
             DataRow(line_num + 1, row, parser.in_header) for line_num, row in enumerate(reader)
-        ]
+        )
+        if not stream:
+            self.data_rows = list(self.data_rows)
+
+        self.stream = stream
         self.failures = []
 
     def __eq__(self, other):
@@ -45,10 +48,12 @@ class DataFile:
         if len(other.parser.header) > len(self.parser.header):
             self.parser = other.parser
 
-        if self.remove_duplicates:
-            self.data_rows += [dr for dr in other.data_rows if dr not in self.data_rows]
+        row_keys = {self.row_key(dr) for dr in self.data_rows}
+
+        if get_session().remove_duplicates:
+            self.data_rows += [dr for dr in other.data_rows if self.row_key(dr) not in row_keys]
         else:
-            if [dr for dr in other.data_rows if dr in self.data_rows]:
+            if any(self.row_key(dr) in row_keys for dr in other.data_rows):
                 sys.stderr.write(
                     f'{WARNING} Duplicate rows detected for "{self.parser.name}", '
                     f"use the [--duplicates] option to remove them (use with care)\n"
@@ -57,22 +62,42 @@ class DataFile:
 
         return self
 
+    @classmethod
+    def row_key(cls, data_row):
+        if get_session().duplicates_key == cls.DUPLICATES_KEY_TRANSACTION:
+            return data_row.transaction_key()
+        return data_row
+
     def parse(self, **kwargs):
         if self.parser.row_handler:
-            for data_row in self.data_rows:
-                if config.debug:
-                    sys.stderr.write(
-                        f"{Fore.YELLOW}conv: "
-                        f"row[{self.parser.in_header_row_num + data_row.line_num}] {data_row}\n"
-                    )
-
-                data_row.parse(self.parser, **kwargs)
+            # When streamed, each row is parsed as it is read
+            self.data_rows = self._parse_rows(self.data_rows, **kwargs)
+            if not self.stream:
+                self.data_rows = list(self.data_rows)
         else:
             # All rows handled together
             DataRow.parse_all(self.data_rows, self.parser, **kwargs)
 
-        self.failures = [dr for dr in self.data_rows if dr.failure is not None]
+            self.failures = [dr for dr in self.data_rows if dr.failure is not None]
+            self._report_failures()
+
+    def _parse_rows(self, data_rows, **kwargs):
+        for data_row in data_rows:
+            if config.debug:
+                sys.stderr.write(
+                    f"{Fore.YELLOW}conv: "
+                    f"row[{self.parser.in_header_row_num + data_row.line_num}] {data_row}\n"
+                )
+
+            data_row.parse(self.parser, **kwargs)
+            if data_row.failure is not None:
+                self.failures.append(data_row)
 
+            yield data_row
+
+        self._report_failures()
+
+    def _report_failures(self):
         if self.failures:
             sys.stderr.write(f'{WARNING} Parser failure for "{self.parser.name}"\n')
 
@@ -87,22 +112,25 @@ class DataFile:
                     sys.stderr.write(f'{ERROR} Unexpected error: "{data_row.failure}"\n')
 
     @classmethod
-    def read_excel_xlsx(cls, filename):
+    def read_excel_xlsx(cls, filename, df):
+        # Excel libraries are slow to import, and most data files are CSV
+        from openpyxl import load_workbook  # pylint: disable=import-outside-toplevel
+
         warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
-        with open(filename, "rb") as df:
-            try:
-                workbook = load_workbook(df, read_only=False, data_only=True)
+        try:
+            # The zip file needs random access, so is read into memory in one pass
+            workbook = load_workbook(io.BytesIO(df.read()), read_only=False, data_only=True)
 
-                if config.debug:
-                    sys.stderr.write(f"{Fore.CYAN}conv: EXCEL\n")
+            if config.debug:
+                sys.stderr.write(f"{Fore.CYAN}conv: EXCEL\n")
 
-                for sheet_name in workbook.sheetnames:
-                    yield workbook[sheet_name]
+            for sheet_name in workbook.sheetnames:
+                yield workbook[sheet_name]
 
-                workbook.close()
-                del workbook
-            except (IOError, KeyError) as e:
-                raise DataFormatUnrecognised(filename) from e
+            workbook.close()
+            del workbook
+        except (IOError, KeyError) as e:
+            raise DataFormatUnrecognised(filename) from e
 
     @classmethod
     def read_worksheet_xlsx(cls, worksheet, filename, args):
@@ -130,13 +158,15 @@ class DataFile:
             cryptoasset=args.cryptoasset,
         )
 
-        cls.consolidate_datafiles(data_file)
+        return data_file
 
     @classmethod
-    def read_excel_xls(cls, filename):
+    def read_excel_xls(cls, filename, df):
+        import xlrd  # pylint: disable=import-outside-toplevel
+
         try:
             with xlrd.open_workbook(
-                filename, logfile=open(os.devnull, "w", encoding="utf-8")
+                file_contents=df.read(), logfile=open(os.devnull, "w", encoding="utf-8")
             ) as workbook:
                 if config.debug:
                     sys.stderr.write(f"{Fore.CYAN}conv: EXCEL\n")
@@ -172,7 +202,7 @@ class DataFile:
             cryptoasset=args.cryptoasset,
         )
 
-        cls.consolidate_datafiles(data_file)
+        return data_file
 
     @staticmethod
     def get_cell_values_xlsx(rows):
@@ -193,6 +223,8 @@ class DataFile:
 
     @staticmethod
     def convert_cell_xls(cell, datemode):
+        import xlrd  # pylint: disable=import-outside-toplevel
+
         if cell.ctype == xlrd.XL_CELL_DATE:
             value = (
                 f"{xlrd.xldate.xldate_as_datetime(cell.value, datemode):%Y-%m-%dT%H:%M:%S.%f %Z}"
@@ -210,52 +242,69 @@ class DataFile:
         return value
 
     @classmethod
-    def read_csv(cls, filename, args):
-        for reader in cls.read_csv_with_delimiter(filename):
-            parser = cls.get_parser(reader)
+    def read_csv(cls, filename, df, args, stream=False):
+        reader, parser = cls.match_csv(df)
 
-            if parser is not None:
-                sys.stderr.write(
-                    f"{Fore.WHITE}file: {Fore.YELLOW}{filename} "
-                    f'{Fore.WHITE}matched as {Fore.CYAN}"{parser.name}"\n'
-                )
+        if parser is None:
+            raise DataFormatUnrecognised(filename)
 
-                if parser.deprecated:
-                    sys.stderr.write(
-                        f"{WARNING} This parser is deprecated, please use "
-                        f'"{parser.deprecated.name}"\n'
-                    )
-
-                data_file = DataFile(parser, reader)
-                data_file.parse(
-                    filename=filename,
-                    unconfirmed=args.unconfirmed,
-                    cryptoasset=args.cryptoasset,
-                )
+        sys.stderr.write(
+            f"{Fore.WHITE}file: {Fore.YELLOW}{filename} "
+            f'{Fore.WHITE}matched as {Fore.CYAN}"{parser.name}"\n'
+        )
 
-                cls.consolidate_datafiles(data_file)
-                break
+        if parser.deprecated:
+            sys.stderr.write(
+                f'{WARNING} This parser is deprecated, please use "{parser.deprecated.name}"\n'
+            )
 
-        if parser is None:
-            raise DataFormatUnrecognised(filename)
+        data_file = DataFile(parser, reader, stream)
+        data_file.parse(
+            filename=filename,
+            unconfirmed=args.unconfirmed,
+            cryptoasset=args.cryptoasset,
+        )
+
+        return data_file
 
     @classmethod
-    def read_csv_with_delimiter(cls, filename):
-        with io.open(filename, newline="", encoding="utf-8-sig") as csv_file:
-            for delimiter in cls.CSV_DELIMITERS:
-                if config.debug:
-                    sys.stderr.write(f"{Fore.CYAN}conv: CSV delimiter='{delimiter}'\n")
+    def match_csv(cls, df):
+        for reader, csv_sample in cls.read_csv_with_delimiter(df):
+            parser = cls.get_parser(reader)
+
+            if parser is not None:
+                csv_sample.recording = False
+                return reader, parser
 
-                yield csv.reader(csv_file, delimiter=delimiter)
-                csv_file.seek(0)
+        return None, None
 
     @classmethod
-    def consolidate_datafiles(cls, data_file):
-        if data_file.parser.p_type != DataParser.TYPE_GENERIC and data_file in cls.data_files:
-            cls.data_files[data_file] += data_file
+    def read_csv_with_delimiter(cls, df):
+        csv_file = io.TextIOWrapper(
+            io.BufferedReader(df), encoding=cls.get_encoding(df.sample), newline=""
+        )
+        csv_sample = CsvSample(csv_file)
+
+        for delimiter in cls.CSV_DELIMITERS:
+            if config.debug:
+                sys.stderr.write(f"{Fore.CYAN}conv: CSV delimiter='{delimiter}'\n")
+
+            yield csv.reader(csv_sample, delimiter=delimiter), csv_sample
+
+    @staticmethod
+    def get_encoding(sample):
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return "utf-16"
+        return "utf-8-sig"
+
+    @staticmethod
+    def consolidate_datafiles(data_file):
+        session = get_session()
+        if data_file.parser.p_type != DataParser.TYPE_GENERIC and data_file in session.data_files:
+            session.data_files[data_file] += data_file
         else:
-            cls.data_files[data_file] = data_file
-            cls.data_files_ordered.append(data_file)
+            session.data_files[data_file] = data_file
+            session.data_files_ordered.append(data_file)
 
     @staticmethod
     def get_parser(reader):
@@ -274,3 +323,31 @@ class DataFile:
                 break
 
         return parser
+
+
+class CsvSample:  # pylint: disable=too-few-public-methods
+    # Lines are kept while the header is matched, so each delimiter can be tried without seeking
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.lines = []
+        self.recording = True
+        self.error = None
+
+    def __iter__(self):
+        yield from self.lines
+
+        if self.error:
+            raise self.error
+
+        try:
+            for line in self.csv_file:
+                self.lines.append(line)
+                yield line
+
+                if not self.recording:
+                    break
+
+            yield from self.csv_file
+        except UnicodeDecodeError as e:
+            self.error = e
+            raise
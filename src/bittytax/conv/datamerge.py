@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2021
 
+import importlib
+import pkgutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
 
 from colorama import Fore
 
 from ..config import config
 from ..constants import ERROR
+from .dataparser import DataParser
+from .jobs import init_job, init_job_args, replay_output, run_job
+from .session import get_session
 
 
 class DataMerge:  # pylint: disable=too-few-public-methods
@@ -25,8 +31,88 @@ class DataMerge:  # pylint: disable=too-few-public-methods
 
         self.mergers.append(self)
 
+    @classmethod
+    def import_mergers(cls, data_files):
+        DataParser.load_manifest()
+        manifest_mergers = DataParser.manifest["mergers"]
+
+        # Only the mergers which have a mandatory parser in use are imported
+        parser_modules = {data_file.parser.module for data_file in data_files}
+        for module in sorted(manifest_mergers):
+            if parser_modules.intersection(manifest_mergers[module]):
+                importlib.import_module(f".mergers.{module}", __package__)
+
+        mergers_package = importlib.import_module(".mergers", __package__)
+        for module_info in pkgutil.iter_modules(mergers_package.__path__):
+            if not module_info.ispkg and module_info.name not in manifest_mergers:
+                importlib.import_module(f".mergers.{module_info.name}", __package__)
+
     @classmethod
     def match_merge(cls, data_files):
+        session = get_session()
+        try:
+            cls._match_merge(data_files)
+        finally:
+            if session.executor:
+                session.executor.shutdown()
+                session.executor = None
+
+    @classmethod
+    def _match_merge(cls, data_files):
+        for data_merge, matched_data_files in cls.get_matches(data_files):
+            sys.stderr.write(f'{Fore.WHITE}merge: "{data_merge.name}"\n')
+
+            try:
+                merge = data_merge.merge_handler(matched_data_files)
+            except (ValueError, ArithmeticError) as e:
+                if config.debug:
+                    raise
+
+                sys.stderr.write(f'{ERROR} Unexpected error: "{e}"\n')
+            else:
+                if merge:
+                    parsers = [df.parser.name for _, df in matched_data_files.items()]
+                    sys.stderr.write(
+                        f"{Fore.WHITE}merge: successfully merged "
+                        f'{Fore.CYAN}"{cls.SEPARATOR_AND.join(parsers)}"\n'
+                    )
+
+                    for _, df in matched_data_files.items():
+                        del data_files[df]
+                else:
+                    sys.stderr.write(f"{Fore.YELLOW}merge: nothing to merge\n")
+
+    @staticmethod
+    def run_jobs(func, jobs_args):
+        # Jobs are run in parallel if enabled, but results and any output are returned in order
+        session = get_session()
+        if session.jobs == 1 or len(jobs_args) < 2:
+            for args in jobs_args:
+                yield func(*args)
+            return
+
+        if session.executor is None:
+            session.executor = ProcessPoolExecutor(
+                max_workers=session.jobs,
+                initializer=init_job,
+                initargs=init_job_args(),
+            )
+
+        jobs = [session.executor.submit(run_job, func, *args) for args in jobs_args]
+        try:
+            for job in jobs:
+                result, output = job.result()
+                replay_output(output)
+                yield result
+        finally:
+            for job in jobs:
+                job.cancel()
+
+    @classmethod
+    def get_matches(cls, data_files):
+        # Matched lazily, as a merge removes its data files from any further matches
+        cls.import_mergers(data_files)
+
         for data_merge in cls.mergers:
             matched_data_files = {}
 
@@ -47,27 +133,7 @@ class DataMerge:  # pylint: disable=too-few-public-methods
                         opt_cnt += 1
 
             if man_cnt == 1 and opt_cnt > 0 or man_cnt > 1 and man_cnt == man_tot:
-                sys.stderr.write(f'{Fore.WHITE}merge: "{data_merge.name}"\n')
-
-                try:
-                    merge = data_merge.merge_handler(matched_data_files)
-                except (ValueError, ArithmeticError) as e:
-                    if config.debug:
-                        raise
-
-                    sys.stderr.write(f'{ERROR} Unexpected error: "{e}"\n')
-                else:
-                    if merge:
-                        parsers = [df.parser.name for _, df in matched_data_files.items()]
-                        sys.stderr.write(
-                            f"{Fore.WHITE}merge: successfully merged "
-                            f'{Fore.CYAN}"{cls.SEPARATOR_AND.join(parsers)}"\n'
-                        )
-
-                        for _, df in matched_data_files.items():
-                            del data_files[df]
-                    else:
-                        sys.stderr.write(f"{Fore.YELLOW}merge: nothing to merge\n")
+                yield data_merge, matched_data_files
 
     @classmethod
     def _match_datafile(cls, data_files, parser):
@@ -83,6 +149,8 @@ class DataMerge:  # pylint: disable=too-few-public-methods
 class MergeDataRow:  # pylint: disable=too-few-public-methods
     def __init__(self, data_row, data_file, data_file_id):
         self.data_row = data_row
-        self.data_file = data_file
+        # Only the header is kept, not the data file, so it can be passed to a job
+        self.in_header = data_file.parser.in_header
+        self.in_header_row_num = data_file.parser.in_header_row_num
         self.data_file_id = data_file_id
         self.quantity = Decimal(0)
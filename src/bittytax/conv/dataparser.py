@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2019
 
+import copy
+import importlib
+import json
+import pkgutil
 import sys
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 import dateutil.parser
@@ -12,8 +17,11 @@ from colorama import Fore, Style
 from ..config import config
 from ..constants import TZ_UTC
 from ..price.pricedata import PriceData
+from .exceptions import MissingRateError
+from .session import get_session
 
 TERM_WIDTH = 69
+PARSER_MANIFEST = "parsers/manifest.json"
 
 
 class DataParser:  # pylint: disable=too-many-instance-attributes
@@ -34,8 +42,15 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
         TYPE_SHARES,
     )
 
-    price_data = PriceData(config.data_source_fiat)
+    # Exchange rates are prefetched for this many days before the first date needed
+    FX_PREFETCH_DAYS = 366
+
     parsers = []
+    header_index = {}
+    header_masks = {}
+    manifest = {}
+    manifest_index = {}
+    manifest_lock = threading.Lock()
 
     def __init__(
         self,
@@ -56,10 +71,13 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
         self.delimiter = delimiter
         self.row_handler = row_handler
         self.all_handler = all_handler
+        self.module = (row_handler or all_handler).__module__.rsplit(".", 1)[-1]
+        self.module_index = len([p for p in self.parsers if p.module == self.module])
         self.args = []
         self.in_header = None
         self.in_header_row_num = None
 
+        self._index_header()
         self.parsers.append(self)
 
     def __eq__(self, other):
@@ -71,15 +89,105 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
     def __lt__(self, other):
         return self.name < other.name
 
+    def __reduce__(self):
+        # Headers can contain lambdas, so parsers are pickled by reference to their module, only
+        #  the matched header is kept, the arguments are only needed while parsing
+        return DataParser.get_parser, (
+            self.module,
+            self.module_index,
+            self.in_header,
+            self.in_header_row_num,
+        )
+
+    @classmethod
+    def get_parser(cls, module, module_index, in_header=None, in_header_row_num=None):
+        importlib.import_module(f".parsers.{module}", __package__)
+        parser = [p for p in cls.parsers if p.module == module][module_index]
+        if in_header is None:
+            return parser
+        return parser.matched([], in_header, in_header_row_num)
+
+    def __copy__(self):
+        # Not copied by __reduce__, as that would return the parser registered for the module
+        parser = self.__class__.__new__(self.__class__)
+        parser.__dict__.update(self.__dict__)
+        return parser
+
+    def matched(self, args, in_header, in_header_row_num):
+        # The parser is copied for each header matched, so no state is shared between data files
+        parser = copy.copy(self)
+        parser.args = args
+        parser.in_header = in_header
+        parser.in_header_row_num = in_header_row_num
+        return parser
+
+    def _index_header(self):
+        key = self.header_key(self.header)
+        self._add_header_mask(key)
+
+        # Registration order is kept, as it decides which parser wins if more than one matches
+        self.header_index.setdefault(key, []).append((len(self.parsers), self))
+
+    @staticmethod
+    def header_key(header):
+        # Only the static columns are indexed, callable and wildcard columns are checked on a match
+        mask = tuple(i for i, col in enumerate(header) if col is not None and not callable(col))
+        return len(header), mask, tuple(header[i] for i in mask)
+
+    @classmethod
+    def _add_header_mask(cls, key):
+        num_cols, mask, _ = key
+        masks = cls.header_masks.setdefault(num_cols, [])
+        if mask not in masks:
+            masks.append(mask)
+
+    @classmethod
+    def load_manifest(cls):
+        if cls.manifest:
+            return
+
+        with cls.manifest_lock:
+            if cls.manifest:
+                return
+
+            manifest = json.loads(pkgutil.get_data(__name__, PARSER_MANIFEST))
+            for module, _, _, _, header in manifest["parsers"]:
+                key = cls.header_key(header)
+                cls._add_header_mask(key)
+                modules = cls.manifest_index.setdefault(key, [])
+                if module not in modules:
+                    modules.append(module)
+
+            # Any parsers added since the manifest was generated have to be imported up front
+            manifest_modules = {module for module, _, _, _, _ in manifest["parsers"]}
+            parsers_package = importlib.import_module(".parsers", __package__)
+            for module_info in pkgutil.iter_modules(parsers_package.__path__):
+                if not module_info.ispkg and module_info.name not in manifest_modules:
+                    cls.import_parsers(module_info.name)
+
+            # Only set once it's complete, as it's checked without the lock
+            cls.manifest = manifest
+
+    @classmethod
+    def import_parsers(cls, module):
+        if config.debug and f"{__package__}.parsers.{module}" not in sys.modules:
+            sys.stderr.write(f"{Fore.CYAN}conv: importing parsers from '{module}'\n")
+
+        importlib.import_module(f".parsers.{module}", __package__)
+
     def format_header(self):
+        return self._format_header(self.header, self.delimiter)
+
+    @staticmethod
+    def _format_header(in_header, delimiter):
         header = []
-        for col in self.header:
+        for col in in_header:
             if callable(col) or col is None:
                 header.append("_")
             else:
                 header.append(col)
 
-        header_str = f"'{self.delimiter.join(header)}'"
+        header_str = f"'{delimiter.join(header)}'"
 
         return f"{header_str[:TERM_WIDTH]}..." if len(header_str) > TERM_WIDTH else header_str
 
@@ -117,11 +225,7 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
         if config.ccy == from_currency:
             return Decimal(value)
 
-        if timestamp.date() >= datetime.now().date():
-            rate_ccy, _, _ = cls.price_data.get_latest(from_currency, config.ccy)
-        else:
-            rate_ccy, _, _, _ = cls.price_data.get_historical(from_currency, config.ccy, timestamp)
-
+        rate_ccy = cls.get_fx_rate(from_currency, timestamp)
         value_in_ccy = Decimal(value) * rate_ccy
 
         if config.debug:
@@ -134,6 +238,57 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
 
         return value_in_ccy
 
+    @staticmethod
+    def get_price_data():
+        # Only created when a rate is needed, the data sources make requests when they are created,
+        #  so offline only the price cache is used
+        session = get_session()
+        if session.price_data is None:
+            session.price_data = PriceData(config.data_source_fiat, cache_only=session.offline)
+        return session.price_data
+
+    @classmethod
+    def get_fx_rate(cls, currency, timestamp):
+        # Rates are looked up once per day, for each currency
+        session = get_session()
+        if timestamp.date() >= datetime.now().date():
+            session.latest_rates = True
+
+        if (currency, timestamp.date()) in session.fx_rates:
+            return session.fx_rates[(currency, timestamp.date())]
+
+        rate_ccy = cls.get_price_data().get_historical_cached(currency, config.ccy, timestamp)
+        if rate_ccy is None and session.offline:
+            raise MissingRateError(currency, config.ccy, timestamp)
+
+        if rate_ccy is None:
+            if timestamp.date() >= datetime.now().date():
+                rate_ccy, _, _ = cls.get_price_data().get_latest(currency, config.ccy)
+            else:
+                cls.prefetch_fx_rates(currency, timestamp)
+                rate_ccy, _, _, _ = cls.get_price_data().get_historical(
+                    currency, config.ccy, timestamp
+                )
+
+        session.fx_rates[(currency, timestamp.date())] = rate_ccy
+        return rate_ccy
+
+    @classmethod
+    def prefetch_fx_rates(cls, currency, timestamp):
+        # A range of rates is requested with one lookup, instead of a lookup for each day
+        span = get_session().fx_spans.get(currency)
+        if span is None:
+            span = (None, datetime.now(TZ_UTC) - timedelta(days=1))
+            end = span[1]
+        elif timestamp < span[0]:
+            end = span[0] - timedelta(days=1)
+        else:
+            return
+
+        start = timestamp - timedelta(days=cls.FX_PREFETCH_DAYS)
+        cls.get_price_data().prefetch_historical(currency, config.ccy, start, end)
+        get_session().fx_spans[currency] = (start, span[1])
+
     @classmethod
     def match_header(cls, row, row_num):
         row = [col.strip() for col in row]
@@ -142,28 +297,27 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
                 f"{Fore.YELLOW}header: row[{row_num + 1}] TRY: {cls.format_row(row)}\n"
             )
 
-        parsers_reduced = [p for p in cls.parsers if len(p.header) == len(row)]
-        for parser in parsers_reduced:
-            match = False
-            for i, row_field in enumerate(row):
-                if callable(parser.header[i]):
-                    match = parser.header[i](row_field)
-                    parser.args.append(match)
-                elif parser.header[i] is not None:
-                    match = row_field == parser.header[i]
+        cls.load_manifest()
 
-                if not match:
-                    break
+        candidates = []
+        for mask in list(cls.header_masks.get(len(row), [])):
+            key = (len(row), mask, tuple(row[i] for i in mask))
+            # Only the parser modules which might match the header are imported
+            for module in cls.manifest_index.get(key, []):
+                cls.import_parsers(module)
 
-            if match:
+            candidates.extend(cls.header_index.get(key, []))
+
+        for _, parser in sorted(candidates, key=lambda c: c[0]):
+            args = [col(row[i]) for i, col in enumerate(parser.header) if callable(col)]
+
+            if all(args):
                 if config.debug:
                     sys.stderr.write(
                         f"{Fore.CYAN}header: row[{row_num + 1}] "
                         f"MATCHED: {cls.format_row(parser.header)} as '{parser.name}'\n"
                     )
-                parser.in_header = row
-                parser.in_header_row_num = row_num + 1
-                return parser
+                return parser.matched(args, row, row_num + 1)
 
             if config.debug:
                 sys.stderr.write(
@@ -175,16 +329,20 @@ class DataParser:  # pylint: disable=too-many-instance-attributes
 
     @classmethod
     def format_parsers(cls):
+        cls.load_manifest()
+
         txt = ""
         for p_type in cls.LIST_ORDER:
             txt += f"  {p_type.upper()}:\n"
             prev_name = None
-            for parser in sorted([parser for parser in cls.parsers if parser.p_type == p_type]):
-                if parser.name != prev_name:
-                    txt += f"    {parser.name}\n"
-                txt += f"      {parser.format_header()}\n"
-
-                prev_name = parser.name
+            for _, _, name, delimiter, header in sorted(
+                [p for p in cls.manifest["parsers"] if p[1] == p_type], key=lambda p: p[2]
+            ):
+                if name != prev_name:
+                    txt += f"    {name}\n"
+                txt += f"      {cls._format_header(header, delimiter)}\n"
+
+                prev_name = name
 
         return txt
 
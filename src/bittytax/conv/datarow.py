@@ -8,19 +8,22 @@ from colorama import Back, Fore
 from ..config import config
 from ..constants import TZ_UTC
 from .exceptions import DataRowError
-from .mergers import *  # pylint: disable=wildcard-import, unused-wildcard-import
-from .parsers import *  # pylint: disable=wildcard-import, unused-wildcard-import
 
 DEFAULT_TIMESTAMP = datetime.datetime(datetime.MINYEAR, 1, 1, tzinfo=TZ_UTC)
 
+# Column names (normalised) which might hold a transaction ID
+TXID_FIELDS = ("txid", "txhash", "transactionid", "transactionhash", "hash")
 
-class DataRow:
+
+class DataRow:  # pylint: disable=too-many-instance-attributes
     def __init__(self, line_num, row, in_header):
         self.line_num = line_num
         self.row = row
         self.row_dict = dict(zip(in_header, row))
         self.timestamp = DEFAULT_TIMESTAMP
         self.t_record = None
+        # Any further transaction records from the same row, these are output after it
+        self.extra_t_records = []
         self.parsed = False
         self.failure = None
 
@@ -35,11 +38,45 @@ class DataRow:
 
             self.failure = e
 
+    def add_t_record(self, t_record):
+        if self.t_record is None:
+            self.t_record = t_record
+        else:
+            self.extra_t_records.append(t_record)
+
+    def get_t_records(self):
+        if self.t_record:
+            return [self.t_record] + self.extra_t_records
+        return list(self.extra_t_records)
+
     def __eq__(self, other):
         return self.row == other.row
 
     def __hash__(self):
-        return hash(self.row)
+        return hash(tuple(self.row))
+
+    def transaction_key(self):
+        # Identifies the same transaction, even if the columns have been reformatted
+        if self.t_record is None:
+            return tuple(self.row)
+
+        return (
+            self.t_record.timestamp,
+            self.t_record.t_type,
+            self.t_record.buy_asset,
+            self.t_record.buy_quantity,
+            self.t_record.sell_asset,
+            self.t_record.sell_quantity,
+            self.t_record.fee_asset,
+            self.t_record.fee_quantity,
+            self.get_txid(),
+        )
+
+    def get_txid(self):
+        for field, value in self.row_dict.items():
+            if field.lower().replace(" ", "").replace("_", "") in TXID_FIELDS:
+                return value.strip().lower()
+        return None
 
     @staticmethod
     def parse_all(data_rows, parser, **kwargs):
@@ -4,7 +4,8 @@
 
 class DataRowError(Exception):
     def __init__(self, col_num, col_name, value=None):
-        super().__init__()
+        # Arguments are passed on so the exception can be pickled, i.e. returned by a worker
+        super().__init__(col_num, col_name, value)
         self.col_num = col_num
         self.col_name = col_name
         self.value = value
@@ -35,9 +36,23 @@ class UnexpectedTradingPairError(DataRowError):
         return f"Unrecognised trading pair for {self.col_name}: '{self.value}'"
 
 
+class MissingRateError(Exception):
+    def __init__(self, currency, quote, timestamp):
+        super().__init__(currency, quote, timestamp)
+        self.currency = currency
+        self.quote = quote
+        self.timestamp = timestamp
+
+    def __str__(self):
+        return (
+            f"No exchange rate cached for {self.currency}/{self.quote} on "
+            f"{self.timestamp:%Y-%m-%d}, cannot convert when offline"
+        )
+
+
 class DataParserError(Exception):
     def __init__(self, filename, worksheet=None):
-        super().__init__()
+        super().__init__(filename, worksheet)
         self.filename = filename
         self.worksheet = worksheet
 
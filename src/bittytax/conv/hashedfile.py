@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import hashlib
+import io
+import os
+
+
+class HashedFile(io.RawIOBase):
+    SAMPLE_SIZE = 8192
+    CHUNK_SIZE = 1024 * 1024
+
+    MAGIC_XLS = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+    MAGIC_ZIP = b"\x50\x4b\x03\x04"
+
+    def __init__(self, filename):
+        super().__init__()
+        self.file = open(filename, "rb")  # pylint: disable=consider-using-with
+        self.file_hash = hashlib.sha1()
+        self.sample = self.file.read(self.SAMPLE_SIZE)
+        self.file_hash.update(self.sample)
+        self.sample_pos = 0
+
+        # Files can only be identical if their size and start are the same
+        self.sample_key = (os.fstat(self.file.fileno()).st_size, self.sample)
+
+    @property
+    def file_type(self):
+        if self.sample[0:8] == self.MAGIC_XLS:
+            return "xls"
+        if self.sample[0:4] == self.MAGIC_ZIP:
+            # xlsx is a zip file, let openpyxl unpack and check
+            return "zip"
+        return None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.sample_pos < len(self.sample):
+            data = self.sample[self.sample_pos : self.sample_pos + len(b)]
+            self.sample_pos += len(data)
+            b[: len(data)] = data
+            return len(data)
+
+        size = self.file.readinto(b)
+        self.file_hash.update(memoryview(b)[:size])
+        return size
+
+    def readall(self):
+        data = self.sample[self.sample_pos :] + self.file.read()
+        self.file_hash.update(data[len(self.sample) - self.sample_pos :])
+        self.sample_pos = len(self.sample)
+        return data
+
+    def hexdigest(self):
+        # The file is hashed as it is read, anything not read yet is hashed now
+        for chunk in iter(lambda: self.file.read(self.CHUNK_SIZE), b""):
+            self.file_hash.update(chunk)
+        return self.file_hash.hexdigest()
+
+    def close(self):
+        # Also closed by any reader wrapping it, the file itself stays open until the end of the
+        #  with block, so anything not read can still be hashed
+        super().close()
+
+    def __exit__(self, *args):
+        self.file.close()
+        return super().__exit__(*args)
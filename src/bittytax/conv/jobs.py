@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import sys
+
+from ..config import Config, config
+from ..context import get_context
+from .session import ConvSession, get_session
+
+
+def init_job_args():
+    # Workers don't share the context of the parent, so are given its settings
+    return config.config, config.debug, get_session().offline
+
+
+def init_job(settings, debug, offline):
+    get_context().config = Config(settings)
+    config.debug = debug
+    get_context().conv_session = ConvSession(offline=offline)
+
+
+def run_job(func, *args):
+    # Runs in a worker process, output is captured so it can be replayed in order by the parent
+    output = []
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = CapturedStream("stdout", output)
+    sys.stderr = CapturedStream("stderr", output)
+
+    try:
+        result = func(*args)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+    return result, output
+
+
+def replay_output(output):
+    for stream, content in output:
+        getattr(sys, stream).write(content)
+
+
+class CapturedStream:
+    def __init__(self, stream, output):
+        self.stream = stream
+        self.output = output
+
+    def write(self, text):
+        self.output.append((self.stream, text))
+
+    def flush(self):
+        pass
@@ -1 +0,0 @@
-from . import bscscan, etherscan, hecoinfo, polygonscan, snowtrace
@@ -32,7 +32,7 @@ def merge_etherscan(data_files):
     return _do_merge_etherscan(data_files, [])
 
 
-def _do_merge_etherscan(data_files, staking_addresses):  # pylint: disable=too-many-locals
+def _do_merge_etherscan(data_files, staking_addresses):
     merge = False
     tx_ids = {}
 
@@ -52,75 +52,104 @@ def _do_merge_etherscan(data_files, staking_addresses):  # pylint: disable=too-m
                 MergeDataRow(dr, data_files[file_id], file_id)
             )
 
-    for _, wallet_tx_ids in tx_ids.items():
+    # Each wallet is merged as a job, the rows are listed first, as a merge can remove them
+    wallet_rows = [[t for txn in wtx for t in wtx[txn]] for wtx in tx_ids.values()]
+    jobs = DataMerge.run_jobs(_merge_wallet, [(wtx, staking_addresses) for wtx in tx_ids.values()])
+
+    for mdrs, (records, wallet_merge, error) in zip(wallet_rows, jobs):
+        # Apply the merged records from the job to the original rows
+        for mdr, (t_record, failure) in zip(mdrs, records):
+            mdr.data_row.t_record = t_record
+            mdr.data_row.failure = failure
+
+        merge = merge or wallet_merge
+        if error:
+            raise error
+
+    return merge
+
+
+def _merge_wallet(wallet_tx_ids, staking_addresses):
+    mdrs = [t for txn in wallet_tx_ids for t in wallet_tx_ids[txn]]
+    merge = False
+
+    try:
         for txn in wallet_tx_ids:
-            if len(wallet_tx_ids[txn]) == 1:
-                if config.debug:
-                    sys.stderr.write(
-                        f"{Fore.BLUE}merge: {wallet_tx_ids[txn][0].data_file_id:<5}:"
-                        f"{wallet_tx_ids[txn][0].data_row}\n"
-                    )
-                continue
+            if _merge_txn(wallet_tx_ids, txn, staking_addresses):
+                merge = True
+    except (ValueError, ArithmeticError) as e:
+        # Returned with the records merged so far, the same as if it was raised during the merge
+        return [(t.data_row.t_record, t.data_row.failure) for t in mdrs], merge, e
+
+    return [(t.data_row.t_record, t.data_row.failure) for t in mdrs], merge, None
 
-            for t in wallet_tx_ids[txn]:
-                if config.debug:
-                    sys.stderr.write(f"{Fore.GREEN}merge: {t.data_file_id:<5}:{t.data_row}\n")
-
-            t_ins, t_outs, t_fee = _get_ins_outs(wallet_tx_ids[txn])
-
-            if config.debug:
-                _output_records(t_ins, t_outs, t_fee)
-                sys.stderr.write(f"{Fore.YELLOW}merge:     consolidate:\n")
-
-            _consolidate(wallet_tx_ids[txn], [TXNS, INTERNAL_TXNS])
-
-            t_ins, t_outs, t_fee = _get_ins_outs(wallet_tx_ids[txn])
-
-            if config.debug:
-                _output_records(t_ins, t_outs, t_fee)
-                sys.stderr.write(f"{Fore.YELLOW}merge:     merge:\n")
-
-            if t_fee:
-                fee_quantity = t_fee.t_record.fee_quantity
-                fee_asset = t_fee.t_record.fee_asset
-
-            t_ins_orig = copy.copy(t_ins)
-            if t_fee:
-                _method_handling(t_ins, t_fee, staking_addresses)
-
-            # Make trades
-            if len(t_ins) == 1 and t_outs:
-                _do_etherscan_multi_sell(t_ins, t_outs, t_fee)
-            elif len(t_outs) == 1 and t_ins:
-                _do_etherscan_multi_buy(t_ins, t_outs, t_fee)
-            elif len(t_ins) > 1 and len(t_outs) > 1:
-                # Multi-sell to multi-buy trade not supported
-                sys.stderr.write(f"{WARNING} Merge failure for Txhash: {txn}\n")
-
-                for mdr in wallet_tx_ids[txn]:
-                    mdr.data_row.failure = UnexpectedContentError(
-                        mdr.data_file.parser.in_header.index("Txhash"),
-                        "Txhash",
-                        mdr.data_row.row_dict["Txhash"],
-                    )
-                    sys.stderr.write(
-                        f"{Fore.YELLOW}"
-                        f"row[{mdr.data_file.parser.in_header_row_num + mdr.data_row.line_num}] "
-                        f"{mdr.data_row}\n"
-                    )
-                continue
 
-            if t_fee:
-                # Split fees
-                t_all = [t for t in t_ins_orig + t_outs if t.t_record]
-                _do_fee_split(t_all, t_fee, fee_quantity, fee_asset)
+def _merge_txn(wallet_tx_ids, txn, staking_addresses):
+    if len(wallet_tx_ids[txn]) == 1:
+        if config.debug:
+            sys.stderr.write(
+                f"{Fore.BLUE}merge: {wallet_tx_ids[txn][0].data_file_id:<5}:"
+                f"{wallet_tx_ids[txn][0].data_row}\n"
+            )
+        return False
 
-            merge = True
+    for t in wallet_tx_ids[txn]:
+        if config.debug:
+            sys.stderr.write(f"{Fore.GREEN}merge: {t.data_file_id:<5}:{t.data_row}\n")
 
-            if config.debug:
-                _output_records(t_ins_orig, t_outs, t_fee)
+    t_ins, t_outs, t_fee = _get_ins_outs(wallet_tx_ids[txn])
 
-    return merge
+    if config.debug:
+        _output_records(t_ins, t_outs, t_fee)
+        sys.stderr.write(f"{Fore.YELLOW}merge:     consolidate:\n")
+
+    _consolidate(wallet_tx_ids[txn], [TXNS, INTERNAL_TXNS])
+
+    t_ins, t_outs, t_fee = _get_ins_outs(wallet_tx_ids[txn])
+
+    if config.debug:
+        _output_records(t_ins, t_outs, t_fee)
+        sys.stderr.write(f"{Fore.YELLOW}merge:     merge:\n")
+
+    if t_fee:
+        fee_quantity = t_fee.t_record.fee_quantity
+        fee_asset = t_fee.t_record.fee_asset
+
+    t_ins_orig = copy.copy(t_ins)
+    if t_fee:
+        _method_handling(t_ins, t_fee, staking_addresses)
+
+    # Make trades
+    if len(t_ins) == 1 and t_outs:
+        _do_etherscan_multi_sell(t_ins, t_outs, t_fee)
+    elif len(t_outs) == 1 and t_ins:
+        _do_etherscan_multi_buy(t_ins, t_outs, t_fee)
+    elif len(t_ins) > 1 and len(t_outs) > 1:
+        # Multi-sell to multi-buy trade not supported
+        sys.stderr.write(f"{WARNING} Merge failure for Txhash: {txn}\n")
+
+        for mdr in wallet_tx_ids[txn]:
+            mdr.data_row.failure = UnexpectedContentError(
+                mdr.in_header.index("Txhash"),
+                "Txhash",
+                mdr.data_row.row_dict["Txhash"],
+            )
+            sys.stderr.write(
+                f"{Fore.YELLOW}"
+                f"row[{mdr.in_header_row_num + mdr.data_row.line_num}] "
+                f"{mdr.data_row}\n"
+            )
+        return False
+
+    if t_fee:
+        # Split fees
+        t_all = [t for t in t_ins_orig + t_outs if t.t_record]
+        _do_fee_split(t_all, t_fee, fee_quantity, fee_asset)
+
+    if config.debug:
+        _output_records(t_ins_orig, t_outs, t_fee)
+
+    return True
 
 
 def _get_ins_outs(tx_ids):
@@ -19,16 +19,16 @@ def merge_polygonscan(data_files):
         if TOKENS in data_files:
             data_files[TOKENS].parser.worksheet_name = WORKSHEET_NAME
             for data_row in data_files[TOKENS].data_rows:
-                if data_row.t_record:
-                    address = data_row.t_record.wallet[-abs(TransactionOutRecord.WALLET_ADDR_LEN) :]
-                    data_row.t_record.wallet = f"{WALLET}-{address}"
+                for t_record in data_row.get_t_records():
+                    address = t_record.wallet[-abs(TransactionOutRecord.WALLET_ADDR_LEN) :]
+                    t_record.wallet = f"{WALLET}-{address}"
 
         if NFTS in data_files:
             data_files[NFTS].parser.worksheet_name = WORKSHEET_NAME
             for data_row in data_files[NFTS].data_rows:
-                if data_row.t_record:
-                    address = data_row.t_record.wallet[-abs(TransactionOutRecord.WALLET_ADDR_LEN) :]
-                    data_row.t_record.wallet = f"{WALLET}-{address}"
+                for t_record in data_row.get_t_records():
+                    address = t_record.wallet[-abs(TransactionOutRecord.WALLET_ADDR_LEN) :]
+                    t_record.wallet = f"{WALLET}-{address}"
 
     return merge
 
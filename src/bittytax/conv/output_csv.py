@@ -115,7 +115,13 @@ class OutputCsv(OutputBase):
         if self.filename:
             with open(self.filename, "w", newline="", encoding="utf-8") as csv_file:
                 writer = csv.writer(csv_file, lineterminator="\n")
-                self.write_rows(writer)
+                try:
+                    self.write_rows(writer)
+                except BaseException:
+                    # Data files can be streamed, so an error might happen part way through
+                    csv_file.close()
+                    os.remove(self.filename)
+                    raise
 
             sys.stderr.write(f"{Fore.WHITE}output CSV file created: {Fore.YELLOW}{self.filename}\n")
         else:
@@ -124,30 +130,45 @@ class OutputCsv(OutputBase):
             self.write_rows(writer)
 
     def write_rows(self, writer):
-        data_rows = []
-        for data_file in self.data_files:
-            data_rows.extend(data_file.data_rows)
-
         if self.sort:
+            data_rows = []
+            for data_file in self.data_files:
+                data_rows.extend(data_file.data_rows)
+
             data_rows = sorted(data_rows, key=lambda dr: dr.timestamp, reverse=False)
+            self.write_header(writer, self.data_files[0])
+            for data_row in data_rows:
+                self.write_row(writer, data_row)
+        else:
+            # Data files, and their rows, are written as they are read, so they can be streamed
+            for i, data_file in enumerate(self.data_files):
+                if i == 0:
+                    self.write_header(writer, data_file)
+
+                for data_row in data_file.data_rows:
+                    self.write_row(writer, data_row)
 
+    def write_header(self, writer, data_file):
         if not self.no_header:
             if self.append_raw_data:
-                writer.writerow(
-                    self.out_header() + self.in_header(self.data_files[0].parser.in_header)
-                )
+                writer.writerow(self.out_header() + self.in_header(data_file.parser.in_header))
             else:
                 writer.writerow(self.out_header())
 
-        for data_row in data_rows:
-            if self.append_raw_data:
-                if data_row.t_record:
-                    writer.writerow(self._to_csv(data_row.t_record) + data_row.row)
-                else:
-                    writer.writerow([None] * len(self.out_header()) + data_row.row)
+    def write_row(self, writer, data_row):
+        t_records = data_row.get_t_records()
+        if self.append_raw_data:
+            if t_records:
+                writer.writerow(self._to_csv(t_records[0]) + data_row.row)
             else:
-                if data_row.t_record:
-                    writer.writerow(self._to_csv(data_row.t_record))
+                writer.writerow([None] * len(self.out_header()) + data_row.row)
+
+            # Extra transaction records from the same row are written without the original data
+            for t_record in t_records[1:]:
+                writer.writerow(self._to_csv(t_record))
+        else:
+            for t_record in t_records:
+                writer.writerow(self._to_csv(t_record))
 
     def _to_csv(self, t_record):
         if self.csv_format == FORMAT_RECAP:
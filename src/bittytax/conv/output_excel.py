@@ -7,7 +7,7 @@ import sys
 
 import xlsxwriter
 from colorama import Fore
-from xlsxwriter.utility import xl_rowcol_to_cell
+from xlsxwriter.utility import xl_range, xl_rowcol_to_cell
 
 from ..config import config
 from ..constants import TZ_UTC
@@ -31,11 +31,25 @@ class OutputExcel(OutputBase):  # pylint: disable=too-many-instance-attributes
     FONT_COLOR_IN_DATA = "#808080"
     TITLE = "BittyTax Records"
     PROJECT_URL = "https://github.com/BittyTax/BittyTax"
+    # Above this, rows are flushed to disk as they are written, but tables are not supported
+    CONSTANT_MEMORY_ROWS = 100000
 
     def __init__(self, progname, data_files, args):
         super().__init__(data_files)
         self.filename = self.get_output_filename(args.output_filename, self.FILE_EXTENSION)
-        self.workbook = xlsxwriter.Workbook(self.filename)
+        self.constant_memory = (
+            sum(len(data_file.data_rows) for data_file in data_files) > self.CONSTANT_MEMORY_ROWS
+        )
+        if config.debug and self.constant_memory:
+            sys.stderr.write(f"{Fore.CYAN}conv: EXCEL constant memory, tables are not used\n")
+
+        # Names used so far, so each worksheet and table in the workbook is unique
+        self.sheet_names = {}
+        self.table_names = {}
+
+        self.workbook = xlsxwriter.Workbook(
+            self.filename, {"constant_memory": self.constant_memory}
+        )
         self.workbook.set_size(1800, 1200)
         self.workbook.formats[0].set_font_size(FONT_SIZE)
         self.workbook.set_properties(
@@ -122,15 +136,21 @@ class OutputExcel(OutputBase):  # pylint: disable=too-many-instance-attributes
             worksheet = Worksheet(self, data_file)
 
             data_rows = sorted(data_file.data_rows, key=lambda dr: dr.timestamp, reverse=False)
-            for i, data_row in enumerate(data_rows):
-                worksheet.add_row(data_row, i + 1)
+            if self.constant_memory or not data_rows:
+                # In constant memory mode, rows have to be written in order, so headings go first
+                worksheet.add_headings()
+
+            row_num = 1
+            for data_row in data_rows:
+                row_num += worksheet.add_row(data_row, row_num)
 
             if data_rows:
-                worksheet.make_table(len(data_rows), data_file.parser.worksheet_name)
-            else:
-                # Just add headings
-                for i, columns in enumerate(worksheet.columns):
-                    worksheet.worksheet.write(0, i, columns["header"], columns["header_format"])
+                worksheet.add_ranges(row_num - 1)
+
+                if self.constant_memory:
+                    worksheet.worksheet.autofilter(0, 0, row_num - 1, len(worksheet.columns) - 1)
+                else:
+                    worksheet.make_table(row_num - 1, data_file.parser.worksheet_name)
 
             worksheet.autofit()
 
@@ -138,12 +158,13 @@ class OutputExcel(OutputBase):  # pylint: disable=too-many-instance-attributes
         sys.stderr.write(f"{Fore.WHITE}output EXCEL file created: {Fore.YELLOW}{self.filename}\n")
 
 
-class Worksheet:
+class Worksheet:  # pylint: disable=too-many-instance-attributes
     SHEETNAME_MAX_LEN = 31
     MAX_COL_WIDTH = 30
+    AUTOFIT_SAMPLE_ROWS = 1000
+    MAX_RANGES = 256
 
-    sheet_names = {}
-    table_names = {}
+    QUANTITY_COLS = (1, 4, 7)
 
     def __init__(self, output, data_file):
         self.output = output
@@ -151,9 +172,14 @@ class Worksheet:
             self._sheet_name(data_file.parser.worksheet_name)
         )
         self.col_width = {}
+        self.autofit_row = True
         self.columns = self._make_columns(data_file.parser.in_header)
         self.microseconds, self.milliseconds = self._is_microsecond_timestamp(data_file.data_rows)
 
+        # Column widths are only measured for a sample of rows
+        self.autofit_step = max(1, len(data_file.data_rows) // self.AUTOFIT_SAMPLE_ROWS)
+        self.validations = {}
+
         self.worksheet.freeze_panes(1, len(self.output.BITTYTAX_OUT_HEADER))
 
     def _sheet_name(self, parser_name):
@@ -161,16 +187,16 @@ class Worksheet:
         name = re.sub(r"[/\\\?\*\[\]:]", "", parser_name)
         name = name[: self.SHEETNAME_MAX_LEN] if len(name) > self.SHEETNAME_MAX_LEN else name
 
-        if name.lower() not in self.sheet_names:
-            self.sheet_names[name.lower()] = 1
+        if name.lower() not in self.output.sheet_names:
+            self.output.sheet_names[name.lower()] = 1
             sheet_name = name
         else:
-            self.sheet_names[name.lower()] += 1
-            sheet_name = f"{name}({self.sheet_names[name.lower()]})"
+            self.output.sheet_names[name.lower()] += 1
+            sheet_name = f"{name}({self.output.sheet_names[name.lower()]})"
             if len(sheet_name) > self.SHEETNAME_MAX_LEN:
                 sheet_name = (
                     f"{name[: len(name) - (len(sheet_name) - self.SHEETNAME_MAX_LEN)]}"
-                    f"({self.sheet_names[name.lower()]})"
+                    f"({self.output.sheet_names[name.lower()]})"
                 )
 
         return sheet_name
@@ -180,11 +206,11 @@ class Worksheet:
         name = parser_name.replace(" ", "_")
         name = re.sub(r"[^a-zA-Z0-9\._]", "", name)
 
-        if name.lower() not in self.table_names:
-            self.table_names[name.lower()] = 1
+        if name.lower() not in self.output.table_names:
+            self.output.table_names[name.lower()] = 1
         else:
-            self.table_names[name.lower()] += 1
-            name += str(self.table_names[name.lower()])
+            self.output.table_names[name.lower()] += 1
+            name += str(self.output.table_names[name.lower()])
 
         return name
 
@@ -210,43 +236,22 @@ class Worksheet:
 
     @staticmethod
     def _is_microsecond_timestamp(data_rows):
-        milliseconds = bool(
-            [
-                dr.t_record.timestamp
-                for dr in data_rows
-                if dr.t_record and dr.t_record.timestamp.microsecond % 1000
-            ]
-        )
-        microseconds = bool(
-            [
-                dr.t_record.timestamp
-                for dr in data_rows
-                if dr.t_record and dr.t_record.timestamp.microsecond
-            ]
+        milliseconds = any(
+            dr.t_record and dr.t_record.timestamp.microsecond % 1000 for dr in data_rows
         )
+        microseconds = any(dr.t_record and dr.t_record.timestamp.microsecond for dr in data_rows)
 
         return milliseconds, microseconds
 
+    def add_headings(self):
+        for i, columns in enumerate(self.columns):
+            self.worksheet.write(0, i, columns["header"], columns["header_format"])
+
     def add_row(self, data_row, row_num):
-        self.worksheet.set_row(row_num, None, self.output.format_out_data)
-
-        # Add transaction record
-        if data_row.t_record:
-            self._xl_type(data_row.t_record.t_type, row_num, 0, data_row.t_record)
-            self._xl_quantity(data_row.t_record.buy_quantity, row_num, 1)
-            self._xl_asset(data_row.t_record.buy_asset, row_num, 2)
-            self._xl_value(data_row.t_record.buy_value, row_num, 3)
-            self._xl_quantity(data_row.t_record.sell_quantity, row_num, 4)
-            self._xl_asset(data_row.t_record.sell_asset, row_num, 5)
-            self._xl_value(data_row.t_record.sell_value, row_num, 6)
-            self._xl_quantity(data_row.t_record.fee_quantity, row_num, 7)
-            self._xl_asset(data_row.t_record.fee_asset, row_num, 8)
-            self._xl_value(data_row.t_record.fee_value, row_num, 9)
-            self._xl_wallet(data_row.t_record.wallet, row_num, 10)
-            self._xl_timestamp(data_row.t_record.timestamp, row_num, 11)
-            self._xl_note(data_row.t_record.note, row_num, 12)
-
-        # Add original data
+        self.autofit_row = (row_num - 1) % self.autofit_step == 0
+
+        # Add original data, before the rows below it are written, as in constant memory mode
+        # rows have to be written in order
         for col_num, col_data in enumerate(data_row.row):
             if (
                 data_row.failure
@@ -268,56 +273,51 @@ class Worksheet:
 
             self._autofit_calc(len(self.output.BITTYTAX_OUT_HEADER) + col_num, len(col_data))
 
+        # Add transaction records, any extra records from the same row go on the rows below it
+        t_records = data_row.get_t_records()
+        for i, t_record in enumerate(t_records):
+            self._xl_type(t_record.t_type, row_num + i, 0, t_record)
+            self._xl_quantity(t_record.buy_quantity, row_num + i, 1)
+            self._xl_asset(t_record.buy_asset, row_num + i, 2)
+            self._xl_value(t_record.buy_value, row_num + i, 3)
+            self._xl_quantity(t_record.sell_quantity, row_num + i, 4)
+            self._xl_asset(t_record.sell_asset, row_num + i, 5)
+            self._xl_value(t_record.sell_value, row_num + i, 6)
+            self._xl_quantity(t_record.fee_quantity, row_num + i, 7)
+            self._xl_asset(t_record.fee_asset, row_num + i, 8)
+            self._xl_value(t_record.fee_value, row_num + i, 9)
+            self._xl_wallet(t_record.wallet, row_num + i, 10)
+            self._xl_timestamp(t_record.timestamp, row_num + i, 11)
+            self._xl_note(t_record.note, row_num + i, 12)
+
+        return max(1, len(t_records))
+
     def _xl_type(self, t_type, row_num, col_num, t_record):
         if t_type == TransactionOutRecord.TYPE_TRADE or t_record.buy_asset and t_record.sell_asset:
-            self.worksheet.data_validation(
-                row_num,
-                col_num,
-                row_num,
-                col_num,
-                {"validate": "list", "source": [TransactionOutRecord.TYPE_TRADE]},
-            )
+            self._add_validation((TransactionOutRecord.TYPE_TRADE,), row_num)
         elif (
             t_type in TransactionOutRecord.BUY_TYPES
             or t_record.buy_asset
             and not t_record.sell_asset
         ):
-            self.worksheet.data_validation(
-                row_num,
-                col_num,
-                row_num,
-                col_num,
-                {"validate": "list", "source": list(TransactionOutRecord.BUY_TYPES)},
-            )
+            self._add_validation(TransactionOutRecord.BUY_TYPES, row_num)
         elif (
             t_type in TransactionOutRecord.SELL_TYPES
             or t_record.sell_asset
             and not t_record.buy_asset
         ):
-            self.worksheet.data_validation(
-                row_num,
-                col_num,
-                row_num,
-                col_num,
-                {"validate": "list", "source": list(TransactionOutRecord.SELL_TYPES)},
-            )
+            self._add_validation(TransactionOutRecord.SELL_TYPES, row_num)
         self.worksheet.write_string(row_num, col_num, t_type)
-
-        if t_type not in TransactionOutRecord.ALL_TYPES:
-            self.worksheet.conditional_format(
-                row_num,
-                col_num,
-                row_num,
-                col_num,
-                {
-                    "type": "text",
-                    "criteria": "begins with",
-                    "value": "_",
-                    "format": self.output.format_out_data_err,
-                },
-            )
         self._autofit_calc(col_num, len(t_type))
 
+    def _add_validation(self, source, row_num):
+        # Consecutive rows with the same validation are combined into a range
+        ranges = self.validations.setdefault(source, [])
+        if ranges and ranges[-1][1] == row_num - 1:
+            ranges[-1][1] = row_num
+        else:
+            ranges.append([row_num, row_num])
+
     def _xl_quantity(self, quantity, row_num, col_num):
         if quantity is not None:
             if len(quantity.normalize().as_tuple().digits) > OutputBase.EXCEL_PRECISION:
@@ -331,18 +331,6 @@ class Worksheet:
                 self.worksheet.write_number(
                     row_num, col_num, quantity.normalize(), self.output.format_num_float
                 )
-                cell = xl_rowcol_to_cell(row_num, col_num)
-                self.worksheet.conditional_format(
-                    row_num,
-                    col_num,
-                    row_num,
-                    col_num,
-                    {
-                        "type": "formula",
-                        "criteria": f"=INT({cell})={cell}",
-                        "format": self.output.format_num_int,
-                    },
-                )
             self._autofit_calc(col_num, len(f"{quantity.normalize():0,f}"))
 
     def _xl_asset(self, asset, row_num, col_num):
@@ -391,6 +379,9 @@ class Worksheet:
         self._autofit_calc(col_num, len(note) if note else self.MAX_COL_WIDTH)
 
     def _autofit_calc(self, col_num, width):
+        if not self.autofit_row:
+            return
+
         if width > self.MAX_COL_WIDTH:
             width = self.MAX_COL_WIDTH
 
@@ -402,7 +393,58 @@ class Worksheet:
 
     def autofit(self):
         for col_num, col_width in self.col_width.items():
-            self.worksheet.set_column(col_num, col_num, col_width)
+            if col_num < len(self.output.BITTYTAX_OUT_HEADER):
+                # Column format, instead of setting the format of every row
+                self.worksheet.set_column(col_num, col_num, col_width, self.output.format_out_data)
+            else:
+                self.worksheet.set_column(col_num, col_num, col_width)
+
+    def add_ranges(self, rows):
+        # Validations and conditional formats are added for ranges, instead of for each cell
+        for source, ranges in self.validations.items():
+            for i in range(0, len(ranges), self.MAX_RANGES):
+                multi_range = ranges[i : i + self.MAX_RANGES]
+                self.worksheet.data_validation(
+                    multi_range[0][0],
+                    0,
+                    multi_range[0][1],
+                    0,
+                    {
+                        "validate": "list",
+                        "source": list(source),
+                        "multi_range": " ".join(
+                            xl_range(first_row, 0, last_row, 0)
+                            for first_row, last_row in multi_range
+                        ),
+                    },
+                )
+
+        self.worksheet.conditional_format(
+            1,
+            0,
+            rows,
+            0,
+            {
+                "type": "text",
+                "criteria": "begins with",
+                "value": "_",
+                "format": self.output.format_out_data_err,
+            },
+        )
+
+        for col_num in self.QUANTITY_COLS:
+            cell = xl_rowcol_to_cell(1, col_num, row_abs=False, col_abs=False)
+            self.worksheet.conditional_format(
+                1,
+                col_num,
+                rows,
+                col_num,
+                {
+                    "type": "formula",
+                    "criteria": f"=INT({cell})={cell}",
+                    "format": self.output.format_num_int,
+                },
+            )
 
     def make_table(self, rows, parser_name):
         self.worksheet.add_table(
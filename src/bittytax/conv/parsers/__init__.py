@@ -1,66 +0,0 @@
-from . import (
-    accointing,
-    barclays,
-    binance,
-    bitfinex,
-    bitpanda,
-    bitstamp,
-    bittrex,
-    bittylicious,
-    blockchain,
-    blockfi,
-    bnktothefuture,
-    bscscan,
-    celsius,
-    cexio,
-    cgtcalculator,
-    changetip,
-    circle,
-    coinbase,
-    coinbasepro,
-    coinfloor,
-    coinlist,
-    coinmetro,
-    coinomi,
-    cointracking,
-    cryptocom,
-    cryptopia,
-    cryptsy,
-    electrum,
-    energyweb,
-    etherscan,
-    exodus,
-    gatehub,
-    generic,
-    gravity,
-    handcash,
-    hecoinfo,
-    helium,
-    hitbtc,
-    hotbit,
-    ii,
-    koinly,
-    kraken,
-    kucoin,
-    ledgerlive,
-    liquid,
-    mercatox,
-    nault,
-    nexo,
-    okx,
-    poloniex,
-    polygonscan,
-    qtrade,
-    qtwallet,
-    snowtrace,
-    staketax,
-    tradesatoshi,
-    trezor,
-    trezorsuite,
-    uphold,
-    volt,
-    wirex,
-    yoroi,
-    zelcore,
-    zerion,
-)
@@ -17,6 +17,7 @@ from ..exceptions import (
     UnexpectedTypeError,
 )
 from ..out_record import TransactionOutRecord
+from ..tradingpair import TradingPairSplitter
 
 PRECISION = Decimal("0." + "0" * 8)
 
@@ -60,6 +61,10 @@ QUOTE_ASSETS = [
 
 BASE_ASSETS = ["1INCH", "1INCHDOWN", "1INCHUP"]
 
+AMOUNT_ASSET = re.compile(r"([\d|,]*\.\d+)(\w+)$")
+
+TRADING_PAIRS = TradingPairSplitter(QUOTE_ASSETS)
+
 
 def parse_binance_trades(data_row, parser, **_kwargs):
     row_dict = data_row.row_dict
@@ -161,11 +166,7 @@ def parse_binance_trades_statement(data_row, parser, **_kwargs):
 
 
 def _split_trading_pair(trading_pair):
-    for quote_asset in QUOTE_ASSETS:
-        if trading_pair.endswith(quote_asset):
-            return trading_pair[: -len(quote_asset)], quote_asset
-
-    return None, None
+    return TRADING_PAIRS.split(trading_pair)
 
 
 def _split_asset(amount):
@@ -173,7 +174,7 @@ def _split_asset(amount):
         if amount.endswith(base_asset):
             return amount[: -len(base_asset)], base_asset
 
-    match = re.match(r"([\d|,]*\.\d+)(\w+)$", amount)
+    match = AMOUNT_ASSET.match(amount)
     if match:
         return match.group(1), match.group(2)
     return None, ""
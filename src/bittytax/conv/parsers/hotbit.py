@@ -1,16 +1,12 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2020
 
-import copy
-import sys
 from decimal import ROUND_DOWN, Decimal
 
-from colorama import Fore
-
-from ...config import config
 from ..dataparser import DataParser
-from ..exceptions import DataRowError, UnexpectedTradingPairError, UnexpectedTypeError
+from ..exceptions import UnexpectedTradingPairError, UnexpectedTypeError
 from ..out_record import TransactionOutRecord
+from ..tradingpair import TradingPairSplitter
 
 WALLET = "Hotbit"
 
@@ -60,20 +56,22 @@ QUOTE_ASSETS = [
     "nUSD",
 ]
 
+TRADING_PAIRS = TradingPairSplitter(QUOTE_ASSETS)
+
 PRECISION = Decimal("0.00000000")
 MAKER_FEE = Decimal(0.0005)
 TAKER_FEE = Decimal(0.002)
 
 
-def parse_hotbit_orders_v3(data_rows, parser, **kwargs):
-    parse_hotbit_orders_v1(data_rows, parser, type_str="Side", amount_str="Volume", **kwargs)
+def parse_hotbit_orders_v3(data_row, parser, **kwargs):
+    parse_hotbit_orders_v1(data_row, parser, type_str="Side", amount_str="Volume", **kwargs)
 
 
-def parse_hotbit_orders_v2(data_rows, parser, **kwargs):
-    parse_hotbit_orders_v1(data_rows, parser, type_str="Side", amount_str="Amount", **kwargs)
+def parse_hotbit_orders_v2(data_row, parser, **kwargs):
+    parse_hotbit_orders_v1(data_row, parser, type_str="Side", amount_str="Amount", **kwargs)
 
 
-def parse_hotbit_orders_v1(data_rows, parser, **kwargs):
+def parse_hotbit_orders_v1(data_row, parser, **kwargs):
     if kwargs.get("type_str"):
         type_str = kwargs["type_str"]
     else:
@@ -84,34 +82,11 @@ def parse_hotbit_orders_v1(data_rows, parser, **kwargs):
     else:
         amount_str = "Amount"
 
-    for row_index, data_row in enumerate(data_rows):
-        if config.debug:
-            sys.stderr.write(
-                f"{Fore.YELLOW}conv: "
-                f"row[{parser.in_header_row_num + data_row.line_num}] {data_row}\n"
-            )
-
-        if data_row.parsed:
-            continue
-
-        try:
-            _parse_hotbit_orders_row(data_rows, parser, data_row, row_index, type_str, amount_str)
-        except DataRowError as e:
-            data_row.failure = e
-        except (ValueError, ArithmeticError) as e:
-            if config.debug:
-                raise
-
-            data_row.failure = e
-
-
-def _parse_hotbit_orders_row(data_rows, parser, data_row, row_index, type_str, amount_str):
     if data_row.row[0] == "":
         return
 
     row_dict = data_row.row_dict
     data_row.timestamp = DataParser.parse_timestamp(row_dict["Date"])
-    data_row.parsed = True
 
     # Have to re-calculate the total as it's incorrect for USDT trades
     total = Decimal(row_dict["Price"].split(" ")[0]) * Decimal(row_dict[amount_str].split(" ")[0])
@@ -119,21 +94,19 @@ def _parse_hotbit_orders_row(data_rows, parser, data_row, row_index, type_str, a
     # Maker fees are a credit (+), add as gift-received
     if row_dict["Fee"][0] == "+":
         # Have to re-calculate the fee as rounding in datafile is incorrect
-        dup_data_row = copy.copy(data_row)
-        dup_data_row.row = []
-        dup_data_row.t_record = TransactionOutRecord(
+        fee_t_record = TransactionOutRecord(
             TransactionOutRecord.TYPE_GIFT_RECEIVED,
             data_row.timestamp,
             buy_quantity=(total * MAKER_FEE).quantize(PRECISION, rounding=ROUND_DOWN),
             buy_asset=row_dict["Fee"].split(" ")[1],
             wallet=WALLET,
         )
-        data_rows.insert(row_index + 1, dup_data_row)
 
         fee_quantity = None
         fee_asset = ""
     else:
         # Have to re-calculate the fee as rounding in datafile is incorrect
+        fee_t_record = None
         fee_quantity = (total * TAKER_FEE).quantize(PRECISION, rounding=ROUND_DOWN)
         fee_asset = row_dict["Fee"].split(" ")[1]
 
@@ -164,37 +137,17 @@ def _parse_hotbit_orders_row(data_rows, parser, data_row, row_index, type_str, a
     else:
         raise UnexpectedTypeError(parser.in_header.index(type_str), type_str, row_dict[type_str])
 
+    if fee_t_record:
+        data_row.add_t_record(fee_t_record)
 
-def parse_hotbit_trades(data_rows, parser, **_kwargs):
-    for row_index, data_row in enumerate(data_rows):
-        if config.debug:
-            sys.stderr.write(
-                f"{Fore.YELLOW}conv: "
-                f" row[{parser.in_header_row_num + data_row.line_num}] {data_row}\n"
-            )
 
-        if data_row.parsed:
-            continue
-
-        try:
-            _parse_hotbit_trades_row(data_rows, parser, data_row, row_index)
-        except DataRowError as e:
-            data_row.failure = e
-        except (ValueError, ArithmeticError) as e:
-            if config.debug:
-                raise
-
-            data_row.failure = e
-
-
-def _parse_hotbit_trades_row(data_rows, parser, data_row, row_index):
+def parse_hotbit_trades(data_row, parser, **_kwargs):
     row_dict = data_row.row_dict
 
     if "_" in row_dict["time"]:
         data_row.timestamp = DataParser.parse_timestamp(row_dict["time"].replace("_", " "))
     else:
         data_row.timestamp = DataParser.parse_timestamp(row_dict["time"], tz="Asia/Hong_Kong")
-    data_row.parsed = True
 
     base_asset, quote_asset = _split_trading_pair(row_dict["market"])
     if base_asset is None or quote_asset is None:
@@ -204,21 +157,18 @@ def _parse_hotbit_trades_row(data_rows, parser, data_row, row_index):
 
     # Maker fees are negative, add as gift-received
     if Decimal(row_dict["fee"]) < 0:
-        dup_data_row = copy.copy(data_row)
-        dup_data_row.row = []
-
-        dup_data_row.t_record = TransactionOutRecord(
+        fee_t_record = TransactionOutRecord(
             TransactionOutRecord.TYPE_GIFT_RECEIVED,
             data_row.timestamp,
             buy_quantity=abs(Decimal(row_dict["fee"]).quantize(PRECISION)),
             buy_asset=quote_asset,
             wallet=WALLET,
         )
-        data_rows.insert(row_index + 1, dup_data_row)
 
         fee_quantity = None
         fee_asset = ""
     else:
+        fee_t_record = None
         fee_quantity = Decimal(row_dict["fee"]).quantize(PRECISION)
         fee_asset = quote_asset
 
@@ -249,13 +199,12 @@ def _parse_hotbit_trades_row(data_rows, parser, data_row, row_index):
     else:
         raise UnexpectedTypeError(parser.in_header.index("side"), "side", row_dict["side"])
 
+    if fee_t_record:
+        data_row.add_t_record(fee_t_record)
 
-def _split_trading_pair(market):
-    for quote_asset in QUOTE_ASSETS:
-        if market.endswith(quote_asset):
-            return market[: -len(quote_asset)], quote_asset
 
-    return None, None
+def _split_trading_pair(market):
+    return TRADING_PAIRS.split(market)
 
 
 DataParser(
@@ -263,7 +212,7 @@ DataParser(
     "Hotbit Trades",
     ["Date", "Pair", "Side", "Price", "Volume", "Fee", "Total"],
     worksheet_name="Hotbit T",
-    all_handler=parse_hotbit_orders_v3,
+    row_handler=parse_hotbit_orders_v3,
 )
 
 DataParser(
@@ -271,7 +220,7 @@ DataParser(
     "Hotbit Trades",
     ["Date", "Pair", "Side", "Price", "Amount", "Fee", "Total"],
     worksheet_name="Hotbit T",
-    all_handler=parse_hotbit_orders_v2,
+    row_handler=parse_hotbit_orders_v2,
 )
 
 DataParser(
@@ -279,7 +228,7 @@ DataParser(
     "Hotbit Trades",
     ["Date", "Pair", "Type", "Price", "Amount", "Fee", "Total", "Export"],
     worksheet_name="Hotbit T",
-    all_handler=parse_hotbit_orders_v1,
+    row_handler=parse_hotbit_orders_v1,
 )
 
 DataParser(
@@ -287,7 +236,7 @@ DataParser(
     "Hotbit Trades",
     ["time", "market", "side", "price", "amount", "deal", "fee"],
     worksheet_name="Hotbit T",
-    all_handler=parse_hotbit_trades,
+    row_handler=parse_hotbit_trades,
 )
 
 # Format provided by request from support
@@ -309,5 +258,5 @@ DataParser(
         "deal_stock",
     ],
     worksheet_name="Hotbit T",
-    all_handler=parse_hotbit_trades,
+    row_handler=parse_hotbit_trades,
 )
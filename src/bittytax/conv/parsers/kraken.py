@@ -16,6 +16,7 @@ from ..exceptions import (
     UnexpectedTypeError,
 )
 from ..out_record import TransactionOutRecord
+from ..tradingpair import TradingPairSplitter
 
 WALLET = "Kraken"
 
@@ -340,17 +341,16 @@ def parse_kraken_trades(data_row, parser, **_kwargs):
 
 
 def _split_trading_pair(trading_pair):
-    for quote_asset in sorted(QUOTE_ASSETS, reverse=True):
-        if trading_pair.endswith(quote_asset):
-            base_asset = trading_pair[: -len(quote_asset)]
+    return TRADING_PAIRS.split(trading_pair)
+
+
+def _is_base_asset(base_asset):
+    if len(base_asset) < 3:
+        return base_asset in ASSETS_SHORT
+    return True
 
-            if len(base_asset) < 3:
-                if base_asset in ASSETS_SHORT:
-                    return base_asset, quote_asset
-            else:
-                return base_asset, quote_asset
 
-    return None, None
+TRADING_PAIRS = TradingPairSplitter(QUOTE_ASSETS, _is_base_asset)
 
 
 def _normalise_asset(asset):
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2020
-# Generate the constants for the Binance parser.
+# Generate the constants for the Binance parser and verify the split method
 
 import requests
 
+from bittytax.conv.tradingpair import TradingPairSplitter
+
 
 def get_assets():
     response = requests.get("https://api.binance.com/api/v3/exchangeInfo", timeout=10)
@@ -22,6 +24,23 @@ def get_assets():
             if base[0].isdigit() and base not in base_assets:
                 base_assets.append(base)
 
+        # Validate split method
+        passed = True
+        trading_pairs = TradingPairSplitter(quote_assets)
+        for symbol in response.json()["symbols"]:
+            bt_base, bt_quote = trading_pairs.split(symbol["symbol"])
+            if bt_base != symbol["baseAsset"] or bt_quote != symbol["quoteAsset"]:
+                passed = False
+                print(
+                    f"{symbol['symbol']} = {bt_base}/{bt_quote} [Failure] "
+                    f"({symbol['baseAsset']} & {symbol['quoteAsset']})"
+                )
+
+        if passed:
+            print("===Split trading pairs PASSED===")
+        else:
+            print("===Split trading pairs FAILED===")
+
         print("\nQUOTE_ASSETS = [")
         for i in sorted(quote_assets):
             print(f'    "{i}",')
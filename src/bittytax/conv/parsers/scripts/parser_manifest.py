@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+# Generate the manifest of parser headers, so only the parsers needed are imported.
+# Run again whenever a parser or merger is added or a header is changed, or use --check.
+
+import argparse
+import importlib
+import json
+import os
+import pkgutil
+import sys
+
+from bittytax.conv import mergers, parsers
+from bittytax.conv.datamerge import DataMerge
+from bittytax.conv.dataparser import PARSER_MANIFEST, DataParser
+
+
+def import_all(package):
+    modules = []
+    for module_info in pkgutil.iter_modules(package.__path__):
+        if not module_info.ispkg:
+            importlib.import_module(f"{package.__name__}.{module_info.name}")
+            modules.append(module_info.name)
+    return modules
+
+
+def get_manifest():
+    import_all(parsers)
+
+    manifest = {"parsers": [], "mergers": {}}
+    for parser in DataParser.parsers:
+        manifest["parsers"].append(
+            [
+                parser.module,
+                parser.p_type,
+                parser.name,
+                parser.delimiter,
+                [col if isinstance(col, str) else None for col in parser.header],
+            ]
+        )
+
+    for module in import_all(mergers):
+        manifest["mergers"][module] = sorted(
+            {
+                p["obj"].module
+                for data_merge in DataMerge.mergers
+                if data_merge.merge_handler.__module__.endswith(f".{module}")
+                for p in data_merge.parsers.values()
+                if p["req"] == DataMerge.MAN
+            }
+        )
+
+    return manifest
+
+
+def dump_manifest(manifest):
+    # One parser per line keeps the diffs readable
+    parser_lines = ",\n".join(
+        f"        {json.dumps(p, ensure_ascii=False)}" for p in manifest["parsers"]
+    )
+    return (
+        f'{{\n    "parsers": [\n{parser_lines}\n    ],\n'
+        f'    "mergers": {json.dumps(manifest["mergers"], sort_keys=True)}\n}}\n'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--check", action="store_true", help="check the manifest is up to date, without writing"
+    )
+    args = parser.parse_args()
+
+    filename = os.path.join(os.path.dirname(parsers.__file__), os.path.basename(PARSER_MANIFEST))
+    manifest_str = dump_manifest(get_manifest())
+
+    if args.check:
+        with open(filename, "r", encoding="utf-8") as manifest_file:
+            if manifest_file.read() != manifest_str:
+                print(f"{filename} is out of date, regenerate with {parser.prog}")
+                return 1
+        print(f"{filename} is up to date")
+        return 0
+
+    with open(filename, "w", encoding="utf-8") as manifest_file:
+        manifest_file.write(manifest_str)
+    print(f"{filename} written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2021
 
-import copy
 import json
 import sys
 from decimal import Decimal
@@ -10,7 +9,7 @@ from colorama import Fore
 
 from ...config import config
 from ..dataparser import DataParser
-from ..exceptions import DataRowError, UnexpectedContentError, UnexpectedTypeError
+from ..exceptions import UnexpectedContentError, UnexpectedTypeError
 from ..out_record import TransactionOutRecord
 
 PRECISION = Decimal("0." + "0" * 18)
@@ -18,34 +17,11 @@ PRECISION = Decimal("0." + "0" * 18)
 WALLET = "Ethereum"
 
 
-def parse_zerion(data_rows, parser, **_kwargs):
-    for row_index, data_row in enumerate(data_rows):
-        if config.debug:
-            sys.stderr.write(
-                f"{Fore.YELLOW}conv: "
-                f"row[{parser.in_header_row_num + data_row.line_num}] {data_row}\n"
-            )
-
-        if data_row.parsed:
-            continue
-
-        try:
-            _parse_zerion_row(data_rows, parser, data_row, row_index)
-        except DataRowError as e:
-            data_row.failure = e
-        except (ValueError, ArithmeticError) as e:
-            if config.debug:
-                raise
-
-            data_row.failure = e
-
-
-def _parse_zerion_row(data_rows, parser, data_row, row_index):
+def parse_zerion(data_row, parser, **_kwargs):
     row_dict = data_row.row_dict
     data_row.timestamp = DataParser.parse_timestamp(
         row_dict["Date"] + " " + row_dict["Time"], tz="Europe/London"
     )
-    data_row.parsed = True
 
     fee_quantity, fee_asset, fee_value = _get_data(
         data_row, "Fee Amount", "Fee Currency", "Fee Fiat Amount", "Fee Fiat Currency"
@@ -70,7 +46,7 @@ def _parse_zerion_row(data_rows, parser, data_row, row_index):
 
     if row_dict["Accounting Type"] == "Income":
         if len(t_ins) > 1:
-            _do_zerion_multi_deposit(data_row, data_rows, row_index, t_ins)
+            _do_zerion_multi_deposit(data_row, t_ins)
         else:
             buy_quantity, buy_asset, buy_value = _get_data(
                 data_row,
@@ -94,7 +70,7 @@ def _parse_zerion_row(data_rows, parser, data_row, row_index):
             )
     elif row_dict["Accounting Type"] == "Spend":
         if len(t_outs) > 1:
-            _do_zerion_multi_withdrawal(data_row, data_rows, row_index, t_outs)
+            _do_zerion_multi_withdrawal(data_row, t_outs)
         else:
             sell_quantity, sell_asset, sell_value = _get_data(
                 data_row,
@@ -127,10 +103,10 @@ def _parse_zerion_row(data_rows, parser, data_row, row_index):
     elif row_dict["Accounting Type"] == "Trade":
         if len(t_ins) == 1:
             # Multi-sell or normal Trade
-            _do_zerion_multi_sell(data_row, data_rows, row_index, t_ins, t_outs)
+            _do_zerion_multi_sell(data_row, t_ins, t_outs)
         elif len(t_outs) == 1:
             # Multi-buy
-            _do_zerion_multi_buy(data_row, data_rows, row_index, t_ins, t_outs)
+            _do_zerion_multi_buy(data_row, t_ins, t_outs)
         else:
             # Multi-sell to Multi-buy trade not supported
             raise UnexpectedContentError(
@@ -146,8 +122,8 @@ def _parse_zerion_row(data_rows, parser, data_row, row_index):
         )
 
 
-def _do_zerion_multi_deposit(data_row, data_rows, row_index, t_ins):
-    for cnt, t_in in enumerate(t_ins):
+def _do_zerion_multi_deposit(data_row, t_ins):
+    for t_in in t_ins:
         buy_quantity, buy_asset, buy_value = _get_data_json(data_row, t_in)
         t_record = TransactionOutRecord(
             TransactionOutRecord.TYPE_DEPOSIT,
@@ -158,16 +134,10 @@ def _do_zerion_multi_deposit(data_row, data_rows, row_index, t_ins):
             wallet=WALLET,
         )
 
-        if not data_row.t_record:
-            data_row.t_record = t_record
-        else:
-            dup_data_row = copy.copy(data_row)
-            dup_data_row.row = []
-            dup_data_row.t_record = t_record
-            data_rows.insert(row_index + cnt, dup_data_row)
+        data_row.add_t_record(t_record)
 
 
-def _do_zerion_multi_withdrawal(data_row, data_rows, row_index, t_outs):
+def _do_zerion_multi_withdrawal(data_row, t_outs):
     fee_quantity, fee_asset, fee_value = _get_data(
         data_row, "Fee Amount", "Fee Currency", "Fee Fiat Amount", "Fee Fiat Currency"
     )
@@ -203,16 +173,10 @@ def _do_zerion_multi_withdrawal(data_row, data_rows, row_index, t_outs):
             wallet=WALLET,
         )
 
-        if not data_row.t_record:
-            data_row.t_record = t_record
-        else:
-            dup_data_row = copy.copy(data_row)
-            dup_data_row.row = []
-            dup_data_row.t_record = t_record
-            data_rows.insert(row_index + cnt, dup_data_row)
+        data_row.add_t_record(t_record)
 
 
-def _do_zerion_multi_sell(data_row, data_rows, row_index, t_ins, t_outs):
+def _do_zerion_multi_sell(data_row, t_ins, t_outs):
     fee_quantity, fee_asset, fee_value = _get_data(
         data_row, "Fee Amount", "Fee Currency", "Fee Fiat Amount", "Fee Fiat Currency"
     )
@@ -271,16 +235,10 @@ def _do_zerion_multi_sell(data_row, data_rows, row_index, t_ins, t_outs):
             wallet=WALLET,
         )
 
-        if not data_row.t_record:
-            data_row.t_record = t_record
-        else:
-            dup_data_row = copy.copy(data_row)
-            dup_data_row.row = []
-            dup_data_row.t_record = t_record
-            data_rows.insert(row_index + cnt, dup_data_row)
+        data_row.add_t_record(t_record)
 
 
-def _do_zerion_multi_buy(data_row, data_rows, row_index, t_ins, t_outs):
+def _do_zerion_multi_buy(data_row, t_ins, t_outs):
     fee_quantity, fee_asset, fee_value = _get_data(
         data_row, "Fee Amount", "Fee Currency", "Fee Fiat Amount", "Fee Fiat Currency"
     )
@@ -338,13 +296,7 @@ def _do_zerion_multi_buy(data_row, data_rows, row_index, t_ins, t_outs):
             wallet=WALLET,
         )
 
-        if not data_row.t_record:
-            data_row.t_record = t_record
-        else:
-            dup_data_row = copy.copy(data_row)
-            dup_data_row.row = []
-            dup_data_row.t_record = t_record
-            data_rows.insert(row_index + cnt, dup_data_row)
+        data_row.add_t_record(t_record)
 
 
 def _get_data(data_row, quantity_hdr, asset_hdr, value_hdr, value_currency_hdr, changes=None):
@@ -409,5 +361,5 @@ DataParser(
         "Changes JSON",
     ],
     worksheet_name="Zerion",
-    all_handler=parse_zerion,
+    row_handler=parse_zerion,
 )
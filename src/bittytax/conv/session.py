@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+from ..context import get_context
+
+
+class ConvSession:  # pylint: disable=too-few-public-methods, too-many-instance-attributes
+    DUPLICATES_KEY_ROW = "ROW"
+    DUPLICATES_KEY_TRANSACTION = "TRANSACTION"
+
+    def __init__(
+        self, remove_duplicates=False, duplicates_key=DUPLICATES_KEY_ROW, offline=False, jobs=1
+    ):
+        self.remove_duplicates = remove_duplicates
+        self.duplicates_key = duplicates_key
+        self.offline = offline
+        self.jobs = jobs
+        self.executor = None
+
+        self.data_files = {}
+        self.data_files_ordered = []
+
+        self.price_data = None
+        self.fx_rates = {}
+        self.fx_spans = {}
+        # Set if a value was converted at the latest rate, as it changes until the day is over
+        self.latest_rates = False
+
+
+def get_session():
+    # Everything read by one conversion is kept in its session, instead of in the classes
+    context = get_context()
+    if context.conv_session is None:
+        context.conv_session = ConvSession()
+    return context.conv_session
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+
+class TradingPairSplitter:
+    def __init__(self, quote_assets, is_base_asset=None):
+        # Quote assets are stored reversed in a trie, so a trading pair can be matched from its end
+        self.trie = {}
+        for quote_asset in quote_assets:
+            node = self.trie
+            for char in reversed(quote_asset):
+                node = node.setdefault(char, {})
+            node[None] = quote_asset
+
+        self.is_base_asset = is_base_asset
+        self.trading_pairs = {}
+
+    def split(self, trading_pair):
+        if trading_pair not in self.trading_pairs:
+            self.trading_pairs[trading_pair] = self._split(trading_pair)
+        return self.trading_pairs[trading_pair]
+
+    def _split(self, trading_pair):
+        for quote_asset in self.get_quote_assets(trading_pair):
+            base_asset = trading_pair[: -len(quote_asset)]
+            if self.is_base_asset is None or self.is_base_asset(base_asset):
+                return base_asset, quote_asset
+
+        return None, None
+
+    def get_quote_assets(self, trading_pair):
+        # All the quote assets the trading pair ends with, longest first
+        quote_assets = []
+        node = self.trie
+        for char in reversed(trading_pair):
+            node = node.get(char)
+            if node is None:
+                break
+
+            if None in node:
+                quote_assets.append(node[None])
+
+        return reversed(quote_assets)
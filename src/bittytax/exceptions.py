@@ -41,5 +41,28 @@ class MissingDataError(TransactionParserError):
 
 
 class ImportFailureError(Exception):
+    def __init__(self, failures=None):
+        super().__init__()
+        self.failures = failures or []
+
     def __str__(self):
         return "Import failure"
+
+
+class ImportFileError(Exception):
+    def __init__(self, filename, error):
+        super().__init__()
+        self.filename = filename
+        self.error = error
+
+    def __str__(self):
+        return f"File could not be read: {self.error}"
+
+
+class ApiError(Exception):
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -2,20 +2,21 @@
 # (c) Nano Nano Ltd 2019
 
 import csv
+import os
 import sys
 import warnings
+import zipfile
 from decimal import Decimal, InvalidOperation
 
 import dateutil.parser
-import xlrd
 from colorama import Back, Fore
-from openpyxl import load_workbook
 from tqdm import tqdm, trange
 
 from .config import config
 from .constants import ERROR, TZ_UTC
 from .exceptions import (
     DataValueError,
+    ImportFileError,
     MissingDataError,
     TimestampParserError,
     TransactionParserError,
@@ -32,9 +33,32 @@ class ImportRecords:
         self.success_cnt = 0
         self.failure_cnt = 0
 
+    def import_file(self, filename):
+        _, file_extension = os.path.splitext(filename)
+        if file_extension == ".xlsx":
+            self.import_excel_xlsx(filename)
+        elif file_extension == ".xls":
+            self.import_excel_xls(filename)
+        else:
+            with open(filename, newline="", encoding="utf-8") as csv_file:
+                try:
+                    self.import_csv(csv_file)
+                except (UnicodeDecodeError, csv.Error) as e:
+                    raise ImportFileError(filename, e) from e
+
     def import_excel_xlsx(self, filename):
+        # Only imported for the file type being read, as they are slow to load
+        # pylint: disable=import-outside-toplevel
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        # pylint: enable=import-outside-toplevel
+
         warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
-        workbook = load_workbook(filename=filename, read_only=False, data_only=True)
+        try:
+            workbook = load_workbook(filename=filename, read_only=False, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            raise ImportFileError(filename, e) from e
         print(f"{Fore.WHITE}Excel file: {Fore.YELLOW}{filename}")
 
         for sheet_name in workbook.sheetnames:
@@ -84,7 +108,12 @@ class ImportRecords:
         del workbook
 
     def import_excel_xls(self, filename):
-        workbook = xlrd.open_workbook(filename)
+        import xlrd  # pylint: disable=import-outside-toplevel
+
+        try:
+            workbook = xlrd.open_workbook(filename)
+        except xlrd.XLRDError as e:
+            raise ImportFileError(filename, e) from e
         print(f"{Fore.WHITE}Excel file: {Fore.YELLOW}{filename}")
 
         for worksheet in workbook.sheets():
@@ -140,6 +169,8 @@ class ImportRecords:
 
     @staticmethod
     def convert_cell_xls(cell, workbook):
+        import xlrd  # pylint: disable=import-outside-toplevel
+
         if cell.ctype == xlrd.XL_CELL_DATE:
             datetime = xlrd.xldate.xldate_as_datetime(cell.value, workbook.datemode)
             if datetime.microsecond:
@@ -190,6 +221,48 @@ class ImportRecords:
             self.t_rows.append(t_row)
             self.update_cnts(t_row)
 
+    def import_out_records(self, out_records, worksheet_name=None):
+        # Records from the conversion tool are used as they are, without being written to a file
+        for row_num, out_record in enumerate(out_records, start=2):
+            t_row = TransactionRow(self.convert_out_record(out_record), row_num, worksheet_name)
+            try:
+                t_row.parse()
+            except TransactionParserError as e:
+                t_row.failure = e
+
+            if config.debug or t_row.failure:
+                tqdm.write(f"{Fore.YELLOW}import: {t_row}")
+
+            if t_row.failure:
+                tqdm.write(f"{ERROR} {t_row.failure}")
+
+            self.t_rows.append(t_row)
+            self.update_cnts(t_row)
+
+    @classmethod
+    def convert_out_record(cls, out_record):
+        return [
+            out_record.t_type,
+            cls.convert_decimal(out_record.buy_quantity),
+            out_record.buy_asset,
+            cls.convert_decimal(out_record.buy_value),
+            cls.convert_decimal(out_record.sell_quantity),
+            out_record.sell_asset,
+            cls.convert_decimal(out_record.sell_value),
+            cls.convert_decimal(out_record.fee_quantity),
+            out_record.fee_asset,
+            cls.convert_decimal(out_record.fee_value),
+            out_record.wallet,
+            out_record.timestamp,
+            out_record.note,
+        ]
+
+    @staticmethod
+    def convert_decimal(decimal):
+        if decimal is None:
+            return ""
+        return decimal
+
     def update_cnts(self, t_row):
         if t_row.failure is not None:
             self.failure_cnt += 1
@@ -347,6 +420,10 @@ class TransactionRow:
         )
 
     def parse_timestamp(self):
+        if not isinstance(self.row_dict["Timestamp"], str):
+            # Already a datetime, i.e. a record from the conversion tool
+            return self.row_dict["Timestamp"]
+
         try:
             timestamp = dateutil.parser.parse(self.row_dict["Timestamp"])
         except ValueError as e:
@@ -361,10 +438,10 @@ class TransactionRow:
         return timestamp
 
     def validate_quantity(self, quantity_hdr, required):
-        if self.row_dict[quantity_hdr]:
+        if self.row_dict[quantity_hdr] != "":
             if required:
                 try:
-                    quantity = Decimal(self.strip_non_digits(self.row_dict[quantity_hdr]))
+                    quantity = self.to_decimal(self.row_dict[quantity_hdr])
                 except InvalidOperation as e:
                     raise DataValueError(
                         self.HEADER.index(quantity_hdr),
@@ -400,10 +477,10 @@ class TransactionRow:
         return None
 
     def validate_value(self, value_hdr, required):
-        if self.row_dict[value_hdr]:
+        if self.row_dict[value_hdr] != "":
             if required:
                 try:
-                    value = Decimal(self.strip_non_digits(self.row_dict[value_hdr]))
+                    value = self.to_decimal(self.row_dict[value_hdr])
                 except InvalidOperation as e:
                     raise DataValueError(
                         self.HEADER.index(value_hdr),
@@ -425,6 +502,12 @@ class TransactionRow:
 
         return None
 
+    @classmethod
+    def to_decimal(cls, value):
+        if isinstance(value, Decimal):
+            return value
+        return Decimal(cls.strip_non_digits(value))
+
     @staticmethod
     def strip_non_digits(string):
         return string.strip("£€$").replace(",", "")
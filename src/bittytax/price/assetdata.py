@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2020
 
-import os
-
 from ..config import config
-from ..constants import CACHE_DIR
 from .datasource import BittyTaxAPI, DataSourceBase, Frankfurter
 from .exceptions import UnexpectedDataSourceError
+from .pricestore import get_price_store
 
 
 class AssetData:
@@ -15,11 +13,11 @@ class AssetData:
     def __init__(self):
         self.data_sources = {}
 
-        if not os.path.exists(CACHE_DIR):
-            os.mkdir(CACHE_DIR)
-
+        price_store = get_price_store()
         for data_source_class in DataSourceBase.__subclasses__():
-            self.data_sources[data_source_class.__name__.upper()] = data_source_class()
+            self.data_sources[data_source_class.__name__.upper()] = price_store.get_data_source(
+                data_source_class
+            )
 
     def get_assets(self, req_symbol, req_data_source, search_terms):
         if not req_data_source or req_data_source == "ALL":
@@ -134,10 +132,7 @@ class AssetData:
 
                 if not no_cache:
                     # Check cache first
-                    if (
-                        pair in self.data_sources[ds].prices
-                        and date in self.data_sources[ds].prices[pair]
-                    ):
+                    if self.data_sources[ds].is_cached(pair, date):
                         asset_id["price"] = self.data_sources[ds].prices[pair][date]["price"]
                         all_assets.append(asset_id)
                         continue
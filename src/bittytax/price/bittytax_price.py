@@ -18,11 +18,16 @@ from ..version import __version__
 from .assetdata import AssetData
 from .datasource import DataSourceBase
 from .exceptions import DataSourceError
+from .pricecache import PriceCacheLayer, export_cache, import_cache
 from .valueasset import ValueAsset
 
 CMD_LATEST = "latest"
 CMD_HISTORY = "historic"
 CMD_LIST = "list"
+CMD_CACHE = "cache"
+CMD_WARM = "warm"
+CMD_CACHE_EXPORT = "export"
+CMD_CACHE_IMPORT = "import"
 
 if sys.stdout.encoding != "UTF-8":
     if sys.version_info[:2] >= (3, 7):
@@ -141,6 +146,23 @@ def main():
     )
     parser_list.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
 
+    add_cache_parser(subparsers)
+
+    parser_warm = subparsers.add_parser(
+        CMD_WARM,
+        help="fill the price cache for transaction records",
+        description="Look up all the historical prices needed to calculate tax for the "
+        "transaction records in [filename], so they are in the price cache before 'bittytax' is "
+        "run. A directory can be given, to warm the price cache for all the records files in it.",
+    )
+    parser_warm.add_argument(
+        "filename",
+        type=str,
+        nargs="+",
+        help="filename of transaction records, or a directory of them",
+    )
+    parser_warm.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+
     args = parser.parse_args()
     config.debug = args.debug
 
@@ -217,19 +239,73 @@ def main():
             else:
                 parser.exit(f"{WARNING} Current price for {symbol} is not available")
     elif args.command == CMD_LIST:
-        symbol = args.asset
-        try:
-            assets = AssetData().get_assets(symbol, args.datasource, args.search_terms)
-        except DataSourceError as e:
-            parser.exit(f"{ERROR} {e}")
+        run_list_command(parser, args)
+    elif args.command == CMD_CACHE:
+        run_cache_command(parser, args)
+    elif args.command == CMD_WARM:
+        run_warm_command(parser, args)
+
+
+def add_cache_parser(subparsers):
+    parser_cache = subparsers.add_parser(
+        CMD_CACHE,
+        help="export or import the price cache",
+        description="Export the price cache to a snapshot file, which can be used as a shared "
+        "price cache (see price_cache_layers), or import a snapshot into the price cache.",
+    )
+    if sys.version_info[:2] >= (3, 7):
+        cache_subparsers = parser_cache.add_subparsers(dest="cache_command", required=True)
+    else:
+        cache_subparsers = parser_cache.add_subparsers(dest="cache_command")
 
-        if symbol and not assets:
-            parser.exit(f"{WARNING} Asset {symbol} not found")
+    parser_export = cache_subparsers.add_parser(
+        CMD_CACHE_EXPORT,
+        help="export the price cache to a snapshot file",
+        description="Export the price cache, including any shared price caches, to a snapshot "
+        "[filename].",
+    )
+    parser_export.add_argument("filename", type=str, nargs=1, help="filename of the snapshot")
+    parser_export.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+
+    parser_import = cache_subparsers.add_parser(
+        CMD_CACHE_IMPORT,
+        help="import a snapshot file into the price cache",
+        description="Import the prices in a snapshot [filename] into the price cache.",
+    )
+    parser_import.add_argument("filename", type=str, nargs=1, help="filename of the snapshot")
+    parser_import.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+
+
+def run_list_command(parser, args):
+    symbol = args.asset
+    try:
+        assets = AssetData().get_assets(symbol, args.datasource, args.search_terms)
+    except DataSourceError as e:
+        parser.exit(f"{ERROR} {e}")
 
-        if args.search_terms and not assets:
-            parser.exit("No results found")
+    if symbol and not assets:
+        parser.exit(f"{WARNING} Asset {symbol} not found")
 
-        output_assets(assets)
+    if args.search_terms and not assets:
+        parser.exit("No results found")
+
+    output_assets(assets)
+
+
+def run_cache_command(parser, args):
+    try:
+        if args.cache_command == CMD_CACHE_EXPORT:
+            snapshot = export_cache(
+                args.filename[0],
+                datasource_choices(),
+                [PriceCacheLayer(path) for path in config.price_cache_layers],
+            )
+        else:
+            snapshot = import_cache(args.filename[0], datasource_choices())
+    except (IOError, ValueError) as e:
+        parser.exit(f"{ERROR} {e}")
+
+    output_snapshot(args.cache_command, args.filename[0], snapshot)
 
 
 def get_latest_btc_price():
@@ -282,6 +358,72 @@ def output_assets(assets):
         )
 
 
+def run_warm_command(parser, args):
+    # Only imported for this command, the accounting tool's modules are not needed otherwise
+    from .pricewarmer import PriceWarmer  # pylint: disable=import-outside-toplevel
+
+    try:
+        price_warmer = PriceWarmer()
+        price_warmer.add_records(
+            price_warmer.import_records(price_warmer.get_filenames(args.filename))
+        )
+        price_warmer.warm()
+    except (DataSourceError, IOError) as e:
+        parser.exit(f"{ERROR} {e}")
+
+    output_coverage(price_warmer)
+    if price_warmer.errors:
+        sys.exit(1)
+
+
+def output_coverage(price_warmer):
+    required = sum(len(dates) for dates in price_warmer.required.values())
+    data_sources = {}
+    not_found = {}
+    for (asset, quote), dates in price_warmer.required.items():
+        coverage = price_warmer.coverage.get((asset, quote), {})
+        for date in sorted(dates):
+            if coverage.get(date):
+                data_sources[coverage[date]] = data_sources.get(coverage[date], 0) + 1
+            else:
+                not_found.setdefault(f"{asset}/{quote}", []).append(date)
+
+    for pair, e in sorted(price_warmer.errors.items()):
+        print(f"{ERROR} {pair[0]}/{pair[1]}: {e}")
+
+    for pair, dates in sorted(not_found.items()):
+        print(
+            f"{WARNING} Price for {pair} is not available for {len(dates):,} day(s) "
+            f"({dates[0]} to {dates[-1]})"
+        )
+
+    print(
+        f"{Fore.WHITE}warm: {required:,} price(s) required for "
+        f"{len(price_warmer.required):,} pair(s), "
+        f"{sum(price_warmer.cached.values()):,} already cached"
+    )
+    for data_source, cnt in sorted(data_sources.items(), key=lambda x: (-x[1], x[0])):
+        print(f"{Fore.WHITE}warm: {Fore.YELLOW}{cnt:,} found {Fore.CYAN}via {data_source}")
+    print(
+        f"{Fore.WHITE}warm: {Fore.YELLOW}{sum(data_sources.values()):,} found, "
+        f"{sum(len(dates) for dates in not_found.values()):,} not found"
+    )
+
+
+def output_snapshot(cache_command, filename, snapshot):
+    for name in sorted(snapshot):
+        print(
+            f"{Fore.WHITE}{name}: {Fore.YELLOW}"
+            f"{sum(len(prices) for prices in snapshot[name].values()):,} price(s) "
+            f"{Fore.WHITE}for {len(snapshot[name]):,} pair(s)"
+        )
+
+    if cache_command == CMD_CACHE_EXPORT:
+        print(f"{Fore.WHITE}price cache exported: {Fore.YELLOW}{filename}")
+    else:
+        print(f"{Fore.WHITE}price cache imported: {Fore.YELLOW}{filename}")
+
+
 def validate_date(value):
     match = re.match(r"^([0-9]{4}-[0-9]{2}-[0-9]{2})|([0-9]{2}\/[0-9]{2}\/[0-9]{4})$", value)
 
@@ -1,23 +1,31 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2019
 
-import atexit
-import json
 import os
 import platform
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 import dateutil.parser
-import requests
 from colorama import Fore
 
 from ..config import config
 from ..constants import CACHE_DIR, TZ_UTC, WARNING
 from ..version import __version__
-from .exceptions import UnexpectedDataSourceAssetIdError
+from .exceptions import DataSourceReplayError, UnexpectedDataSourceAssetIdError
+from .pricecache import (
+    legacy_cache_filename,
+    load_cache,
+    merge_prices,
+    stack_prices,
+    update_prices,
+)
+from .replay import ENV_DATA_SOURCE_URL, ResponseReplay, redirect_url
 
 CRYPTOCOMPARE_MAX_DAYS = 2000
+CRYPTOCOMPARE_MAX_FSYMS_LEN = 300
+COINGECKO_MAX_IDS = 100
 COINPAPRIKA_MAX_DAYS = 5000
 
 
@@ -33,13 +41,15 @@ class DataSourceBase:
         self.assets = {}
         self.ids = {}
         self.prices = self.load_prices()
+        # Prices added since the cache was loaded, so they can be passed to another process
+        self.new_prices = {}
+        self.replay = ResponseReplay.from_env()
+        self.base_url = os.environ.get(ENV_DATA_SOURCE_URL)
 
         for pair in sorted(self.prices):
             if config.debug:
                 print(f"{Fore.YELLOW}price: {self.name()} ({pair}) data cache loaded")
 
-        atexit.register(self.dump_prices)
-
     def name(self):
         return self.__class__.__name__
 
@@ -47,19 +57,38 @@ class DataSourceBase:
         if config.debug:
             print(f"{Fore.YELLOW}price: GET {url}")
 
-        response = requests.get(url, headers={"User-Agent": self.USER_AGENT}, timeout=self.TIME_OUT)
+        if self.replay and self.replay.mode == ResponseReplay.MODE_REPLAY:
+            json_resp = self.replay.load(url)
+            if json_resp is None:
+                raise DataSourceReplayError(self.name(), url)
+            return json_resp
+
+        # Not imported until a request is made, most lookups are answered from the cache
+        import requests  # pylint: disable=import-outside-toplevel
+
+        response = requests.get(
+            redirect_url(url, self.base_url) if self.base_url else url,
+            headers={"User-Agent": self.USER_AGENT},
+            timeout=self.TIME_OUT,
+        )
 
         if response.status_code in [429, 502, 503, 504]:
             response.raise_for_status()
 
-        if response:
-            return response.json()
-        return {}
+        json_resp = response.json() if response else {}
+        if self.replay:
+            self.replay.save(url, json_resp)
+        return json_resp
 
-    def update_prices(self, pair, prices, timestamp):
-        if pair not in self.prices:
-            self.prices[pair] = {}
+    def get_latest_multi(self, _assets, _quote):
+        # Only supported by data sources which have a multi-symbol endpoint
+        return None
 
+    def get_historical_range(self, _asset, _quote, _start, _end):
+        # Only supported by data sources which have a time series endpoint
+        return None
+
+    def update_prices(self, pair, prices, timestamp):
         # We are not interested in today's latest price, only the days closing price, also need to
         #  filter any erroneous future dates returned
         prices = {
@@ -74,45 +103,69 @@ class DataSourceBase:
         if date not in prices and timestamp.date() < datetime.now().date():
             prices[date] = {"price": None, "url": None}
 
-        self.prices[pair].update(prices)
+        # Missing prices are only cached for a while, the data source might add them later
+        fetched = int(time.time())
+        for price in prices.values():
+            if price["price"] is None:
+                price["fetched"] = fetched
+
+        self.add_prices(pair, prices)
+
+    def add_prices(self, pair, prices):
+        self.prices.setdefault(pair, {}).update(prices)
+        self.new_prices.setdefault(pair, {}).update(prices)
+
+    def is_cached(self, pair, date):
+        if pair not in self.prices or date not in self.prices[pair]:
+            return False
+
+        if self.prices[pair][date]["price"] is not None:
+            return True
+        return not self.is_missing_price_expired(date, self.prices[pair][date].get("fetched"))
+
+    def is_missing_price_expired(self, date, fetched):
+        ttls = config.price_cache_missing_ttl.get(
+            self.name(), config.price_cache_missing_ttl.get("default", [])
+        )
+        if not ttls:
+            return False
+
+        if fetched is None:
+            # Cached before missing prices had an expiry
+            return True
+
+        # Prices which were only missing for a recent date are the most likely to be added
+        age = (
+            datetime.fromtimestamp(fetched).date() - datetime.strptime(date, "%Y-%m-%d").date()
+        ).days
+        ttl = next((ttl for max_age, ttl in ttls if age <= max_age), ttls[-1][1])
+        return time.time() >= fetched + ttl * 24 * 60 * 60
+
+    def add_cache_layers(self, layers):
+        # Prices from a shared cache are only used for lookups, they are never written to the
+        #  local cache, unless the local cache has no price for that date
+        if layers:
+            self.prices = stack_prices([self.prices] + layers)
 
     def load_prices(self):
-        filename = os.path.join(CACHE_DIR, self.name() + ".json")
-        if not os.path.exists(filename):
-            return {}
+        return load_cache(self.name())
 
+    def dump_prices(self):
+        # A cache in the legacy format is upgraded, even when there are no new prices to add
+        if not self.new_prices and not os.path.exists(
+            legacy_cache_filename(CACHE_DIR, self.name())
+        ):
+            return
+
+        # Prices saved by another process are picked up for the pairs which have changed
         try:
-            with open(filename, "r", encoding="utf-8") as price_cache:
-                json_prices = json.load(price_cache)
-                return {
-                    pair: {
-                        date: {
-                            "price": self.str_to_decimal(price["price"]),
-                            "url": price["url"],
-                        }
-                        for date, price in json_prices[pair].items()
-                    }
-                    for pair in json_prices
-                }
-        except (IOError, ValueError):
-            print(f"{WARNING} Data cached for {self.name()} could not be loaded")
-            return {}
+            prices = update_prices(CACHE_DIR, self.name(), self.new_prices)
+        except IOError:
+            print(f"{WARNING} Data cached for {self.name()} could not be saved")
+            return
 
-    def dump_prices(self):
-        with open(
-            os.path.join(CACHE_DIR, self.name() + ".json"), "w", encoding="utf-8"
-        ) as price_cache:
-            json_prices = {
-                pair: {
-                    date: {
-                        "price": self.decimal_to_str(price["price"]),
-                        "url": price["url"],
-                    }
-                    for date, price in self.prices[pair].items()
-                }
-                for pair in self.prices
-            }
-            json.dump(json_prices, price_cache, indent=4, sort_keys=True)
+        merge_prices(self.prices, {pair: prices[pair] for pair in self.new_prices})
+        self.new_prices = {}
 
     def get_config_assets(self):
         for symbol in config.data_source_select:
@@ -175,20 +228,6 @@ class DataSourceBase:
     def pair(asset, quote):
         return asset + "/" + quote
 
-    @staticmethod
-    def str_to_decimal(price):
-        if price:
-            return Decimal(price)
-
-        return None
-
-    @staticmethod
-    def decimal_to_str(price):
-        if price:
-            return f"{price:f}"
-
-        return None
-
     @staticmethod
     def epoch_time(timestamp):
         epoch = (timestamp - datetime(1970, 1, 1, tzinfo=TZ_UTC)).total_seconds()
@@ -303,6 +342,29 @@ class Frankfurter(DataSourceBase):
             timestamp,
         )
 
+    def get_historical_range(self, asset, quote, start, end):
+        url = (
+            f"https://api.frankfurter.app/{start:%Y-%m-%d}..{end:%Y-%m-%d}"
+            f"?from={asset}&to={quote}"
+        )
+        json_resp = self.get_json(url)
+        pair = self.pair(asset, quote)
+        rates = json_resp.get("rates", {})
+
+        # Rates are only published for working days, any other day has the previous day's rate,
+        #  the same as if that date was requested
+        prices = {}
+        rate = None
+        for day in range((end.date() - start.date()).days + 1):
+            date = f"{start + timedelta(days=day):%Y-%m-%d}"
+            if date in rates and quote in rates[date]:
+                rate = Decimal(repr(rates[date][quote]))
+            if rate is not None:
+                prices[date] = {"price": rate, "url": url}
+
+        self.update_prices(pair, prices, end)
+        return prices
+
 
 class CoinDesk(DataSourceBase):
     def __init__(self):
@@ -352,6 +414,33 @@ class CryptoCompare(DataSourceBase):
         )
         return Decimal(repr(json_resp[quote])) if quote in json_resp else None
 
+    def get_latest_multi(self, assets, quote):
+        prices = {}
+        for fsyms in self._chunk_fsyms(assets):
+            json_resp = self.get_json(
+                f"https://min-api.cryptocompare.com/data/pricemulti"
+                f"?extraParams={self.USER_AGENT}&fsyms={','.join(fsyms)}&tsyms={quote}"
+            )
+            for asset in fsyms:
+                prices[asset] = (
+                    Decimal(repr(json_resp[asset][quote]))
+                    if asset in json_resp and quote in json_resp[asset]
+                    else None
+                )
+        return prices
+
+    @staticmethod
+    def _chunk_fsyms(assets):
+        fsyms = []
+        for asset in assets:
+            if fsyms and len(",".join(fsyms + [asset])) > CRYPTOCOMPARE_MAX_FSYMS_LEN:
+                yield fsyms
+                fsyms = []
+            fsyms.append(asset)
+
+        if fsyms:
+            yield fsyms
+
     def get_historical(self, asset, quote, timestamp, _asset_id=None):
         url = (
             f"https://min-api.cryptocompare.com/data/histoday?aggregate=1"
@@ -407,6 +496,27 @@ class CoinGecko(DataSourceBase):
             else None
         )
 
+    def get_latest_multi(self, assets, quote):
+        asset_ids = {asset: self.assets[asset]["id"] for asset in assets}
+        ids = sorted(set(asset_ids.values()))
+
+        json_resp = {}
+        for i in range(0, len(ids), COINGECKO_MAX_IDS):
+            json_resp.update(
+                self.get_json(
+                    f"https://api.coingecko.com/api/v3/simple/price"
+                    f"?ids={','.join(ids[i : i + COINGECKO_MAX_IDS])}"
+                    f"&vs_currencies={quote.lower()}"
+                )
+            )
+
+        return {
+            asset: Decimal(repr(json_resp[asset_id][quote.lower()]))
+            if asset_id in json_resp and quote.lower() in json_resp[asset_id]
+            else None
+            for asset, asset_id in asset_ids.items()
+        }
+
     def get_historical(self, asset, quote, timestamp, asset_id=None):
         if asset_id is None:
             asset_id = self.assets[asset]["id"]
@@ -467,8 +577,8 @@ class CoinPaprika(DataSourceBase):
             asset_id = self.assets[asset]["id"]
 
         url = (
-            "https://api.coinpaprika.com/v1/tickers/{asset_id}/historical"
-            "?start={timestamp:%Y-%m-%d}&limit={COINPAPRIKA_MAX_DAYS}&quote={quote}&interval=1d"
+            f"https://api.coinpaprika.com/v1/tickers/{asset_id}/historical"
+            f"?start={timestamp:%Y-%m-%d}&limit={COINPAPRIKA_MAX_DAYS}&quote={quote}&interval=1d"
         )
 
         json_resp = self.get_json(url)
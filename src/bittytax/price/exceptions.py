@@ -29,3 +29,8 @@ class UnexpectedDataSourceAssetIdError(DataSourceError):
             f"Invalid data source asset ID: '{self.data_source}' for '{self.value}' in "
             f"{os.path.join(BITTYTAX_PATH, config.BITTYTAX_CONFIG)}"
         )
+
+
+class DataSourceReplayError(DataSourceError):
+    def __str__(self):
+        return f"No recorded response for {self.data_source}: {self.value}"
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import os
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt  # pylint: disable=import-error
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(filename):
+    # Advisory lock, held on a separate file, so the locked file itself can be replaced
+    with open(filename + ".lock", "a+", encoding="utf-8") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            while True:
+                try:
+                    # Gives up after 10 seconds, so is retried until it's free, the same as flock
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
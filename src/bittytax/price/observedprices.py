@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+from decimal import Decimal
+
+from colorama import Fore
+
+from ..config import config
+
+
+class ObservedPrices:
+    NAME = "Observed"
+
+    def __init__(self):
+        self.prices = {}
+
+    def add_records(self, transaction_records):
+        for tr in transaction_records:
+            if tr.buy and tr.sell and tr.buy.acquisition and tr.sell.disposal:
+                # A trade with the local currency is also a fixed value
+                if tr.sell.asset == config.ccy and tr.buy.cost is None:
+                    self._add_price(
+                        tr.buy.asset, tr.buy.timestamp, tr.buy.quantity, tr.sell.quantity
+                    )
+                elif tr.buy.asset == config.ccy and tr.sell.proceeds is None:
+                    self._add_price(
+                        tr.sell.asset, tr.sell.timestamp, tr.sell.quantity, tr.buy.quantity
+                    )
+
+            if tr.buy and tr.buy.cost_fixed:
+                self._add_price(tr.buy.asset, tr.buy.timestamp, tr.buy.quantity, tr.buy.cost)
+
+            if tr.sell and tr.sell.proceeds_fixed:
+                self._add_price(
+                    tr.sell.asset, tr.sell.timestamp, tr.sell.quantity, tr.sell.proceeds
+                )
+
+            if tr.fee and tr.fee.proceeds_fixed:
+                self._add_price(tr.fee.asset, tr.fee.timestamp, tr.fee.quantity, tr.fee.proceeds)
+
+        if config.debug:
+            for asset in sorted(self.prices):
+                print(
+                    f"{Fore.YELLOW}price: {self.NAME} ({asset}/{config.ccy}) "
+                    f"{len(self.prices[asset])} day(s) observed"
+                )
+
+    def _add_price(self, asset, timestamp, quantity, value):
+        # Only values which are in the local currency give a usable price
+        if asset == config.ccy or not quantity or not value:
+            return
+
+        if asset not in self.prices:
+            self.prices[asset] = {}
+
+        date = f"{timestamp:%Y-%m-%d}"
+        if date not in self.prices[asset]:
+            self.prices[asset][date] = {"quantity": Decimal(0), "value": Decimal(0)}
+
+        self.prices[asset][date]["quantity"] += quantity
+        self.prices[asset][date]["value"] += value
+
+    def get_price(self, asset, timestamp):
+        date = f"{timestamp:%Y-%m-%d}"
+        if asset in self.prices and date in self.prices[asset]:
+            # Volume weighted average of all the values observed that day
+            return self.prices[asset][date]["value"] / self.prices[asset][date]["quantity"]
+        return None
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import json
+import os
+import shutil
+import threading
+import zlib
+from decimal import Decimal
+
+from colorama import Fore
+
+from ..config import config
+from ..constants import CACHE_DIR, WARNING
+from .filelock import file_lock
+
+CACHE_FILE_EXTENSION = "prices"
+LEGACY_CACHE_FILE_EXTENSION = "json"
+CACHE_FORMAT_VERSION = 1
+# Higher levels are much slower to write, for little or no reduction in size
+CACHE_COMPRESS_LEVEL = 3
+
+
+def cache_filename(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.{CACHE_FILE_EXTENSION}")
+
+
+def legacy_cache_filename(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.{LEGACY_CACHE_FILE_EXTENSION}")
+
+
+def load_cache(name):
+    try:
+        return read_local_cache(name)
+    except (IOError, ValueError):
+        print(f"{WARNING} Data cached for {name} could not be loaded")
+        return {}
+
+
+def read_local_cache(name):
+    filename = cache_filename(CACHE_DIR, name)
+    if not os.path.exists(filename) and not os.path.exists(legacy_cache_filename(CACHE_DIR, name)):
+        return {}
+
+    # Read under the lock, as on Windows a file which is open can't be replaced by another process
+    with file_lock(filename):
+        return read_cache(CACHE_DIR, name)
+
+
+def read_cache(cache_dir, name):
+    # A cache written by an older version is still read, until it's replaced by the next update
+    layers = [
+        read_prices(filename)
+        for filename in (cache_filename(cache_dir, name), legacy_cache_filename(cache_dir, name))
+        if os.path.exists(filename)
+    ]
+    return stack_prices(layers) if len(layers) > 1 else (layers or [{}])[0]
+
+
+def read_prices(filename):
+    compact, json_prices = read_json(filename)
+    if not compact:
+        return decode_prices(json_prices)
+
+    try:
+        return PackedPrices(json_prices["prices"], json_prices["urls"])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Price cache {filename} is not valid") from e
+
+
+def write_prices(filename, prices, mode_filename=None):
+    urls = {}
+    write_json(
+        filename,
+        {"version": CACHE_FORMAT_VERSION, "prices": pack_prices(prices, urls), "urls": list(urls)},
+        mode_filename=mode_filename,
+    )
+
+
+def read_json(filename):
+    with open(filename, "rb") as json_file:
+        data = json_file.read()
+
+    if data.startswith(b"{"):
+        # Not compressed, as written by older versions
+        return False, json.loads(data)
+
+    try:
+        json_obj = json.loads(zlib.decompress(data))
+    except zlib.error as e:
+        raise ValueError(f"Price cache {filename} is not valid") from e
+
+    if json_obj.get("version") != CACHE_FORMAT_VERSION:
+        raise ValueError(f"Price cache {filename} version is not supported")
+    return True, json_obj
+
+
+def write_json(filename, json_obj, mode_filename=None, mode=None):
+    # Written to a temporary file, which is renamed into place, so it's never left incomplete
+    tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_filename, "wb") as json_file:
+            json_file.write(
+                zlib.compress(
+                    json.dumps(json_obj, separators=(",", ":")).encode("utf-8"),
+                    CACHE_COMPRESS_LEVEL,
+                )
+            )
+
+        if mode_filename and os.path.exists(mode_filename):
+            shutil.copymode(mode_filename, tmp_filename)
+        elif mode is not None:
+            os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+
+def update_prices(cache_dir, name, new_prices):
+    filename = cache_filename(cache_dir, name)
+    legacy_filename = legacy_cache_filename(cache_dir, name)
+
+    # Another process may have written the cache since it was loaded, so the new prices are
+    #  merged into what is there now
+    with file_lock(filename):
+        try:
+            prices = read_cache(cache_dir, name)
+        except (IOError, ValueError):
+            prices = {}
+
+        merge_prices(prices, new_prices)
+        write_prices(filename, prices, filename if os.path.exists(filename) else legacy_filename)
+
+        # Its prices are now all in the new cache
+        if os.path.exists(legacy_filename):
+            os.remove(legacy_filename)
+    return prices
+
+
+def merge_prices(prices, new_prices):
+    for pair, pair_prices in new_prices.items():
+        for date, price in pair_prices.items():
+            if is_better_price(price, prices.get(pair, {}).get(date)):
+                prices.setdefault(pair, {})[date] = price
+
+
+def is_better_price(price, old_price):
+    # A price is always better than none, and a later lookup which found none is better than an
+    #  earlier one, so it's not looked up again until that one expires
+    if old_price is None or price["price"] is not None:
+        return True
+    return old_price["price"] is None and price.get("fetched", 0) > old_price.get("fetched", 0)
+
+
+def stack_prices(layers):
+    # The first layer takes priority, unless it has no price for that date
+    return StackedPrices(layers)
+
+
+def pack_prices(prices, urls):
+    # Each pair is stored as a block of columns, and each URL only once, as many dates share one
+    blocks = {}
+    remap = None
+    if isinstance(prices, PackedPrices):
+        # Pairs which are still packed are kept as they are, only their URL indexes can change
+        remap = [intern_url(urls, url) for url in prices.urls]
+        if remap == list(range(len(remap))):
+            remap = None
+
+    for pair in prices:
+        if isinstance(prices, PackedPrices):
+            blocks[pair] = prices.get_block(pair, remap)
+            if blocks[pair] is not None:
+                continue
+
+        pair_prices = prices[pair]
+        dates = sorted(pair_prices)
+        blocks[pair] = {
+            "dates": dates,
+            "prices": [decimal_to_str(pair_prices[date]["price"]) for date in dates],
+            "urls": [intern_url(urls, pair_prices[date]["url"]) for date in dates],
+        }
+
+        fetched = {
+            date: pair_prices[date]["fetched"] for date in dates if "fetched" in pair_prices[date]
+        }
+        if fetched:
+            blocks[pair]["fetched"] = fetched
+    return blocks
+
+
+def unpack_prices(block, urls):
+    prices = dict(
+        zip(
+            block["dates"],
+            [
+                {"price": str_to_decimal(price), "url": urls[url] if url is not None else None}
+                for price, url in zip(block["prices"], block["urls"])
+            ],
+        )
+    )
+
+    for date, fetched in block.get("fetched", {}).items():
+        prices[date]["fetched"] = fetched
+    return prices
+
+
+def intern_url(urls, url):
+    if url is None:
+        return None
+    return urls.setdefault(url, len(urls))
+
+
+def decode_prices(json_prices):
+    return {
+        pair: {date: decode_price(price) for date, price in json_prices[pair].items()}
+        for pair in json_prices
+    }
+
+
+def decode_price(json_price):
+    price = {"price": str_to_decimal(json_price["price"]), "url": json_price["url"]}
+    if "fetched" in json_price:
+        price["fetched"] = json_price["fetched"]
+    return price
+
+
+def str_to_decimal(price):
+    if price:
+        return Decimal(price)
+
+    return None
+
+
+def decimal_to_str(price):
+    if price:
+        return f"{price:f}"
+
+    return None
+
+
+def read_snapshot(filename):
+    compact, json_snapshot = read_json(filename)
+    if not compact:
+        return {name: decode_prices(prices) for name, prices in json_snapshot.items()}
+
+    try:
+        return {
+            name: PackedPrices(blocks, json_snapshot["urls"])
+            for name, blocks in json_snapshot["data_sources"].items()
+        }
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Price cache {filename} is not valid") from e
+
+
+def write_snapshot(filename, snapshot):
+    urls = {}
+    data_sources = {name: pack_prices(prices, urls) for name, prices in snapshot.items()}
+    # Shared snapshots are read by other users, whatever the umask
+    write_json(
+        filename,
+        {"version": CACHE_FORMAT_VERSION, "data_sources": data_sources, "urls": list(urls)},
+        mode=0o644,
+    )
+
+
+def export_cache(filename, names, layers):
+    snapshot = {}
+    for name in names:
+        prices = stack_prices(
+            [read_local_cache(name)] + [layer.get_prices(name) for layer in layers]
+        )
+        if prices:
+            snapshot[name] = prices
+
+    write_snapshot(filename, snapshot)
+    return snapshot
+
+
+def import_cache(filename, names):
+    snapshot = read_snapshot(filename)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    for name in names:
+        if name in snapshot:
+            update_prices(CACHE_DIR, name, snapshot[name])
+    return snapshot
+
+
+class PriceCacheLayer:  # pylint: disable=too-few-public-methods
+    # A read-only cache, either a directory of cache files, or a snapshot file of all of them
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def get_prices(self, name):
+        if config.debug:
+            print(f"{Fore.YELLOW}price: {name} shared data cache: {self.path}")
+
+        # A shared cache which is unavailable is not an error, the prices are just looked up
+        if os.path.isdir(self.path):
+            try:
+                return read_cache(self.path, name)
+            except (IOError, ValueError):
+                print(f"{WARNING} Shared price cache {self.path} could not be loaded for {name}")
+                return {}
+
+        with self._lock:
+            if self.snapshot is None:
+                try:
+                    self.snapshot = read_snapshot(self.path)
+                except (IOError, ValueError):
+                    print(f"{WARNING} Shared price cache {self.path} could not be loaded")
+                    self.snapshot = {}
+        return self.snapshot.get(name, {})
+
+
+class LazyPrices(dict):
+    # Most pairs in a cache are never looked up, so each one is only loaded when it's first used
+
+    def __init__(self, pairs):
+        super().__init__(dict.fromkeys(pairs))
+        self._lock = threading.Lock()
+
+    def is_loaded(self, pair):
+        raise NotImplementedError
+
+    def load(self, pair):
+        raise NotImplementedError
+
+    def unload(self, pair):
+        raise NotImplementedError
+
+    def __getitem__(self, pair):
+        with self._lock:
+            if pair in self and not self.is_loaded(pair):
+                super().__setitem__(pair, self.load(pair))
+        return super().__getitem__(pair)
+
+    def __setitem__(self, pair, pair_prices):
+        with self._lock:
+            self.unload(pair)
+            super().__setitem__(pair, pair_prices)
+
+    def get(self, pair, default=None):
+        return self[pair] if pair in self else default
+
+    def setdefault(self, pair, default=None):
+        if pair not in self:
+            self[pair] = default
+        return self[pair]
+
+    def items(self):
+        return [(pair, self[pair]) for pair in self]
+
+    def values(self):
+        return [self[pair] for pair in self]
+
+
+class PackedPrices(LazyPrices):
+    def __init__(self, blocks, urls):
+        super().__init__(blocks)
+        self.blocks = dict(blocks)
+        self.urls = urls
+
+    def is_loaded(self, pair):
+        return pair not in self.blocks
+
+    def load(self, pair):
+        return unpack_prices(self.blocks.pop(pair), self.urls)
+
+    def unload(self, pair):
+        self.blocks.pop(pair, None)
+
+    def get_block(self, pair, remap=None):
+        with self._lock:
+            block = self.blocks.get(pair)
+        if block is None or remap is None:
+            return block
+
+        block = dict(block)
+        block["urls"] = [remap[url] if url is not None else None for url in block["urls"]]
+        return block
+
+
+class StackedPrices(LazyPrices):
+    def __init__(self, layers):
+        super().__init__(set().union(*layers))
+        self.layers = layers
+        self.unstacked = set(self)
+
+    def is_loaded(self, pair):
+        return pair not in self.unstacked
+
+    def load(self, pair):
+        self.unstacked.discard(pair)
+        pair_prices = {}
+        for layer_prices in reversed(self.layers):
+            for date, price in layer_prices.get(pair, {}).items():
+                if is_better_price(price, pair_prices.get(date)):
+                    pair_prices[date] = price
+        return pair_prices
+
+    def unload(self, pair):
+        self.unstacked.discard(pair)
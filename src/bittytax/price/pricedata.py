@@ -1,27 +1,28 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2019
 
-import os
-
 from colorama import Fore
 
 from ..config import config
-from ..constants import CACHE_DIR
 from .datasource import DataSourceBase
 from .exceptions import UnexpectedDataSourceError
+from .pricestore import get_price_store
 
 
 class PriceData:
-    def __init__(self, data_sources_required, price_tool=False):
+    def __init__(self, data_sources_required, price_tool=False, cache_only=False):
         self.price_tool = price_tool
         self.data_sources = {}
+        self.latest = {}
 
-        if not os.path.exists(CACHE_DIR):
-            os.mkdir(CACHE_DIR)
-
+        price_store = get_price_store()
         for data_source_class in DataSourceBase.__subclasses__():
             if data_source_class.__name__.upper() in [ds.upper() for ds in data_sources_required]:
-                self.data_sources[data_source_class.__name__.upper()] = data_source_class()
+                if cache_only:
+                    data_source = price_store.get_cached_data_source(data_source_class)
+                else:
+                    data_source = price_store.get_data_source(data_source_class)
+                self.data_sources[data_source_class.__name__.upper()] = data_source
 
     @staticmethod
     def data_source_priority(asset):
@@ -31,17 +32,92 @@ class PriceData:
             return config.data_source_fiat
         return config.data_source_crypto
 
+    def get_asset_name(self, asset):
+        for data_source in self.data_source_priority(asset):
+            if (
+                data_source.upper() in self.data_sources
+                and asset in self.data_sources[data_source.upper()].assets
+            ):
+                return self.data_sources[data_source.upper()].assets[asset]["name"]
+        return None
+
     def get_latest_ds(self, data_source, asset, quote):
         if data_source.upper() in self.data_sources:
             if asset in self.data_sources[data_source.upper()].assets:
+                # Latest prices are only requested once per run
+                pair = asset + "/" + quote
+                if (data_source.upper(), pair) not in self.latest:
+                    self.latest[(data_source.upper(), pair)] = self.data_sources[
+                        data_source.upper()
+                    ].get_latest(asset, quote)
+
                 return (
-                    self.data_sources[data_source.upper()].get_latest(asset, quote),
+                    self.latest[(data_source.upper(), pair)],
                     self.data_sources[data_source.upper()].assets[asset]["name"],
                 )
 
             return None, None
         raise UnexpectedDataSourceError(data_source, DataSourceBase)
 
+    def prefetch_latest(self, assets, quote):
+        assets_ds = {}
+        for asset in assets:
+            for data_source in self.data_source_priority(asset):
+                if data_source.upper() not in self.data_sources:
+                    raise UnexpectedDataSourceError(data_source, DataSourceBase)
+
+                # Only the first data source with the asset is prefetched
+                if asset in self.data_sources[data_source.upper()].assets:
+                    if (data_source.upper(), asset + "/" + quote) not in self.latest:
+                        assets_ds.setdefault(data_source.upper(), []).append(asset)
+                    break
+
+        for data_source, ds_assets in assets_ds.items():
+            prices = self.data_sources[data_source].get_latest_multi(ds_assets, quote)
+            if prices is None:
+                continue
+
+            if config.debug:
+                print(
+                    f"{Fore.YELLOW}price: <latest>, {len(ds_assets)} asset(s) prefetched via "
+                    f"{self.data_sources[data_source].name()}"
+                )
+
+            for asset, price in prices.items():
+                self.latest[(data_source, asset + "/" + quote)] = price
+
+    def prefetch_historical(self, asset, quote, start, end):
+        for data_source in self.data_source_priority(asset):
+            if data_source.upper() not in self.data_sources:
+                raise UnexpectedDataSourceError(data_source, DataSourceBase)
+
+            # Only the first data source with the asset is prefetched
+            if asset in self.data_sources[data_source.upper()].assets:
+                prices = self.data_sources[data_source.upper()].get_historical_range(
+                    asset, quote, start, end
+                )
+                if prices is not None and config.debug:
+                    print(
+                        f"{Fore.YELLOW}price: {start:%Y-%m-%d} to {end:%Y-%m-%d}, "
+                        f"{len(prices)} {asset}/{quote} price(s) prefetched via "
+                        f"{self.data_sources[data_source.upper()].name()}"
+                    )
+                return
+
+    def get_historical_cached(self, asset, quote, timestamp):
+        date = f"{timestamp:%Y-%m-%d}"
+        pair = asset + "/" + quote
+        for data_source in self.data_source_priority(asset):
+            if (
+                data_source.upper() in self.data_sources
+                and pair in self.data_sources[data_source.upper()].prices
+                and date in self.data_sources[data_source.upper()].prices[pair]
+            ):
+                price = self.data_sources[data_source.upper()].prices[pair][date]["price"]
+                if price is not None:
+                    return price
+        return None
+
     def get_historical_ds(self, data_source, asset, quote, timestamp, no_cache=False):
         if data_source.upper() in self.data_sources:
             if asset in self.data_sources[data_source.upper()].assets:
@@ -50,10 +126,7 @@ class PriceData:
 
                 if not no_cache:
                     # Check cache first
-                    if (
-                        pair in self.data_sources[data_source.upper()].prices
-                        and date in self.data_sources[data_source.upper()].prices[pair]
-                    ):
+                    if self.data_sources[data_source.upper()].is_cached(pair, date):
                         return (
                             self.data_sources[data_source.upper()].prices[pair][date]["price"],
                             self.data_sources[data_source.upper()].assets[asset]["name"],
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import atexit
+import os
+import threading
+
+from ..config import config
+from ..constants import CACHE_DIR
+from ..context import DEFAULT_CONTEXT, get_context
+from .datasource import DataSourceBase
+from .pricecache import PriceCacheLayer, load_cache, stack_prices
+
+_lock = threading.Lock()
+
+
+class PriceStore:
+    def __init__(self, save_at_exit=False):
+        self.data_sources = {}
+        self.cached_data_sources = {}
+        self.cache_layers = None
+        self._lock = threading.RLock()
+
+        if save_at_exit:
+            atexit.register(self.save)
+
+    def get_data_source(self, data_source_class):
+        # Each data source is only created once, so its price cache is shared by every user
+        with self._lock:
+            if data_source_class.__name__.upper() not in self.data_sources:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+
+                data_source = data_source_class()
+                data_source.add_cache_layers(
+                    [layer.get_prices(data_source.name()) for layer in self.get_cache_layers()]
+                )
+                self.data_sources[data_source_class.__name__.upper()] = data_source
+            return self.data_sources[data_source_class.__name__.upper()]
+
+    def get_cached_data_source(self, data_source_class):
+        # Only the price cache is loaded, the data source is not created, as it makes requests
+        with self._lock:
+            if data_source_class.__name__.upper() in self.data_sources:
+                return self.data_sources[data_source_class.__name__.upper()]
+
+            if data_source_class.__name__.upper() not in self.cached_data_sources:
+                data_source = CachedDataSource(data_source_class.__name__)
+                data_source.add_cache_layers(
+                    [layer.get_prices(data_source.name()) for layer in self.get_cache_layers()]
+                )
+                self.cached_data_sources[data_source_class.__name__.upper()] = data_source
+            return self.cached_data_sources[data_source_class.__name__.upper()]
+
+    def get_cache_layers(self):
+        if self.cache_layers is None:
+            self.cache_layers = [PriceCacheLayer(path) for path in config.price_cache_layers]
+        return self.cache_layers
+
+    def take_new_prices(self):
+        # Prices added since the last call, i.e. by a worker process, for the process which saves
+        with self._lock:
+            new_prices = {}
+            for ds_name, data_source in self.data_sources.items():
+                if data_source.new_prices:
+                    new_prices[ds_name] = data_source.new_prices
+                    data_source.new_prices = {}
+            return new_prices
+
+    def add_prices(self, new_prices):
+        with self._lock:
+            for data_source_class in DataSourceBase.__subclasses__():
+                if data_source_class.__name__.upper() in new_prices:
+                    data_source = self.get_data_source(data_source_class)
+                    for pair, prices in new_prices[data_source_class.__name__.upper()].items():
+                        data_source.add_prices(pair, prices)
+
+    def save(self):
+        with self._lock:
+            for data_source in self.data_sources.values():
+                data_source.dump_prices()
+
+
+class CachedDataSource:
+    # The price cache of a data source, which is read only, for when requests can't be made
+
+    def __init__(self, name):
+        self._name = name
+        self.assets = {}
+        self.prices = load_cache(name)
+
+    def name(self):
+        return self._name
+
+    def add_cache_layers(self, layers):
+        if layers:
+            self.prices = stack_prices([self.prices] + layers)
+
+
+def get_price_store(context=None):
+    if context is None:
+        context = get_context()
+
+    if context.price_store is None:
+        with _lock:
+            if context.price_store is None:
+                # Only the process wide context saves its prices at exit, any other context has
+                #  to save them itself
+                context.price_store = PriceStore(save_at_exit=context is DEFAULT_CONTEXT)
+    return context.price_store
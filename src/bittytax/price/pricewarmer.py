@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from colorama import Fore
+from tqdm import tqdm
+
+from ..config import config
+from ..context import get_context
+from ..import_records import ImportRecords
+from .exceptions import DataSourceError
+from .valueasset import ValueAsset
+
+RECORDS_FILE_EXTENSIONS = (".xlsx", ".xls", ".csv")
+
+
+class PriceWarmer:
+    MAX_WORKERS = 8
+
+    def __init__(self):
+        self.price_data = ValueAsset().price_data
+        self.required = {}
+        self.cached = {}
+        self.coverage = {}
+        self.errors = {}
+
+    @staticmethod
+    def get_filenames(paths):
+        filenames = []
+        for path in paths:
+            if os.path.isdir(path):
+                filenames.extend(
+                    sorted(
+                        os.path.join(path, filename)
+                        for filename in os.listdir(path)
+                        if os.path.splitext(filename)[1].lower() in RECORDS_FILE_EXTENSIONS
+                    )
+                )
+            else:
+                filenames.append(path)
+        return filenames
+
+    def import_records(self, filenames):
+        import_records = ImportRecords()
+        for filename in filenames:
+            import_records.import_file(filename)
+
+        # Records which fail to import are left out, the prices for the others are still needed
+        print(
+            f"{Fore.WHITE}import {'successful' if import_records.failure_cnt <= 0 else 'failure'} "
+            f"(success={import_records.success_cnt}, failure={import_records.failure_cnt})"
+        )
+        return import_records.get_records()
+
+    def add_records(self, transaction_records):
+        for t_record in transaction_records:
+            if t_record.buy and t_record.buy.cost is None:
+                self._add_required(t_record.buy)
+            if t_record.sell and t_record.sell.proceeds is None:
+                self._add_required(t_record.sell)
+            if t_record.fee and t_record.fee.proceeds is None:
+                self._add_required(t_record.fee)
+
+    def _add_required(self, transaction):
+        if not transaction.quantity or transaction.asset == config.ccy:
+            return
+
+        # The latest price is used instead, which is not cached
+        if transaction.timestamp.date() >= datetime.now().date():
+            return
+
+        # The same pairs as used by ValueAsset, cryptoassets are priced in BTC
+        if transaction.asset == "BTC" or transaction.asset in config.fiat_list:
+            pairs = [(transaction.asset, config.ccy)]
+        else:
+            pairs = [(transaction.asset, "BTC"), ("BTC", config.ccy)]
+
+        for pair in pairs:
+            self.required.setdefault(pair, {}).setdefault(
+                f"{transaction.timestamp:%Y-%m-%d}", transaction.timestamp
+            )
+
+    def warm(self):
+        # Each pair is only looked up by one thread, the pairs are independent of each other
+        warm_pair = get_context().bind(self.warm_pair)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(warm_pair, asset, quote, timestamps): (asset, quote)
+                for (asset, quote), timestamps in self.required.items()
+            }
+
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                unit=" pair",
+                desc=f"{Fore.CYAN}warming price cache{Fore.GREEN}",
+                disable=bool(config.debug or not sys.stdout.isatty()),
+            ):
+                try:
+                    self.cached[futures[future]], self.coverage[futures[future]] = future.result()
+                except (DataSourceError, IOError) as e:
+                    self.errors[futures[future]] = e
+
+    def warm_pair(self, asset, quote, timestamps):
+        dates = sorted(timestamps)
+        missing = [
+            date
+            for date in dates
+            if self.price_data.get_historical_cached(asset, quote, timestamps[date]) is None
+        ]
+
+        if missing:
+            # Data sources with a time series get all the missing dates with one request
+            self.price_data.prefetch_historical(
+                asset, quote, timestamps[missing[0]], timestamps[missing[-1]]
+            )
+
+        # Oldest first, a request for one date also caches the dates which follow it
+        coverage = {}
+        for date in dates:
+            _, _, data_source, _ = self.price_data.get_historical(asset, quote, timestamps[date])
+            coverage[date] = data_source
+        return len(dates) - len(missing), coverage
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from ..constants import BITTYTAX_PATH
+
+ENV_REPLAY = "BITTYTAX_REPLAY"
+ENV_REPLAY_DIR = "BITTYTAX_REPLAY_DIR"
+ENV_DATA_SOURCE_URL = "BITTYTAX_DATA_SOURCE_URL"
+
+REPLAY_DIR = os.path.join(BITTYTAX_PATH, "replay")
+
+
+class ResponseReplay:
+    MODE_RECORD = "record"
+    MODE_REPLAY = "replay"
+
+    # Query parameters which vary between installations, so are not part of the key
+    IGNORE_PARAMS = ("extraParams",)
+
+    def __init__(self, mode, path):
+        self.mode = mode
+        self.path = path
+
+        if self.mode == self.MODE_RECORD:
+            os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        mode = os.environ.get(ENV_REPLAY, "").lower()
+        if mode not in (cls.MODE_RECORD, cls.MODE_REPLAY):
+            return None
+
+        return cls(mode, os.environ.get(ENV_REPLAY_DIR, REPLAY_DIR))
+
+    @classmethod
+    def normalise_url(cls, url):
+        parts = urlsplit(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k not in cls.IGNORE_PARAMS]
+        return urlunsplit(
+            (parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), parts.fragment)
+        )
+
+    @classmethod
+    def key(cls, url):
+        return hashlib.sha1(cls.normalise_url(url).encode("utf-8")).hexdigest()
+
+    def filename(self, url):
+        return os.path.join(self.path, self.key(url) + ".json")
+
+    def load(self, url):
+        filename = self.filename(url)
+        if not os.path.exists(filename):
+            return None
+
+        with open(filename, "r", encoding="utf-8") as replay_file:
+            return json.load(replay_file)["json"]
+
+    def save(self, url, json_resp):
+        # Write to a temporary file first, concurrent lookups may record the same URL
+        filename = self.filename(url)
+        tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as replay_file:
+            json.dump(
+                {"url": self.normalise_url(url), "json": json_resp},
+                replay_file,
+                indent=4,
+                sort_keys=True,
+            )
+        os.replace(tmp_filename, filename)
+
+
+def redirect_url(url, base_url):
+    # Route https://<host>/<path> to <base_url>/<host>/<path>, e.g. a local mock server
+    parts = urlsplit(url)
+    return f"{base_url.rstrip('/')}/{parts.netloc}{parts.path}" + (
+        f"?{parts.query}" if parts.query else ""
+    )
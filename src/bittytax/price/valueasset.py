@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # (c) Nano Nano Ltd 2019
 
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from decimal import Decimal
 
@@ -9,10 +11,14 @@ from tqdm import tqdm
 
 from ..config import config
 from ..constants import WARNING
+from ..context import get_context
+from .observedprices import ObservedPrices
 from .pricedata import PriceData
 
 
 class ValueAsset:
+    LATEST_MAX_WORKERS = 8
+
     def __init__(self, price_tool=False):
         self.price_tool = price_tool
         self.price_report = {}
@@ -20,6 +26,11 @@ class ValueAsset:
             x.split(":")[0] for v in config.data_source_select.values() for x in v
         }
         self.price_data = PriceData(data_sources_required, price_tool)
+        self.observed_prices = ObservedPrices()
+
+    def add_observed_prices(self, transaction_records):
+        if config.observed_prices != config.OBSERVED_PRICES_NONE:
+            self.observed_prices.add_records(transaction_records)
 
     def get_value(self, asset, timestamp, quantity):
         if asset == config.ccy:
@@ -53,6 +64,36 @@ class ValueAsset:
 
         return None, None, None
 
+    def get_current_values(self, assets):
+        assets_ccy = [a for a in assets if a == "BTC" or a in config.fiat_list]
+        assets_btc = [a for a in assets if a not in assets_ccy]
+
+        if assets_btc:
+            # BTC price is shared by all the other cryptoassets, only request it once
+            self.price_data.get_latest("BTC", config.ccy)
+
+        self.price_data.prefetch_latest(assets_ccy, config.ccy)
+        self.price_data.prefetch_latest(assets_btc, "BTC")
+
+        current_values = {}
+        get_current_value = get_context().bind(self.get_current_value)
+        with ThreadPoolExecutor(max_workers=self.LATEST_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(get_current_value, asset, quantity): asset
+                for asset, quantity in assets.items()
+            }
+
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                unit="h",
+                desc=f"{Fore.CYAN}calculating holdings{Fore.GREEN}",
+                disable=bool(config.debug or not sys.stdout.isatty()),
+            ):
+                current_values[futures[future]] = future.result()
+
+        return current_values
+
     def get_historical_price(self, asset, timestamp, no_cache=False):
         asset_price_ccy = None
 
@@ -63,6 +104,11 @@ class ValueAsset:
             )
             return self.get_latest_price(asset)
 
+        if config.observed_prices == config.OBSERVED_PRICES_PRIORITY:
+            asset_price_ccy = self.observed_prices.get_price(asset, timestamp)
+            if asset_price_ccy is not None:
+                return self.get_observed_price(asset, timestamp, asset_price_ccy)
+
         if asset == "BTC" or asset in config.fiat_list:
             asset_price_ccy, name, data_source, url = self.price_data.get_historical(
                 asset, config.ccy, timestamp, no_cache
@@ -94,8 +140,37 @@ class ValueAsset:
                 asset_price_btc,
             )
 
+        if asset_price_ccy is None and config.observed_prices == config.OBSERVED_PRICES_FALLBACK:
+            asset_price_ccy = self.observed_prices.get_price(asset, timestamp)
+            if asset_price_ccy is not None:
+                return self.get_observed_price(asset, timestamp, asset_price_ccy)
+
         return asset_price_ccy, name, data_source
 
+    def get_observed_price(self, asset, timestamp, asset_price_ccy):
+        name = self.price_data.get_asset_name(asset) or asset
+
+        if config.debug:
+            print(
+                f"{Fore.YELLOW}price: {timestamp:%Y-%m-%d}, 1 "
+                f"{asset}={asset_price_ccy.normalize():0,f} {config.ccy} via "
+                f"{ObservedPrices.NAME} ({name})"
+            )
+
+        # Replace any missing price already reported by the data sources
+        date = f"{timestamp:%Y-%m-%d}"
+        tax_year = self.which_tax_year(timestamp)
+        if (
+            tax_year in self.price_report
+            and asset in self.price_report[tax_year]
+            and date in self.price_report[tax_year][asset]
+            and self.price_report[tax_year][asset][date]["price_ccy"] is None
+        ):
+            del self.price_report[tax_year][asset][date]
+
+        self.price_report_cache(asset, timestamp, name, ObservedPrices.NAME, "", asset_price_ccy)
+        return asset_price_ccy, name, ObservedPrices.NAME
+
     def get_latest_price(self, asset):
         asset_price_ccy = None
 
@@ -114,10 +189,7 @@ class ValueAsset:
     def price_report_cache(
         self, asset, timestamp, name, data_source, url, price_ccy, price_btc=None
     ):
-        if timestamp > config.get_tax_year_end(timestamp.year):
-            tax_year = timestamp.year + 1
-        else:
-            tax_year = timestamp.year
+        tax_year = self.which_tax_year(timestamp)
 
         if tax_year not in self.price_report:
             self.price_report[tax_year] = {}
@@ -134,3 +206,9 @@ class ValueAsset:
                 "price_ccy": price_ccy,
                 "price_btc": price_btc,
             }
+
+    @staticmethod
+    def which_tax_year(timestamp):
+        if timestamp > config.get_tax_year_end(timestamp.year):
+            return timestamp.year + 1
+        return timestamp.year
@@ -2,6 +2,7 @@
 # (c) Nano Nano Ltd 2019
 
 from .config import config
+from .context import get_context
 
 
 # pylint: disable=too-few-public-methods, too-many-instance-attributes
@@ -40,8 +41,6 @@ class TransactionRecord:
         TYPE_TRADE,
     )
 
-    cnt = 0
-
     def __init__(self, t_type, buy, sell, fee, wallet, timestamp, note):
         self.tid = None
         self.t_type = t_type
@@ -70,8 +69,7 @@ class TransactionRecord:
 
     def set_tid(self):
         if self.tid is None:
-            TransactionRecord.cnt += 1
-            self.tid = [TransactionRecord.cnt, 0]
+            self.tid = [get_context().tids.allocate(), 0]
         else:
             self.tid[1] += 1
 
@@ -23,21 +23,12 @@ class ReportPdf:
     FILE_EXTENSION = "pdf"
     TEMPLATE_FILE = "tax_report.html"
 
+    env = None
+
     def __init__(self, progname, audit, tax_report, price_report, holdings_report, args):
-        self.env = jinja2.Environment(loader=jinja2.PackageLoader("bittytax", "templates"))
         self.filename = self.get_output_filename(args.output_filename, self.FILE_EXTENSION)
 
-        self.env.filters["datefilter"] = self.datefilter
-        self.env.filters["datefilter2"] = self.datefilter2
-        self.env.filters["quantityfilter"] = self.quantityfilter
-        self.env.filters["valuefilter"] = self.valuefilter
-        self.env.filters["ratefilter"] = self.ratefilter
-        self.env.filters["ratesfilter"] = self.ratesfilter
-        self.env.filters["nowrapfilter"] = self.nowrapfilter
-        self.env.filters["lenfilter"] = self.lenfilter
-        self.env.globals["TAX_RULES_UK_COMPANY"] = TAX_RULES_UK_COMPANY
-
-        template = self.env.get_template(self.TEMPLATE_FILE)
+        template = self.get_env().get_template(self.TEMPLATE_FILE)
         html = template.render(
             {
                 "date": datetime.now(),
@@ -60,6 +51,24 @@ class ReportPdf:
         else:
             print(f"{ERROR} Failed to create PDF tax report")
 
+    @classmethod
+    def get_env(cls):
+        # Only created once, so the compiled template is reused by every report
+        if cls.env is None:
+            env = jinja2.Environment(loader=jinja2.PackageLoader("bittytax", "templates"))
+
+            env.filters["datefilter"] = cls.datefilter
+            env.filters["datefilter2"] = cls.datefilter2
+            env.filters["quantityfilter"] = cls.quantityfilter
+            env.filters["valuefilter"] = cls.valuefilter
+            env.filters["ratefilter"] = cls.ratefilter
+            env.filters["ratesfilter"] = cls.ratesfilter
+            env.filters["nowrapfilter"] = cls.nowrapfilter
+            env.filters["lenfilter"] = cls.lenfilter
+            env.globals["TAX_RULES_UK_COMPANY"] = TAX_RULES_UK_COMPANY
+            cls.env = env
+        return cls.env
+
     @staticmethod
     def datefilter(date):
         if isinstance(date, datetime):
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import argparse
+import csv
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from colorama import Fore
+
+from . import api
+from .bittytax import validate_year
+from .config import Config
+from .constants import TAX_RULES_UK_COMPANY, TAX_RULES_UK_INDIVIDUAL
+from .context import Context
+from .exceptions import ApiError, ImportFailureError, ImportFileError
+from .import_records import TransactionRow
+from .price.exceptions import DataSourceError
+from .price.pricestore import get_price_store
+from .price.valueasset import ValueAsset
+from .report import ReportPdf
+from .version import __version__
+
+FORMAT_JSON = "json"
+FORMAT_PDF = "pdf"
+
+
+def main(prog, argv):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="run a calculation service, which keeps the config, price data and report "
+        "template loaded between requests",
+    )
+    parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="address to listen on, default: 127.0.0.1"
+    )
+    parser.add_argument("--port", type=int, default=8800, help="port to listen on, default: 8800")
+    parser.add_argument(
+        "--socket", type=str, help="listen on a Unix socket at this path, instead of a port"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of calculations to run concurrently, default: number of CPUs",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("argument -w/--workers: must be at least 1")
+    if args.socket and not hasattr(socket, "AF_UNIX"):
+        parser.error("argument --socket: Unix sockets are not supported on this platform")
+
+    service = CalculationService(args.workers, args.debug)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixCalculationServer(args.socket, service)
+        address = args.socket
+    else:
+        server = CalculationServer((args.host, args.port), service)
+        address = f"http://{args.host}:{server.server_port}"
+
+    # Stopped the same way by a service manager as from the terminal
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    sys.stderr.write(f"{Fore.WHITE}{prog}: listening on {Fore.YELLOW}{address}{Fore.RESET}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def _interrupt(*_):
+    raise KeyboardInterrupt
+
+
+class CalculationServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is not available in Python 3.6
+    daemon_threads = True
+
+    def __init__(self, server_address, service):
+        super().__init__(server_address, CalculationRequestHandler)
+        self.service = service
+
+
+if hasattr(socket, "AF_UNIX"):
+    # Unix sockets are not available on Windows
+    class UnixCalculationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, server_address, service):
+            super().__init__(server_address, CalculationRequestHandler)
+            self.service = service
+
+else:
+    UnixCalculationServer = None
+
+
+class CalculationService:
+    def __init__(self, workers, debug):
+        self.context = Context(config=Config())
+        self.context.config.debug = debug
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        # Everything which is slow to load is done up front, instead of by the first request
+        with self.context:
+            ValueAsset()
+        ReportPdf.get_env().get_template(ReportPdf.TEMPLATE_FILE)
+
+    def calculate(self, filename, options):
+        with self._lock:
+            self.requests += 1
+        return self.executor.submit(api.calculate, filename, options, self.context).result()
+
+    def status(self):
+        return {
+            "version": __version__,
+            "workers": self.workers,
+            "requests": self.requests,
+            "uptime": int(time.time() - self.started),
+        }
+
+    def close(self):
+        self.executor.shutdown()
+        get_price_store(self.context).save()
+
+
+class CalculationRequestHandler(BaseHTTPRequestHandler):
+    server_version = f"BittyTax/{__version__}"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if urlsplit(self.path).path == "/status":
+            self._send_json(HTTPStatus.OK, self.server.service.status())
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        url = urlsplit(self.path)
+        if url.path != "/calculate":
+            self._send_error(HTTPStatus.NOT_FOUND, "not found")
+            return
+
+        try:
+            options, report_format = self._get_options(parse_qs(url.query))
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with tempfile.TemporaryDirectory(prefix="bittytax-") as tmp_dir:
+            try:
+                filename = self._write_records(tmp_dir, body)
+            except ValueError as e:
+                self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+                return
+
+            if report_format == FORMAT_PDF:
+                options.report = os.path.join(tmp_dir, f"report.{ReportPdf.FILE_EXTENSION}")
+
+            try:
+                result = self.server.service.calculate(filename, options)
+            except ImportFileError as e:
+                self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            except ImportFailureError as e:
+                self._send_error(
+                    HTTPStatus.UNPROCESSABLE_ENTITY,
+                    str(e),
+                    failures=[
+                        {
+                            "worksheet": t_row.worksheet_name,
+                            "row": t_row.row_num,
+                            "error": str(t_row.failure),
+                        }
+                        for t_row in e.failures
+                    ],
+                )
+            except (ApiError, DataSourceError) as e:
+                self._send_error(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+            except Exception as e:  # pylint: disable=broad-except
+                # The client always gets a response, even for an unexpected error
+                traceback.print_exc()
+                self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f'Unexpected error: "{e}"')
+            else:
+                if report_format == FORMAT_PDF:
+                    with open(options.report, "rb") as pdf_file:
+                        self._send(HTTPStatus.OK, "application/pdf", pdf_file.read())
+                else:
+                    self._send_json(HTTPStatus.OK, report_json(result))
+
+    @staticmethod
+    def _get_options(query):
+        params = {name: values[-1] for name, values in query.items()}
+        options = api.CalculateOptions()
+
+        if "taxyear" in params:
+            try:
+                options.taxyear = validate_year(params["taxyear"])
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(str(e)) from e
+
+        if "taxrules" in params:
+            options.tax_rules = params["taxrules"].upper()
+            if options.tax_rules not in [TAX_RULES_UK_INDIVIDUAL] + TAX_RULES_UK_COMPANY:
+                raise ValueError(f"tax rules {params['taxrules']} is not supported")
+
+        options.skip_integrity = params.get("skipint", "").lower() in ("1", "true")
+        options.summary = params.get("summary", "").lower() in ("1", "true")
+
+        report_format = params.get("format", FORMAT_JSON).lower()
+        if report_format not in (FORMAT_JSON, FORMAT_PDF):
+            raise ValueError(f"format {report_format} is not supported, use json or pdf")
+
+        return options, report_format
+
+    def _write_records(self, tmp_dir, body):
+        # Records are imported from a file, the same as from the command line
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            filename = os.path.join(tmp_dir, "records.csv")
+            try:
+                records = json.loads(body)
+            except ValueError as e:
+                raise ValueError(f"records are not valid JSON: {e}") from e
+
+            if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                raise ValueError("records must be a JSON list of objects")
+
+            with open(filename, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(TransactionRow.HEADER)
+                for record in records:
+                    writer.writerow([record.get(col) or "" for col in TransactionRow.HEADER])
+            return filename
+
+        if body.startswith(b"PK\x03\x04"):
+            filename = os.path.join(tmp_dir, "records.xlsx")
+        elif body.startswith(b"\xd0\xcf\x11\xe0"):
+            filename = os.path.join(tmp_dir, "records.xls")
+        else:
+            filename = os.path.join(tmp_dir, "records.csv")
+
+        with open(filename, "wb") as records_file:
+            records_file.write(body)
+        return filename
+
+    def _send_json(self, status, obj):
+        self._send(status, "application/json", json.dumps(obj, default=str).encode("utf-8"))
+
+    def _send_error(self, status, message, **details):
+        self._send_json(status, {"error": message, **details})
+
+    def _send(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # There is no client address for a Unix socket
+        return self.client_address[0] if self.client_address else "-"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.service.context.config.debug:
+            super().log_message(format, *args)
+
+
+def report_json(result):
+    tax_years = {}
+    for tax_year, tax_report in result.tax_report.items():
+        tax_years[tax_year] = {
+            "capital_gains": {
+                "totals": tax_report["CapitalGains"].totals,
+                "summary": tax_report["CapitalGains"].summary,
+                "estimate": tax_report["CapitalGains"].estimate,
+            },
+        }
+        if "Income" in tax_report:
+            tax_years[tax_year]["income"] = {
+                "totals": tax_report["Income"].totals,
+                "types": tax_report["Income"].type_totals,
+            }
+
+    return {"tax_years": tax_years, "holdings": result.holdings_report}
@@ -422,33 +422,35 @@ class TaxCalculator:  # pylint: disable=too-many-instance-attributes
         if config.debug:
             print(f"{Fore.CYAN}calculating holdings")
 
-        for h in tqdm(
-            self.holdings,
-            unit="h",
-            desc=f"{Fore.CYAN}calculating holdings{Fore.GREEN}",
-            disable=bool(config.debug or not sys.stdout.isatty()),
-        ):
-            if self.holdings[h].quantity > 0 or config.show_empty_wallets:
-                holdings[h] = {}
-                holdings[h]["asset"] = self.holdings[h].asset
-                holdings[h]["quantity"] = self.holdings[h].quantity
-                holdings[h]["cost"] = (self.holdings[h].cost + self.holdings[h].fees).quantize(
-                    PRECISION
-                )
+        # Value all the holdings together, so prices can be requested in batches
+        holdings_to_value = [
+            h
+            for h, holding in self.holdings.items()
+            if holding.quantity > 0 or config.show_empty_wallets
+        ]
+        current_values = value_asset.get_current_values(
+            {self.holdings[h].asset: self.holdings[h].quantity for h in holdings_to_value}
+        )
 
-                value, name, data_source = value_asset.get_current_value(
-                    self.holdings[h].asset, self.holdings[h].quantity
-                )
-                holdings[h]["value"] = value.quantize(PRECISION) if value is not None else None
-                holdings[h]["name"] = name
-                holdings[h]["data_source"] = data_source
+        for h in holdings_to_value:
+            holdings[h] = {}
+            holdings[h]["asset"] = self.holdings[h].asset
+            holdings[h]["quantity"] = self.holdings[h].quantity
+            holdings[h]["cost"] = (self.holdings[h].cost + self.holdings[h].fees).quantize(
+                PRECISION
+            )
+
+            value, name, data_source = current_values[self.holdings[h].asset]
+            holdings[h]["value"] = value.quantize(PRECISION) if value is not None else None
+            holdings[h]["name"] = name
+            holdings[h]["data_source"] = data_source
 
-                if holdings[h]["value"] is not None:
-                    holdings[h]["gain"] = holdings[h]["value"] - holdings[h]["cost"]
-                    totals["value"] += holdings[h]["value"]
-                    totals["gain"] += holdings[h]["gain"]
+            if holdings[h]["value"] is not None:
+                holdings[h]["gain"] = holdings[h]["value"] - holdings[h]["cost"]
+                totals["value"] += holdings[h]["value"]
+                totals["gain"] += holdings[h]["gain"]
 
-                totals["cost"] += holdings[h]["cost"]
+            totals["cost"] += holdings[h]["cost"]
 
         self.holdings_report["holdings"] = holdings
         self.holdings_report["totals"] = totals
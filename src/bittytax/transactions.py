@@ -16,6 +16,8 @@ class TransactionHistory:
         self.value_asset = value_asset
         self.transactions = []
 
+        self.value_asset.add_observed_prices(transaction_records)
+
         if config.debug:
             print(f"{Fore.CYAN}split transaction records")
 
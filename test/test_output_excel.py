@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from openpyxl import load_workbook
+
+from bittytax import api
+from bittytax.conv.output_csv import OutputBase
+from bittytax.conv.output_excel import OutputExcel
+
+ZERION_ROWS = [
+    [
+        "Date",
+        "Time",
+        "Transaction Type",
+        "Status",
+        "Application",
+        "Accounting Type",
+        "Buy Amount",
+        "Buy Currency",
+        "Buy Currency Address",
+        "Buy Fiat Amount",
+        "Buy Fiat Currency",
+        "Sell Amount",
+        "Sell Currency",
+        "Sell Currency Address",
+        "Sell Fiat Amount",
+        "Sell Fiat Currency",
+        "Fee Amount",
+        "Fee Currency",
+        "Fee Fiat Amount",
+        "Fee Fiat Currency",
+        "Sender",
+        "Receiver",
+        "Tx Hash",
+        "Link",
+        "Timestamp",
+        "Changes JSON",
+    ],
+    [
+        "2022-01-01",
+        "10:00:00",
+        "",
+        "Confirmed",
+        "",
+        "Income",
+        "1",
+        "AAA",
+        "",
+        "10",
+        "GBP",
+        "",
+        "",
+        "",
+        "",
+        "",
+        "0.01",
+        "ETH",
+        "20",
+        "GBP",
+        "",
+        "",
+        "",
+        "",
+        "",
+        '[{"type": "in", "amount": "1", "symbol": "AAA", "fiat_amount": "10", '
+        '"fiat_currency": "GBP"}, {"type": "in", "amount": "2", "symbol": "BBB", '
+        '"fiat_amount": "20", "fiat_currency": "GBP"}]',
+    ],
+]
+
+
+class TestConstantMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.in_filename = os.path.join(self.tmp_dir, "zerion.csv")
+        with open(self.in_filename, "w", newline="", encoding="utf-8") as csv_file:
+            csv.writer(csv_file).writerows(ZERION_ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @mock.patch.object(OutputExcel, "CONSTANT_MEMORY_ROWS", 0)
+    def test_original_data_of_multi_record_row(self):
+        data_files = api.convert([self.in_filename], api.ConvertOptions(offline=True))
+        out_filename = os.path.join(self.tmp_dir, "out.xlsx")
+        output = OutputExcel(
+            "bittytax_conv", data_files, argparse.Namespace(output_filename=out_filename)
+        )
+        self.assertTrue(output.constant_memory)
+        output.write_excel()
+
+        worksheet = load_workbook(out_filename, read_only=True).worksheets[0]
+        rows = [
+            [cell if cell is not None else "" for cell in row]
+            for row in worksheet.iter_rows(values_only=True)
+        ]
+        in_data = len(OutputBase.BITTYTAX_OUT_HEADER)
+
+        self.assertEqual(rows[1][1:3], [1, "AAA"])
+        self.assertEqual([str(cell) for cell in rows[1][in_data:]], ZERION_ROWS[1])
+        self.assertEqual(rows[2][1:3], [2, "BBB"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# (c) Nano Nano Ltd 2023
+
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+
+from bittytax.price.pricecache import read_cache, stack_prices, update_prices
+
+PAIR = "BTC/GBP"
+DATE = "2020-01-01"
+
+
+class TestMergePrices(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def update(self, price, fetched=None):
+        new_price = {"price": price, "url": None}
+        if fetched is not None:
+            new_price["fetched"] = fetched
+        update_prices(self.cache_dir, "Test", {PAIR: {DATE: new_price}})
+
+    def cached(self):
+        return read_cache(self.cache_dir, "Test")[PAIR][DATE]
+
+    def test_missing_price_keeps_later_fetched(self):
+        self.update(None, 100)
+        self.update(None, 200)
+        self.assertEqual(self.cached()["fetched"], 200)
+
+        self.update(None, 150)
+        self.assertEqual(self.cached()["fetched"], 200)
+
+    def test_missing_price_replaces_legacy_entry(self):
+        self.update(None)
+        self.update(None, 100)
+        self.assertEqual(self.cached()["fetched"], 100)
+
+    def test_price_replaces_missing_price(self):
+        self.update(None, 100)
+        self.update(Decimal("1.5"))
+        self.assertEqual(self.cached()["price"], Decimal("1.5"))
+
+        self.update(None, 200)
+        self.assertEqual(self.cached()["price"], Decimal("1.5"))
+
+
+class TestPackedPrices(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.prices = {
+            f"{asset}/BTC": {
+                f"2020-01-0{day}": {
+                    "price": Decimal(f"{day}.{len(asset)}") if day % 3 else None,
+                    "url": f"https://example.com/{asset}/{day // 2}" if day % 3 else None,
+                }
+                for day in range(1, 10)
+            }
+            for asset in ("ETH", "LTC", "DOGE")
+        }
+        update_prices(self.cache_dir, "Test", self.prices)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_unchanged_pairs_are_kept(self):
+        new_price = {"price": Decimal("2.5"), "url": "https://example.com/new"}
+        update_prices(self.cache_dir, "Test", {"DOGE/BTC": {DATE: new_price}})
+        self.prices["DOGE/BTC"][DATE] = new_price
+        self.assertEqual(dict(read_cache(self.cache_dir, "Test").items()), self.prices)
+
+    def test_first_layer_takes_priority(self):
+        layer = {
+            "ETH/BTC": {
+                "2020-01-01": {"price": Decimal(9), "url": None},
+                "2020-01-03": {"price": Decimal(9), "url": None},
+            }
+        }
+        prices = stack_prices([read_cache(self.cache_dir, "Test"), layer])
+        self.assertEqual(prices["ETH/BTC"]["2020-01-01"]["price"], Decimal("1.3"))
+        self.assertEqual(prices["ETH/BTC"]["2020-01-03"]["price"], Decimal(9))
+        self.assertEqual(sorted(prices), ["DOGE/BTC", "ETH/BTC", "LTC/BTC"])
+
+
+if __name__ == "__main__":
+    unittest.main()